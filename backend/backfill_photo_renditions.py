@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Backfill photo renditions for photos already in backend/photos/
+
+Goes through every photo recorded in the photos table (shared store
+entries once) and writes every size in FACE_PHOTO_RENDITIONS (default
+96,256) that is missing, the same way /person/photo/upload does for new
+photos. Existing renditions are skipped unless --force is given (e.g.
+after changing PHOTO_RENDITION_QUALITY).
+
+Original files keep their names; only photos uploaded after renditions
+were added are content-addressed and served as immutable.
+
+Usage: python backfill_photo_renditions.py [--photos-dir DIR] [--force]
+"""
+import argparse
+import os
+import time
+
+import main
+
+
+def originals():
+    main.init_db()
+    conn = main.get_conn()
+    try:
+        rows = conn.execute("SELECT person_id, filename FROM photos ORDER BY person_id, rowid").fetchall()
+    finally:
+        conn.close()
+    seen = set()
+    for person_id, filename in rows:
+        key = filename if main._CONTENT_ADDRESSED_NAME.match(filename) else (person_id, filename)
+        if key not in seen and os.path.exists(main.photo_rendition_path(person_id, filename)):
+            seen.add(key)
+            yield person_id, filename
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos-dir", default=main.PHOTOS_DIR)
+    parser.add_argument("--force", action="store_true", help="re-render renditions that already exist")
+    args = parser.parse_args()
+
+    main.PHOTOS_DIR = args.photos_dir
+    if not os.path.isdir(args.photos_dir):
+        print(f"❌ No photos directory at {args.photos_dir}")
+        return 1
+
+    print("=" * 60)
+    print("🖼️  PHOTO RENDITION BACKFILL")
+    print("=" * 60)
+    print(f"Photos: {args.photos_dir}  sizes: {', '.join(f'{s}px' for s in main.PHOTO_RENDITION_SIZES)}")
+
+    t0 = time.perf_counter()
+    seen = written = failed = 0
+    for person_id, filename in originals():
+        seen += 1
+        try:
+            written += len(main.write_photo_renditions(person_id, filename, force=args.force))
+        except Exception as e:
+            failed += 1
+            print(f"⚠️  {person_id}/{filename}: {e}")
+    print()
+    print(f"✅ {seen} photos, {written} renditions written, {failed} failed in {time.perf_counter() - t0:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark the IVF-flat ANN index on synthetic galleries
+
+For each gallery size builds a synthetic gallery (4 noisy embeddings per
+person), trains the IVF partition the server would train, and compares
+IVFView.top1 against brute force for a range of nprobe values:
+recall@1 (same person as brute force), per-query latency and train time.
+
+1M rows need ~2 GB of RAM for the matrix alone.
+
+Usage: python bench_ann.py [--sizes 10000,100000,1000000] [--nprobe 4,8,16,32] [--queries 200]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import main
+
+ROWS_PER_PERSON = 4
+
+
+def synthetic_gallery(rows, rng, chunk=100000):
+    persons = rows // ROWS_PER_PERSON
+    mat = np.empty((persons * ROWS_PER_PERSON, 512), dtype=np.float32)
+    for start in range(0, persons, chunk // ROWS_PER_PERSON):
+        n = min(chunk // ROWS_PER_PERSON, persons - start)
+        centers = rng.standard_normal((n, 512), dtype=np.float32)
+        block = np.repeat(centers, ROWS_PER_PERSON, axis=0)
+        block += 0.6 * rng.standard_normal(block.shape, dtype=np.float32)
+        mat[start * ROWS_PER_PERSON:(start + n) * ROWS_PER_PERSON] = main._normalize_rows(block)
+    ids = [f"person_{i // ROWS_PER_PERSON}" for i in range(mat.shape[0])]
+    return ids, mat
+
+
+def per_query_ms(fn, queries):
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q[None, :])
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), float(np.percentile(samples, 95))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print("=" * 60)
+    print("🧭 ANN (IVF-flat) BENCHMARK")
+    print("=" * 60)
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        ids, mat = synthetic_gallery(size, rng)
+        picks = rng.integers(0, len(ids), size=args.queries)
+        queries = main._normalize_rows(mat[picks] + 0.03 * rng.standard_normal((args.queries, 512), dtype=np.float32))
+
+        sims = queries @ mat.T
+        truth = [ids[i] for i in np.argmax(sims, axis=1)]
+        del sims
+
+        t0 = time.perf_counter()
+        centroids = main.train_ivf(mat, int(np.sqrt(len(ids))))
+        lists = main.assign_ivf(mat, centroids)
+        train_s = time.perf_counter() - t0
+        view = main.IVFView(0, ids, mat, lists, centroids)
+
+        bf_p50, bf_p95 = per_query_ms(lambda q: np.argmax(q @ mat.T), queries)
+        print(f"\n{len(ids):,} rows  lists={len(centroids)}  train={train_s:.1f}s")
+        print(f"{'nprobe':>8s} {'recall@1':>9s} {'p50 ms':>8s} {'p95 ms':>8s}")
+        print(f"{'brute':>8s} {1.0:9.3f} {bf_p50:8.2f} {bf_p95:8.2f}")
+        for nprobe in [int(n) for n in args.nprobe.split(",") if n.strip()]:
+            got, _ = view.top1(queries, nprobe=nprobe)
+            recall = np.mean([a == b for a, b in zip(truth, got)])
+            p50, p95 = per_query_ms(lambda q: view.top1(q, nprobe=nprobe), queries)
+            print(f"{nprobe:8d} {recall:9.3f} {p50:8.2f} {p95:8.2f}")
+        del mat, view
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
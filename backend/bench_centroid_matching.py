@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Check two-stage centroid matching against brute force
+
+Builds a MatchIndex over the enrolled gallery in faces.db (or a synthetic
+gallery with --synthetic N persons) and compares MatchIndex.top1 with the
+plain argmax over every row: top-1 agreement, worst score loss and latency,
+for each FACE_CENTROID_TOLERANCE given. A synthetic gallery can be held in
+any FACE_GALLERY_DTYPE with --dtype.
+
+Queries are the gallery rows themselves with noise added (enrolled people)
+plus random vectors (strangers).
+
+Usage: python bench_centroid_matching.py [--synthetic 5000] [--queries 500]
+                                         [--tolerances 0,0.05,1] [--k 8]
+                                         [--dtype int8]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import main
+
+
+def synthetic_gallery(persons, rows_per_person, rng):
+    centers = rng.standard_normal((persons, 512)).astype(np.float32)
+    mat = main._normalize_rows(np.repeat(centers, rows_per_person, axis=0)
+                               + 0.6 * rng.standard_normal((persons * rows_per_person, 512)).astype(np.float32))
+    ids = [f"person_{i // rows_per_person}" for i in range(persons * rows_per_person)]
+    return ids, mat
+
+
+def brute_force(queries, ids, mat):
+    sims = main.gallery_scores(queries, mat)
+    best = np.argmax(sims, axis=1)
+    return [ids[i] for i in best], sims[np.arange(len(best)), best]
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="synthetic persons instead of faces.db")
+    parser.add_argument("--rows-per-person", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--tolerances", default="0,0.05,1")
+    parser.add_argument("--k", type=int, default=main.CENTROID_SHORTLIST_K)
+    parser.add_argument("--dtype", choices=main.EMBEDDING_FORMATS, default=main.GALLERY_DTYPE,
+                        help="gallery matrix type for --synthetic (faces.db uses FACE_GALLERY_DTYPE)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        ids, mat = synthetic_gallery(args.synthetic, args.rows_per_person, rng)
+        mat = main.to_gallery_dtype(mat, args.dtype)
+        source = f"synthetic ({args.synthetic} persons x {args.rows_per_person}, {args.dtype})"
+    else:
+        main.init_db()
+        main.GALLERY.load()
+        ids, mat = main.GALLERY.snapshot()
+        source = f"faces.db ({len(main.GALLERY)} embeddings)"
+    if not ids:
+        print("❌ Gallery is empty; enroll people or pass --synthetic N")
+        return 1
+
+    main.CENTROID_SHORTLIST_K = args.k
+    t0 = time.perf_counter()
+    index = main.MatchIndex(ids, mat)
+    index.centroids  # built lazily; count it here rather than in the first query
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    half = args.queries // 2
+    picks = rng.integers(0, len(ids), size=half)
+    known = main._normalize_rows(main.dequantize(mat[picks]) + 0.03 * rng.standard_normal((half, mat.shape[1])).astype(np.float32))
+    strangers = main._normalize_rows(rng.standard_normal((args.queries - half, mat.shape[1])).astype(np.float32))
+
+    print("=" * 60)
+    print("🎯 CENTROID MATCHING CHECK")
+    print("=" * 60)
+    print(f"Gallery: {source}, {len(index.persons)} persons  k={args.k}  build={build_ms:.1f} ms")
+    print()
+    print(f"{'queries':>9s} {'tol':>5s} {'agree':>7s} {'max loss':>9s} {'brute ms':>9s} {'2-stage ms':>10s}")
+    for label, queries in (("enrolled", known), ("strangers", strangers)):
+        t0 = time.perf_counter()
+        bf_ids, bf_scores = brute_force(queries, ids, mat)
+        bf_ms = (time.perf_counter() - t0) * 1000
+        for tol in [float(t) for t in args.tolerances.split(",") if t.strip()]:
+            main.CENTROID_TOLERANCE = tol
+            t0 = time.perf_counter()
+            ts_ids, ts_scores = index.top1(queries)
+            ts_ms = (time.perf_counter() - t0) * 1000
+            agree = np.mean([a == b for a, b in zip(bf_ids, ts_ids)])
+            loss = float(np.max(bf_scores - ts_scores))
+            print(f"{label:>9s} {tol:5.2f} {agree:7.3f} {loss:9.4f} {bf_ms:9.1f} {ts_ms:10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark detector input sizes
+
+For every size in FACE_DET_SIZES (default 320,480,640) and for the adaptive
+policy used by the endpoints, reports detector latency and recall relative
+to the largest size (a face counts as found when IoU >= 0.5).
+
+Usage: python bench_detector_sizes.py [--images DIR] [--closeup] [--runs 3]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+import main
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_images(images_dir, limit):
+    patterns = [os.path.join(images_dir, "**", "*.jpg"), os.path.join(images_dir, "**", "*.png")]
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True))[:limit]
+    return [main.pil_to_ndarray(Image.open(p).convert("RGB")) for p in paths]
+
+
+def recall(found, reference):
+    if reference.shape[0] == 0:
+        return None
+    hits = sum(1 for ref in reference if any(main._iou(ref[:4], f[:4]) >= 0.5 for f in found))
+    return hits / reference.shape[0]
+
+
+def run(detect, images, runs):
+    times, boxes = [], []
+    for img in images:
+        out = None
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            out = detect(img)
+            times.append((time.perf_counter() - t0) * 1000)
+        boxes.append(out[0])
+    return times, boxes
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(BACKEND_DIR, "test_reports"))
+    parser.add_argument("--limit", type=int, default=60)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--closeup", action="store_true", help="use the close-up (enrollment) policy for the adaptive row")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    if not images:
+        print(f"❌ No images found under {args.images}")
+        return 1
+
+    fa = main.FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"], allowed_modules=["detection"])
+    fa.prepare(ctx_id=-1, det_size=(main.DET_SIZES[-1], main.DET_SIZES[-1]))
+    main.face_app = fa
+
+    print("=" * 60)
+    print("🔎 DETECTOR SIZE BENCHMARK")
+    print("=" * 60)
+    print(f"Images: {len(images)}  Sizes: {main.DET_SIZES}  Runs: {args.runs}")
+    print()
+
+    rows = {}
+    for size in main.DET_SIZES:
+        rows[str(size)] = run(lambda img, s=size: fa.det_model.detect(img, input_size=(s, s), metric='default'), images, args.runs)
+    rows["adaptive"] = run(lambda img: main.detect_faces(img, closeup=args.closeup), images, args.runs)
+
+    reference = rows[str(main.DET_SIZES[-1])][1]
+    print(f"{'size':>10s} {'p50 ms':>8s} {'p95 ms':>8s} {'recall':>8s} {'faces':>6s}")
+    for name, (times, boxes) in rows.items():
+        recalls = [r for r in (recall(b, ref) for b, ref in zip(boxes, reference)) if r is not None]
+        rec = statistics.mean(recalls) if recalls else float("nan")
+        faces = sum(b.shape[0] for b in boxes)
+        print(f"{name:>10s} {statistics.median(times):8.1f} {np.percentile(times, 95):8.1f} {rec:8.3f} {faces:6d}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run_benchmark())
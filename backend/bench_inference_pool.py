@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark in-process inference against the worker process pool
+
+Fires the stored test report images at analyze("embed", ...) from a number
+of concurrent client threads (as uvicorn's threadpool would) and reports
+throughput and latency for the single in-process FaceAnalysis and for each
+requested pool size (FACE_INFERENCE_WORKERS).
+
+Usage: python bench_inference_pool.py [--workers 1,2,4] [--concurrency 8] [--requests 200]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import main
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_images(images_dir, limit):
+    patterns = [os.path.join(images_dir, "**", "*.jpg"), os.path.join(images_dir, "**", "*.png")]
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True))[:limit]
+    return [main.pil_to_ndarray(Image.open(p).convert("RGB")) for p in paths]
+
+
+def one_call(img):
+    t0 = time.perf_counter()
+    main.analyze("embed", img)
+    return (time.perf_counter() - t0) * 1000
+
+
+def run_load(images, concurrency, requests):
+    jobs = [images[i % len(images)] for i in range(requests)]
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(one_call, images[:concurrency]))  # warm-up
+        t0 = time.perf_counter()
+        latencies = list(clients.map(one_call, jobs))
+        elapsed = time.perf_counter() - t0
+    return requests / elapsed, statistics.median(latencies), float(np.percentile(latencies, 95))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(BACKEND_DIR, "test_reports"))
+    parser.add_argument("--limit", type=int, default=40)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated pool sizes to try")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    if not images:
+        print(f"❌ No images found under {args.images}")
+        return 1
+
+    # Same loader the workers use, so both modes run identical models and session options
+    main._worker_init(main.MODEL_PACK, main.MODEL_ROOT, main.ORT_SETTINGS)
+
+    print("=" * 60)
+    print("🧵 INFERENCE POOL BENCHMARK")
+    print("=" * 60)
+    print(f"Images: {len(images)}  Concurrency: {args.concurrency}  Requests: {args.requests}  CPUs: {os.cpu_count()}")
+    print()
+    print(f"{'mode':>12s} {'img/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s}")
+
+    rows = []
+    main.start_inference_pool(0)
+    rows.append(("in-process",) + run_load(images, args.concurrency, args.requests))
+    print(f"{rows[-1][0]:>12s} {rows[-1][1]:8.1f} {rows[-1][2]:8.1f} {rows[-1][3]:8.1f}")
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        main.start_inference_pool(workers)
+        if main.inference_pool is None:
+            print(f"{workers:>9d} wk  failed to start")
+            continue
+        rows.append((f"{workers} workers",) + run_load(images, args.concurrency, args.requests))
+        print(f"{rows[-1][0]:>12s} {rows[-1][1]:8.1f} {rows[-1][2]:8.1f} {rows[-1][3]:8.1f}")
+    main.start_inference_pool(0)
+
+    print()
+    best = max(rows, key=lambda r: r[1])
+    print(f"Best throughput: {best[0]} ({best[1] / rows[0][1]:.2f}x in-process)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
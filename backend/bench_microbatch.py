@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark ArcFace micro-batching: throughput against p99 latency
+
+Runs concurrent clients through analyze("embed", ...) (what /recognize does)
+with micro-batching off and at each batch window, and prints throughput,
+p50/p99 latency and the mean batch the scheduler actually formed.
+
+Usage: python bench_microbatch.py [--windows 0,2,5,10] [--max-batch 32]
+                                  [--concurrency 1,4,8] [--requests 200]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import main
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_images(images_dir, limit):
+    patterns = [os.path.join(images_dir, "**", "*.jpg"), os.path.join(images_dir, "**", "*.png")]
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True))[:limit]
+    return [main.pil_to_ndarray(Image.open(p).convert("RGB")) for p in paths]
+
+
+def one_call(img):
+    t0 = time.perf_counter()
+    main.analyze("embed", img)
+    return (time.perf_counter() - t0) * 1000
+
+
+def run_load(images, concurrency, requests):
+    jobs = [images[i % len(images)] for i in range(requests)]
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(one_call, images[:concurrency]))  # warm-up
+        t0 = time.perf_counter()
+        latencies = list(clients.map(one_call, jobs))
+        elapsed = time.perf_counter() - t0
+    return requests / elapsed, statistics.median(latencies), float(np.percentile(latencies, 99))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(BACKEND_DIR, "test_reports"))
+    parser.add_argument("--limit", type=int, default=40)
+    parser.add_argument("--windows", default="0,2,5,10", help="batch windows in ms; 0 = micro-batching off")
+    parser.add_argument("--max-batch", type=int, default=main.MICROBATCH_MAX)
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    if not images:
+        print(f"❌ No images found under {args.images}")
+        return 1
+
+    main._worker_init(main.MODEL_PACK, main.MODEL_ROOT, main.ORT_SETTINGS)
+
+    print("=" * 60)
+    print("📦 MICRO-BATCHING BENCHMARK")
+    print("=" * 60)
+    print(f"Images: {len(images)}  Requests: {args.requests}  max batch: {args.max_batch}")
+    print()
+    print(f"{'clients':>7s} {'window':>8s} {'img/s':>8s} {'p50 ms':>8s} {'p99 ms':>8s} {'batch':>6s}")
+
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        for window in [float(w) for w in args.windows.split(",") if w.strip()]:
+            batcher = main.EmbeddingBatcher(window, args.max_batch) if window > 0 else None
+            main.embedding_batcher = batcher
+            throughput, p50, p99 = run_load(images, concurrency, args.requests)
+            mean_batch = batcher.stats()["mean_batch_faces"] if batcher else None
+            label = f"{window:g} ms" if window > 0 else "off"
+            batch = f"{mean_batch:6.1f}" if mean_batch else f"{'-':>6s}"
+            print(f"{concurrency:7d} {label:>8s} {throughput:8.1f} {p50:8.1f} {p99:8.1f} {batch}")
+        print()
+    main.embedding_batcher = None
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
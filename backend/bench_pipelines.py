@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-endpoint model pipelines
+
+Runs every image through the full buffalo_l stack and through the reduced
+pipeline each endpoint is routed to (see ENDPOINT_PIPELINES in main.py),
+then prints the per-call latency and the reduction per endpoint.
+
+Usage: python bench_pipelines.py [--images DIR] [--runs 5] [--det-size 640]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from main import ENDPOINT_PIPELINES, FaceAnalysis, build_pipelines, pil_to_ndarray
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_images(images_dir, limit):
+    patterns = [os.path.join(images_dir, "**", "*.jpg"), os.path.join(images_dir, "**", "*.png")]
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True))[:limit]
+    return [pil_to_ndarray(Image.open(p).convert("RGB")) for p in paths]
+
+
+def time_pipeline(fa, images, runs):
+    fa.get(images[0])  # warm-up
+    samples = []
+    for _ in range(runs):
+        for img in images:
+            t0 = time.perf_counter()
+            fa.get(img)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), float(np.percentile(samples, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(BACKEND_DIR, "test_reports"))
+    parser.add_argument("--limit", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--det-size", type=int, default=640)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    if not images:
+        print(f"❌ No images found under {args.images}")
+        return 1
+
+    print("=" * 60)
+    print("⏱️  PIPELINE BENCHMARK")
+    print("=" * 60)
+    print(f"Images: {len(images)}  Runs: {args.runs}  det_size: {args.det_size}")
+    print()
+
+    fa = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
+    fa.prepare(ctx_id=-1, det_size=(args.det_size, args.det_size))
+    pipelines = build_pipelines(fa)
+
+    timings = {}
+    for name, pipeline in pipelines.items():
+        timings[name] = time_pipeline(pipeline, images, args.runs)
+        p50, p95 = timings[name]
+        print(f"   {name:8s} modules={sorted(pipeline.models)}  p50={p50:7.1f} ms  p95={p95:7.1f} ms")
+    print()
+
+    full_p50 = timings["full"][0]
+    print(f"{'endpoint':30s} {'pipeline':8s} {'p50 ms':>8s} {'vs full':>8s}")
+    for endpoint, name in ENDPOINT_PIPELINES.items():
+        p50 = timings[name][0]
+        print(f"{endpoint:30s} {name:8s} {p50:8.1f} {100 * (1 - p50 / full_p50):7.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark the photo quality engine against the previous helpers
+
+Scores face boxes of several sizes on each image, scaled to a 12 MP
+enrollment photo (4000x3000) and Gaussian-blurred by each --blur sigma, with:
+  - legacy: PIL crop -> float32 grayscale -> reflect-padded Laplacian
+    (_compute_quality_metrics / _variance_of_laplacian before the engine)
+  - engine: _face_quality_metrics on the decoded BGR ndarray
+and prints per-face latency, the median sharpness from each, the mean
+absolute brightness/contrast difference and how often the enrollment
+verdict (_quality_pass) agrees. The blurred rows check that blurry faces
+are still rejected. The last row scores all faces of a frame at once with
+_frame_quality_metrics.
+
+Usage: python bench_quality.py [--faces 128,512,1500] [--blur 0,2,4] [--limit 20] [--repeat 5]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+import main
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PHOTO_SIZE = (4000, 3000)
+
+
+def load_images(images_dir, limit):
+    patterns = [os.path.join(images_dir, "**", "*.jpg"), os.path.join(images_dir, "**", "*.png")]
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True))[:limit]
+    return [Image.open(p).convert("RGB").resize(PHOTO_SIZE, Image.BILINEAR) for p in paths]
+
+
+def legacy_to_grayscale(arr):
+    return (0.299 * arr[:, :, 0] + 0.587 * arr[:, :, 1] + 0.114 * arr[:, :, 2]).astype(np.float32)
+
+
+def legacy_variance_of_laplacian(gray):
+    k = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]], dtype=np.float32)
+    pad = np.pad(gray, ((1, 1), (1, 1)), mode='reflect')
+    out = (
+        k[0, 0] * pad[0:-2, 0:-2] + k[0, 1] * pad[0:-2, 1:-1] + k[0, 2] * pad[0:-2, 2:] +
+        k[1, 0] * pad[1:-1, 0:-2] + k[1, 1] * pad[1:-1, 1:-1] + k[1, 2] * pad[1:-1, 2:] +
+        k[2, 0] * pad[2:, 0:-2] + k[2, 1] * pad[2:, 1:-1] + k[2, 2] * pad[2:, 2:]
+    )
+    return float(out.var())
+
+
+def legacy_quality_metrics(img_pil, bbox, kps):
+    x1, y1, x2, y2 = bbox
+    w, h = img_pil.size
+    x1 = max(0, min(w, x1)); x2 = max(0, min(w, x2))
+    y1 = max(0, min(h, y1)); y2 = max(0, min(h, y2))
+    crop = img_pil.crop((int(x1), int(y1), int(x2), int(y2)))
+    gray = legacy_to_grayscale(np.asarray(crop))
+    roll_abs = None
+    if kps is not None:
+        dx, dy = float(kps[1][0] - kps[0][0]), float(kps[1][1] - kps[0][1])
+        if dx != 0:
+            roll_abs = abs(np.degrees(np.arctan2(dy, dx)))
+    return {
+        "face_width_px": float(x2 - x1),
+        "sharpness": legacy_variance_of_laplacian(gray),
+        "brightness": float(gray.mean()),
+        "contrast": float(gray.std()),
+        "roll_abs": roll_abs,
+    }
+
+
+def face_at(side, cx, cy):
+    x1, y1 = cx - side / 2, cy - side / 2
+    kps = np.array([[x1 + 0.3 * side, y1 + 0.4 * side], [x1 + 0.7 * side, y1 + 0.42 * side]], dtype=np.float32)
+    return SimpleNamespace(bbox=np.array([x1, y1, x1 + side, y1 + side], dtype=np.float32), kps=kps)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return out, statistics.median(samples)
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(BACKEND_DIR, "test_reports"))
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--faces", default="128,512,1500", help="face box sides in px")
+    parser.add_argument("--blur", default="0,2,4", help="Gaussian blur sigmas in px")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    if not images:
+        print(f"❌ No images found under {args.images}")
+        return 1
+    sides = [int(v) for v in args.faces.split(",") if v.strip()]
+    blurs = [float(v) for v in args.blur.split(",") if v.strip()]
+
+    print("=" * 60)
+    print("🔬 PHOTO QUALITY ENGINE BENCHMARK")
+    print("=" * 60)
+    print(f"Images: {len(images)} at {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]}")
+    print()
+    print(f"{'face px':>8s} {'blur':>5s} {'legacy ms':>10s} {'engine ms':>10s} {'sharp old':>10s} {'sharp new':>10s} "
+          f"{'d bright':>9s} {'d contr':>8s} {'rejected':>9s} {'verdict':>8s}")
+
+    frames = []
+    for side, blur in ((side, blur) for blur in blurs for side in sides):
+        legacy_ms, engine_ms, verdicts, rejected = [], [], [], []
+        metrics = {"legacy": [], "engine": []}
+        for img_pil in images:
+            if blur:
+                img_pil = img_pil.filter(ImageFilter.GaussianBlur(blur))
+            img = main.pil_to_ndarray(img_pil)
+            face = face_at(side, PHOTO_SIZE[0] / 2, PHOTO_SIZE[1] / 2)
+            bbox = tuple(map(float, face.bbox))
+            old, ms = timed(lambda: legacy_quality_metrics(img_pil, bbox, face.kps), args.repeat)
+            legacy_ms.append(ms)
+            new, ms = timed(lambda: main._face_quality_metrics(img, bbox, face.kps), args.repeat)
+            engine_ms.append(ms)
+            metrics["legacy"].append(old)
+            metrics["engine"].append(new)
+            verdicts.append(main._quality_pass(old)[0] == main._quality_pass(new)[0])
+            rejected.append(not main._quality_pass(new)[0])
+            if not blur:
+                frames.append((img, face))
+        old_sharp = statistics.median(m["sharpness"] for m in metrics["legacy"])
+        new_sharp = statistics.median(m["sharpness"] for m in metrics["engine"])
+        d_bright, d_contr = (np.mean([abs(a[key] - b[key]) for a, b in zip(metrics["legacy"], metrics["engine"])])
+                             for key in ("brightness", "contrast"))
+        print(f"{side:8d} {blur:5.1f} {statistics.median(legacy_ms):10.2f} {statistics.median(engine_ms):10.2f} "
+              f"{old_sharp:10.1f} {new_sharp:10.1f} {d_bright:9.3f} {d_contr:8.3f} {np.mean(rejected):9.1%} "
+              f"{np.mean(verdicts):8.1%}")
+
+    # Every face size on one frame, scored together
+    img = frames[0][0] if frames else main.pil_to_ndarray(images[0])
+    faces = [face_at(side, (i + 1) * PHOTO_SIZE[0] / (len(sides) + 1), PHOTO_SIZE[1] / 2) for i, side in enumerate(sides)]
+    img_pil = images[0]
+    _, legacy = timed(lambda: [legacy_quality_metrics(img_pil, tuple(map(float, f.bbox)), f.kps) for f in faces],
+                      args.repeat)
+    _, engine = timed(lambda: main._frame_quality_metrics(img, faces), args.repeat)
+    print()
+    print(f"Frame with {len(faces)} faces: legacy {legacy:.2f} ms  engine {engine:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
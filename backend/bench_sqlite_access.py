@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark SQLite access for /recognize with filter_ids over a 50k-row table
+
+Builds a scratch database (50k embeddings, 4 per person, groups of 50) and
+times the queries that take filter_ids or look up one person:
+  - legacy: a new connection per call plus PRAGMA journal_mode and
+    PRAGMA table_info, run against the schema without the lookup indexes
+  - pooled: get_conn() + cached column detection, run after the migrations
+When the model pack loads, it also times /recognize end to end
+(recognize_image) with filter_ids against the resident gallery built from
+the same table.
+
+Usage: python bench_sqlite_access.py [--rows 50000] [--filter 20] [--calls 300]
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+import main
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ROWS_PER_PERSON = 4
+
+
+def load_images(images_dir, limit):
+    patterns = [os.path.join(images_dir, "**", "*.jpg"), os.path.join(images_dir, "**", "*.png")]
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True))[:limit]
+    images = []
+    for p in paths:
+        with open(p, "rb") as f:
+            images.append(main.ingest_image(f.read()))
+    return images
+
+
+def build_db(path, rows, rng):
+    main.DB_PATH = path
+    main.init_db()
+    persons = rows // ROWS_PER_PERSON
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO persons(person_id, person_name) VALUES (?, ?)",
+                     ((f"person_{p}", f"Person {p}") for p in range(persons)))
+    for start in range(0, persons, 1000):
+        block = rng.standard_normal((min(1000, persons - start) * ROWS_PER_PERSON, 512)).astype(np.float32)
+        conn.executemany("INSERT INTO embeddings(person_id, embedding, created_at) VALUES (?, ?, ?)",
+                         ((f"person_{start + i // ROWS_PER_PERSON}", main.encode_embedding(v), time.time())
+                          for i, v in enumerate(block)))
+    conn.executemany("INSERT INTO group_members(group_id, person_id) VALUES (?, ?)",
+                     ((f"group_{p // 50}", f"person_{p}") for p in range(persons)))
+    conn.commit()
+    conn.close()
+    return persons
+
+
+def drop_indexes(path):
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX IF EXISTS idx_embeddings_person_id")
+    conn.execute("DROP INDEX IF EXISTS idx_group_members_person_id")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+
+def legacy_load_embeddings(filter_ids):
+    # What each call cost before: fresh connection, WAL pragma, column probe
+    conn = sqlite3.connect(main.DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(embeddings)")
+    cols = [row[1] for row in cur.fetchall()]
+    emb_col = "embedding" if "embedding" in cols else "vector"
+    q_marks = ",".join(["?"] * len(filter_ids))
+    cur.execute(f"SELECT person_id, {emb_col} FROM embeddings WHERE person_id IN ({q_marks})", filter_ids)
+    out = [(pid, main.decode_embedding(vec)) for pid, vec in cur.fetchall()]
+    conn.close()
+    return out
+
+
+def legacy_groups_of(person_id):
+    conn = sqlite3.connect(main.DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    rows = conn.execute("SELECT group_id FROM group_members WHERE person_id = ?", (person_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def pooled_groups_of(person_id):
+    conn = main.get_conn()
+    rows = conn.execute("SELECT group_id FROM group_members WHERE person_id = ?", (person_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), float(np.percentile(samples, 95))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--filter", type=int, default=20, help="persons per filter_ids request")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--images", default=os.path.join(BACKEND_DIR, "test_reports"))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    path = os.path.join(workdir, "faces.db")
+    persons = build_db(path, args.rows, rng)
+    filters = [([f"person_{p}" for p in rng.choice(persons, size=args.filter, replace=False)],)
+               for _ in range(args.calls)]
+    singles = [(f"person_{p}",) for p in rng.integers(0, persons, size=args.calls)]
+
+    print("=" * 60)
+    print("🗄️  SQLITE ACCESS BENCHMARK")
+    print("=" * 60)
+    print(f"Database: {args.rows:,} embeddings, {persons:,} persons  filter_ids: {args.filter}  calls: {args.calls}")
+    print()
+    print(f"{'query':>22s} {'mode':>8s} {'p50 ms':>8s} {'p95 ms':>8s}")
+
+    drop_indexes(path)
+    results = {}
+    results["filter legacy"] = timed(legacy_load_embeddings, filters)
+    results["groups legacy"] = timed(legacy_groups_of, singles)
+    main.init_db()  # re-applies the index migration
+    results["filter pooled"] = timed(main.load_embeddings, filters)
+    results["groups pooled"] = timed(pooled_groups_of, singles)
+    for query, label in (("filter", "filter_ids embeddings"), ("groups", "groups of a person")):
+        for mode in ("legacy", "pooled"):
+            p50, p95 = results[f"{query} {mode}"]
+            print(f"{label:>22s} {mode:>8s} {p50:8.2f} {p95:8.2f}")
+
+    images = load_images(args.images, 20)
+    try:
+        main._worker_init(main.MODEL_PACK, main.MODEL_ROOT, main.ORT_SETTINGS)
+    except Exception as e:
+        print(f"\n⚠️  Skipping /recognize timing, model pack did not load: {e}")
+        return 0
+    if not images:
+        print(f"\n⚠️  Skipping /recognize timing, no images under {args.images}")
+        return 0
+    main.GALLERY.load()
+    jobs = [(images[i % len(images)], filters[i][0], None) for i in range(min(args.calls, 100))]
+    p50, p95 = timed(main.recognize_image, jobs)
+    print()
+    print(f"/recognize with filter_ids (resident gallery): p50={p50:.1f} ms  p95={p95:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
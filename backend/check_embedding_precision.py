@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Accuracy report for compact embedding formats (float16 / int8) against float32
+
+Reads every embedding stored in faces.db (or a synthetic gallery with
+--synthetic N persons) and, for each format, re-encodes the gallery the way
+the server would:
+  - sqlite <fmt>: written with FACE_EMBEDDING_STORAGE=<fmt>, read back
+  - memory <fmt>: held resident with FACE_GALLERY_DTYPE=<fmt>
+Each stored embedding is then used as a float32 query against the rest of
+the gallery (leave-one-out), and the report shows top-1 agreement with
+float32, accept/reject agreement at FACE_SIM_THRESHOLD, score error and
+bytes per embedding.
+
+Usage: python check_embedding_precision.py [--queries 2000] [--synthetic 5000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import main
+
+
+def synthetic_gallery(persons, rows_per_person, rng):
+    centers = rng.standard_normal((persons, 512)).astype(np.float32)
+    mat = main._normalize_rows(np.repeat(centers, rows_per_person, axis=0)
+                               + 0.6 * rng.standard_normal((persons * rows_per_person, 512)).astype(np.float32))
+    ids = [f"person_{i // rows_per_person}" for i in range(persons * rows_per_person)]
+    return ids, mat
+
+
+def stored_gallery():
+    main.init_db()
+    emb_col = main.embedding_column()
+    conn = main.get_conn()
+    cur = conn.cursor()
+    rows = []
+    if emb_col:
+        cur.execute(f"SELECT person_id, {emb_col} FROM embeddings ORDER BY id")
+        rows = [(pid, vec) for pid, vec in cur.fetchall() if vec]
+    conn.close()
+    if not rows:
+        return [], np.zeros((0, 512), dtype=np.float32)
+    return [pid for pid, _ in rows], main._normalize_rows(np.stack([main.decode_embedding(v) for _, v in rows]))
+
+
+def leave_one_out(queries, picks, gallery):
+    sims = main.gallery_scores(queries, gallery)
+    sims[np.arange(len(picks)), picks] = -np.inf
+    best = np.argmax(sims, axis=1)
+    return best, sims[np.arange(len(best)), best]
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="synthetic persons instead of faces.db")
+    parser.add_argument("--rows-per-person", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        ids, ref = synthetic_gallery(args.synthetic, args.rows_per_person, rng)
+        source = f"synthetic ({args.synthetic} persons x {args.rows_per_person})"
+    else:
+        ids, ref = stored_gallery()
+        source = f"faces.db ({len(ids)} embeddings, {len(set(ids))} persons)"
+    if len(ids) < 2:
+        print("❌ Need at least two stored embeddings; enroll people or pass --synthetic N")
+        return 1
+
+    picks = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    queries = ref[picks]
+    ref_best, ref_scores = leave_one_out(queries, picks, ref)
+    ref_accept = ref_scores >= main.THRESHOLD
+
+    variants = [("float32", ref)]
+    for fmt in ("float16", "int8"):
+        decoded = np.stack([main.decode_embedding(main.encode_embedding(v, fmt)) for v in ref])
+        variants.append((f"sqlite {fmt}", main._normalize_rows(decoded)))
+    for fmt in ("float16", "int8"):
+        variants.append((f"memory {fmt}", main.to_gallery_dtype(ref, fmt)))
+
+    print("=" * 60)
+    print("🗜️  EMBEDDING PRECISION CHECK")
+    print("=" * 60)
+    print(f"Gallery: {source}  Queries: {len(picks)} (leave-one-out)")
+    clipped = float(np.mean(np.abs(ref) > main.GALLERY_INT8_RANGE))
+    print(f"int8 gallery range: +-{main.GALLERY_INT8_RANGE}  components clipped: {100 * clipped:.4f}%")
+    print()
+    print(f"{'format':>15s} {'bytes/emb':>9s} {'top-1':>7s} {'decision':>8s} {'mean err':>9s} {'max err':>8s} {'ms':>7s}")
+    for label, gallery in variants:
+        t0 = time.perf_counter()
+        best, scores = leave_one_out(queries, picks, gallery)
+        ms = (time.perf_counter() - t0) * 1000
+        same = np.array([ids[a] == ids[b] for a, b in zip(ref_best, best)])
+        accept = scores >= main.THRESHOLD
+        decision = np.mean((accept == ref_accept) & (~ref_accept | same))
+        err = np.abs(scores - ref_scores)
+        if label.startswith("sqlite"):
+            size = len(main.encode_embedding(ref[0], label.split()[1]))
+        else:
+            size = gallery.itemsize * gallery.shape[1]
+        print(f"{label:>15s} {size:9d} {same.mean():7.4f} {decision:8.4f} {err.mean():9.5f} {err.max():8.5f} {ms:7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
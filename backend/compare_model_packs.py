@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Compare two model packs (e.g. buffalo_l vs buffalo_l_int8) on stored face crops
+
+Replays backend/test_reports/*/faces crops through both packs. Each crop is
+aligned once with the baseline detector, so both recognizers see identical
+input. The script then reports:
+  - embedding cosine drift (1 - cos(baseline, candidate))
+  - top-1 agreement against the enrolled gallery in faces.db (or leave-one-out
+    among the crops when the gallery is empty), plus accept/reject agreement
+    at FACE_SIM_THRESHOLD
+  - detector agreement (same face found, IoU >= 0.5)
+  - per-call detector and recognizer latency
+
+Usage: python compare_model_packs.py --candidate-pack buffalo_l_int8
+                                     [--candidate-root DIR] [--baseline-pack buffalo_l]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import main
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_crops(faces_glob, limit):
+    paths = sorted(p for ext in ("jpg", "png") for p in glob.glob(os.path.join(faces_glob, "**", f"*.{ext}"), recursive=True))
+    return [(p, main.pil_to_ndarray(Image.open(p).convert("RGB"))) for p in paths[:limit]]
+
+
+def load_pack(pack, root):
+    kwargs = {"root": root} if root else {}
+    fa = main.FaceAnalysis(name=pack, providers=["CPUExecutionProvider"],
+                           allowed_modules=["detection", "recognition"], **kwargs)
+    fa.prepare(ctx_id=-1, det_size=(main.DET_SIZES[0], main.DET_SIZES[0]))
+    main.apply_session_options(fa, main.ORT_SETTINGS)
+    return fa
+
+
+def pad(crop):
+    # Report crops are tight boxes; give the detector some context around the face
+    h, w = crop.shape[:2]
+    return cv2.copyMakeBorder(crop, h // 2, h // 2, w // 2, w // 2, cv2.BORDER_REPLICATE)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def best_face(det_out):
+    bboxes, kpss = det_out
+    if bboxes.shape[0] == 0:
+        return None, None
+    i = int(np.argmax(bboxes[:, 4]))
+    return bboxes[i], kpss[i] if kpss is not None else None
+
+
+def top1(queries, gallery_ids, gallery_mat):
+    sims = queries @ gallery_mat.T
+    idx = np.argmax(sims, axis=1)
+    return [gallery_ids[i] for i in idx], sims[np.arange(len(idx)), idx]
+
+
+def leave_one_out(embs):
+    sims = embs @ embs.T
+    np.fill_diagonal(sims, -np.inf)
+    idx = np.argmax(sims, axis=1)
+    return list(idx), sims[np.arange(len(idx)), idx]
+
+
+def summarize(label, samples):
+    if not samples:
+        return f"   {label:28s} n/a"
+    return f"   {label:28s} p50={statistics.median(samples):7.2f} ms  p95={np.percentile(samples, 95):7.2f} ms"
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline-pack", default="buffalo_l")
+    parser.add_argument("--baseline-root", default=None)
+    parser.add_argument("--candidate-pack", default="buffalo_l_int8")
+    parser.add_argument("--candidate-root", default=None)
+    parser.add_argument("--faces", default=os.path.join(BACKEND_DIR, "test_reports"))
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    crops = load_crops(args.faces, args.limit)
+    if not crops:
+        print(f"❌ No face crops found under {args.faces}")
+        return 1
+
+    base = load_pack(args.baseline_pack, args.baseline_root)
+    cand = load_pack(args.candidate_pack, args.candidate_root)
+    size = (main.DET_SIZES[0], main.DET_SIZES[0])
+
+    print("=" * 60)
+    print("🧪 MODEL PACK COMPARISON")
+    print("=" * 60)
+    print(f"Baseline:  {args.baseline_pack} ({args.baseline_root or 'default root'})")
+    print(f"Candidate: {args.candidate_pack} ({args.candidate_root or 'default root'})")
+    print(f"Crops: {len(crops)}")
+    print()
+
+    lat = {"base_det": [], "cand_det": [], "base_rec": [], "cand_rec": []}
+    base_embs, cand_embs = [], []
+    det_found = det_agree = 0
+    for _, crop in crops:
+        img = pad(crop)
+        base_out, ms = timed(base.det_model.detect, img, size, 0, 'default')
+        lat["base_det"].append(ms)
+        cand_out, ms = timed(cand.det_model.detect, img, size, 0, 'default')
+        lat["cand_det"].append(ms)
+        base_box, base_kps = best_face(base_out)
+        cand_box, _ = best_face(cand_out)
+        if base_box is not None:
+            det_found += 1
+            if cand_box is not None and main._iou(base_box[:4], cand_box[:4]) >= 0.5:
+                det_agree += 1
+
+        aligned = main.align_face(img, base_kps) if base_kps is not None else cv2.resize(crop, (112, 112))
+        feat, ms = timed(base.models["recognition"].get_feat, [aligned])
+        lat["base_rec"].append(ms)
+        base_embs.append(feat[0])
+        feat, ms = timed(cand.models["recognition"].get_feat, [aligned])
+        lat["cand_rec"].append(ms)
+        cand_embs.append(feat[0])
+
+    base_embs = main._normalize_rows(np.asarray(base_embs, dtype=np.float32))
+    cand_embs = main._normalize_rows(np.asarray(cand_embs, dtype=np.float32))
+    drift = 1.0 - np.sum(base_embs * cand_embs, axis=1)
+
+    print("📐 Embedding drift (1 - cosine):")
+    print(f"   mean={drift.mean():.4f}  p95={np.percentile(drift, 95):.4f}  max={drift.max():.4f}")
+    print()
+
+    main.init_db()
+    main.GALLERY.load()
+    gallery_ids, gallery_mat = main.GALLERY.snapshot()
+    if len(gallery_ids):
+        source = f"enrolled gallery ({len(main.GALLERY)} people, {len(gallery_ids)} embeddings)"
+        base_top, base_scores = top1(base_embs, gallery_ids, gallery_mat)
+        cand_top, cand_scores = top1(cand_embs, gallery_ids, gallery_mat)
+    else:
+        source = "leave-one-out among crops (gallery empty)"
+        base_top, base_scores = leave_one_out(base_embs)
+        cand_top, cand_scores = leave_one_out(cand_embs)
+    agree = sum(1 for b, c in zip(base_top, cand_top) if b == c)
+    base_accept = base_scores >= main.THRESHOLD
+    cand_accept = cand_scores >= main.THRESHOLD
+    decision = sum(1 for b, c, ba, ca in zip(base_top, cand_top, base_accept, cand_accept)
+                   if ba == ca and (not ba or b == c))
+
+    print(f"🎯 Top-1 agreement vs {source}:")
+    print(f"   top-1 identical:          {agree}/{len(crops)} ({100 * agree / len(crops):.1f}%)")
+    print(f"   decision identical @{main.THRESHOLD:.2f}: {decision}/{len(crops)} ({100 * decision / len(crops):.1f}%)")
+    print()
+
+    print("🔎 Detector agreement:")
+    if det_found:
+        print(f"   baseline faces re-found by candidate: {det_agree}/{det_found} ({100 * det_agree / det_found:.1f}%)")
+    else:
+        print("   baseline found no faces")
+    print()
+
+    print("⏱️  Latency per call:")
+    print(summarize(f"{args.baseline_pack} detector", lat["base_det"]))
+    print(summarize(f"{args.candidate_pack} detector", lat["cand_det"]))
+    print(summarize(f"{args.baseline_pack} recognizer", lat["base_rec"]))
+    print(summarize(f"{args.candidate_pack} recognizer", lat["cand_rec"]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -1,19 +1,38 @@
+import asyncio
 import base64
+import copy
+import functools
+import hashlib
+import heapq
 import io
+import itertools
 import json
+import math
+import multiprocessing
 import os
+import re
 import sqlite3
+import threading
 import time
 import uuid
-from typing import List, Optional, Tuple
-
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple, Type, get_args, get_origin
+
+import cv2
 import numpy as np
-from fastapi import FastAPI, HTTPException, File, UploadFile, Request
+import onnxruntime as ort
+from fastapi import Depends, FastAPI, HTTPException, File, UploadFile, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from PIL import Image
+from pydantic import BaseModel, ValidationError
+from PIL import Image, ImageOps
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -24,45 +43,42 @@ env_path = backend_dir / '.env'
 load_dotenv(dotenv_path=env_path)
 
 # ---------------- Photo quality helpers ----------------
-def _to_grayscale(arr: np.ndarray) -> np.ndarray:
-    if arr.ndim == 3 and arr.shape[2] == 3:
-        return (0.299 * arr[:, :, 0] + 0.587 * arr[:, :, 1] + 0.114 * arr[:, :, 2]).astype(np.float32)
-    if arr.ndim == 2:
-        return arr.astype(np.float32)
-    if arr.ndim == 3 and arr.shape[2] == 4:
-        rgb = arr[:, :, :3]
-        return (0.299 * rgb[:, :, 0] + 0.587 * rgb[:, :, 1] + 0.114 * rgb[:, :, 2]).astype(np.float32)
-    return arr.astype(np.float32)
-
-def _variance_of_laplacian(gray: np.ndarray) -> float:
-    # Simple Laplacian kernel convolution
-    k = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]], dtype=np.float32)
-    # pad
-    g = gray
-    pad = np.pad(g, ((1,1),(1,1)), mode='reflect')
-    out = (
-        k[0,0]*pad[0:-2,0:-2] + k[0,1]*pad[0:-2,1:-1] + k[0,2]*pad[0:-2,2:] +
-        k[1,0]*pad[1:-1,0:-2] + k[1,1]*pad[1:-1,1:-1] + k[1,2]*pad[1:-1,2:] +
-        k[2,0]*pad[2:,0:-2] + k[2,1]*pad[2:,1:-1] + k[2,2]*pad[2:,2:]
-    )
-    return float(out.var())
-
-def _compute_quality_metrics(img_pil: Image.Image, face_bbox: Tuple[float,float,float,float], kps: Optional[np.ndarray]) -> dict:
-    x1, y1, x2, y2 = face_bbox
-    w, h = img_pil.size
-    # Clamp bbox
+# Works on the decoded BGR ndarray at source resolution (IngestedImage.full);
+# OpenCV reads the crop in place (a view) with no PIL round trip. Faces are
+# not downscaled first: the variance of the Laplacian is resolution
+# dependent, and a downscaled blurry face reads far sharper than it is
+# (up to ~250x for a 1500 px face), which would slip past the threshold.
+# Enrollment thresholds (_quality_pass); /validate-face scores against the same ones
+QUALITY_MIN_FACE_PX = 120
+QUALITY_MIN_SHARPNESS = 100
+QUALITY_BRIGHTNESS_RANGE = (60, 200)
+QUALITY_MIN_CONTRAST = 30
+QUALITY_MAX_ROLL = 10
+
+
+def _quality_gray(img: np.ndarray, bbox: Tuple[float, float, float, float]) -> np.ndarray:
+    """Grayscale float32 face crop."""
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = (int(v) for v in bbox)
     x1 = max(0, min(w, x1)); x2 = max(0, min(w, x2))
     y1 = max(0, min(h, y1)); y2 = max(0, min(h, y2))
-    if x2 <= x1 or y2 <= y1:
-        crop = img_pil
-    else:
-        crop = img_pil.crop((int(x1), int(y1), int(x2), int(y2)))
-    arr = np.asarray(crop)
-    gray = _to_grayscale(arr)
-    face_width = float(x2 - x1)
-    sharpness = _variance_of_laplacian(gray)
-    brightness = float(gray.mean())
-    contrast = float(gray.std())
+    crop = img[y1:y2, x1:x2] if x2 > x1 and y2 > y1 else img
+    crop = crop.astype(np.float32)  # before graying, so rounding does not add Laplacian noise
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGRA2GRAY if crop.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    return crop
+
+
+def _face_quality_metrics(img: np.ndarray, bbox: Tuple[float, float, float, float],
+                          kps: Optional[np.ndarray], scale: float = 1.0) -> dict:
+    """Sharpness (variance of the Laplacian), brightness, contrast and roll of one face.
+
+    ``bbox`` is in source pixels; ``scale`` maps them onto ``img`` (the scale of IngestedImage.full).
+    """
+    gray = _quality_gray(img, tuple(v * scale for v in bbox))
+    mean, std = cv2.meanStdDev(gray)
+    # 4-neighbour Laplacian (reflected borders), mean and spread in one pass each
+    _, lap_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F, ksize=1))
     # Simple roll proxy from eye points if available (kps shape (5,2))
     roll_abs = None
     if kps is not None and isinstance(kps, np.ndarray) and kps.shape[0] >= 2:
@@ -70,15 +86,23 @@ def _compute_quality_metrics(img_pil: Image.Image, face_bbox: Tuple[float,float,
         dx = float(right_eye[0] - left_eye[0])
         dy = float(right_eye[1] - left_eye[1])
         if dx != 0:
-            roll_abs = abs(np.degrees(np.arctan2(dy, dx)))
+            roll_abs = abs(float(np.degrees(np.arctan2(dy, dx))))
+    x1, _, x2, _ = bbox
     return {
-        "face_width_px": face_width,
-        "sharpness": sharpness,
-        "brightness": brightness,
-        "contrast": contrast,
+        "face_width_px": max(0.0, float(min(x2, img.shape[1] / scale) - max(x1, 0))),
+        "sharpness": float(lap_std[0, 0]) ** 2,
+        "brightness": float(mean[0, 0]),
+        "contrast": float(std[0, 0]),
         "roll_abs": roll_abs,
     }
 
+
+def _frame_quality_metrics(img: np.ndarray, faces: list, scale: float = 1.0) -> List[dict]:
+    """Quality metrics for every detected face in a frame, in ``faces`` order."""
+    return [_face_quality_metrics(img, tuple(map(float, f.bbox[:4])), getattr(f, "kps", None), scale)
+            for f in faces]
+
+
 def _quality_pass(metrics: dict) -> Tuple[bool, List[str]]:
     reasons: List[str] = []
     face_width = metrics.get("face_width_px", 0.0)
@@ -88,21 +112,23 @@ def _quality_pass(metrics: dict) -> Tuple[bool, List[str]]:
     roll_abs = metrics.get("roll_abs", None)
     ok = True
     # thresholds
-    if face_width < 120:
-        ok = False; reasons.append("Face too small (<120 px)")
-    if sharp < 100:
+    if face_width < QUALITY_MIN_FACE_PX:
+        ok = False; reasons.append(f"Face too small (<{QUALITY_MIN_FACE_PX} px)")
+    if sharp < QUALITY_MIN_SHARPNESS:
         ok = False; reasons.append("Too blurry (low sharpness)")
-    if not (60 <= bright <= 200):
+    if not (QUALITY_BRIGHTNESS_RANGE[0] <= bright <= QUALITY_BRIGHTNESS_RANGE[1]):
         ok = False; reasons.append("Lighting issue (too dark/bright)")
-    if contr < 30:
+    if contr < QUALITY_MIN_CONTRAST:
         ok = False; reasons.append("Low contrast")
-    if roll_abs is not None and roll_abs > 10:
+    if roll_abs is not None and roll_abs > QUALITY_MAX_ROLL:
         reasons.append("Turn head straighter (reduce roll)")
     return ok, reasons
 
 # Try installed InsightFace first; fallback to local source if needed
 try:
     from insightface.app import FaceAnalysis  # site-packages
+    from insightface.app.common import Face
+    from insightface.utils import face_align
 except Exception:
     try:
         import sys
@@ -110,6 +136,8 @@ except Exception:
         if os.path.isdir(LOCAL_INSIGHTFACE) and LOCAL_INSIGHTFACE not in sys.path:
             sys.path.insert(0, LOCAL_INSIGHTFACE)
         from insightface.app import FaceAnalysis  # local fallback
+        from insightface.app.common import Face
+        from insightface.utils import face_align
     except Exception as e:
         raise RuntimeError(
             f"Failed to import insightface (installed or local) from '{LOCAL_INSIGHTFACE}': {e}. "
@@ -161,15 +189,115 @@ else:
     logger.warning("⚠️  Supabase credentials not found in environment variables")
 
 face_app: Optional[FaceAnalysis] = None
+# Pack loaded at startup; point these at e.g. a quantized copy (see quantize_model_pack.py)
+MODEL_PACK = os.environ.get("FACE_MODEL_PACK", "buffalo_l")
+MODEL_ROOT = os.environ.get("FACE_MODEL_ROOT") or None
+# (model_pack, model_root) of the live face_app
+loaded_pack: Optional[Tuple[str, Optional[str]]] = None
+
+# -----------------------
+# ONNX Runtime session tuning
+# -----------------------
+_GRAPH_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+_EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def _env_flag(name: str) -> Optional[bool]:
+    value = os.environ.get(name)
+    return None if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else None
+
+
+# None means "leave the ONNX Runtime default"
+ORT_SETTINGS = {
+    "intra_op_threads": _env_int("FACE_ORT_INTRA_OP_THREADS"),
+    "inter_op_threads": _env_int("FACE_ORT_INTER_OP_THREADS"),
+    "graph_optimization": os.environ.get("FACE_ORT_GRAPH_OPT") or None,
+    "execution_mode": os.environ.get("FACE_ORT_EXECUTION_MODE") or None,
+    "enable_cpu_mem_arena": _env_flag("FACE_ORT_CPU_MEM_ARENA"),
+    "enable_mem_pattern": _env_flag("FACE_ORT_MEM_PATTERN"),
+}
+
+
+def build_session_options(settings: dict) -> ort.SessionOptions:
+    opts = ort.SessionOptions()
+    if settings.get("intra_op_threads") is not None:
+        opts.intra_op_num_threads = int(settings["intra_op_threads"])
+    if settings.get("inter_op_threads") is not None:
+        opts.inter_op_num_threads = int(settings["inter_op_threads"])
+    if settings.get("graph_optimization"):
+        level = settings["graph_optimization"].lower()
+        if level not in _GRAPH_OPT_LEVELS:
+            raise ValueError(f"graph_optimization must be one of {sorted(_GRAPH_OPT_LEVELS)}")
+        opts.graph_optimization_level = _GRAPH_OPT_LEVELS[level]
+    if settings.get("execution_mode"):
+        mode = settings["execution_mode"].lower()
+        if mode not in _EXECUTION_MODES:
+            raise ValueError(f"execution_mode must be one of {sorted(_EXECUTION_MODES)}")
+        opts.execution_mode = _EXECUTION_MODES[mode]
+    if settings.get("enable_cpu_mem_arena") is not None:
+        opts.enable_cpu_mem_arena = bool(settings["enable_cpu_mem_arena"])
+    if settings.get("enable_mem_pattern") is not None:
+        opts.enable_mem_pattern = bool(settings["enable_mem_pattern"])
+    return opts
+
+
+def apply_session_options(fa, settings: dict):
+    """Recreate every model session in ``fa`` with the given settings.
+
+    insightface only forwards providers to InferenceSession, so tuned
+    sessions are swapped in after the pack has been loaded and prepared.
+    """
+    if all(v is None for v in settings.values()):
+        return
+    opts = build_session_options(settings)
+    for task, model in fa.models.items():
+        providers = model.session.get_providers()
+        model.session = ort.InferenceSession(model.model_file, sess_options=opts, providers=providers)
+    logger.info(f"⚙️  ONNX Runtime sessions tuned: {settings}")
+
+
+def ort_effective_settings(fa) -> dict:
+    """What the loaded sessions actually run with, for /health."""
+    if fa is None:
+        return {}
+    out = {}
+    for task, model in fa.models.items():
+        sess = model.session
+        opts = sess.get_session_options()
+        out[task] = {
+            "model": os.path.basename(model.model_file),
+            "providers": sess.get_providers(),
+            "intra_op_threads": opts.intra_op_num_threads,
+            "inter_op_threads": opts.inter_op_num_threads,
+            "graph_optimization": next((k for k, v in _GRAPH_OPT_LEVELS.items() if v == opts.graph_optimization_level), None),
+            "execution_mode": next((k for k, v in _EXECUTION_MODES.items() if v == opts.execution_mode), None),
+            "enable_cpu_mem_arena": opts.enable_cpu_mem_arena,
+            "enable_mem_pattern": opts.enable_mem_pattern,
+        }
+    return out
+
 
 # Auto-initialize face recognition on startup
 @app.on_event("startup")
 async def startup_event():
     """Auto-initialize face recognition model on server startup"""
-    global face_app
+    global face_app, loaded_pack
     if face_app is None:
         try:
-            logger.info("🤖 Auto-initializing face recognition model...")
+            logger.info(f"🤖 Auto-initializing face recognition model ({MODEL_PACK})...")
             # Try installed InsightFace first; fallback to local source if needed
             try:
                 from insightface.app import FaceAnalysis  # site-packages
@@ -181,84 +309,238 @@ async def startup_event():
                     sys.path.insert(0, local_insightface)
                     from insightface.app import FaceAnalysis  # local fallback
             
-            fa = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
+            kwargs = {"root": MODEL_ROOT} if MODEL_ROOT else {}
+            fa = FaceAnalysis(name=MODEL_PACK, providers=['CPUExecutionProvider'], **kwargs)
             fa.prepare(ctx_id=-1, det_size=(640, 640))
+            apply_session_options(fa, ORT_SETTINGS)
             face_app = fa
+            loaded_pack = (MODEL_PACK, MODEL_ROOT)
             logger.info("✅ Face recognition model initialized successfully!")
+            start_inference_pool(INFERENCE_WORKERS)
         except Exception as e:
             logger.error(f"⚠️  Failed to auto-initialize face recognition: {e}")
             logger.warning("⚠️  Face recognition will need to be initialized manually via /init endpoint")
+    try:
+        # A snapshot that still matches faces.db is mapped without reading SQLite
+        opened = SNAPSHOT is not None and SNAPSHOT.open()
+        init_db()
+        if not opened:
+            GALLERY.load()
+        if SNAPSHOT is not None:
+            SNAPSHOT.start()
+    except Exception as e:
+        logger.error(f"⚠️  Failed to load embedding gallery: {e}")
 
 # -----------------------
 # Test report infrastructure
 # -----------------------
-TEST_REPORTS_ROOT = os.path.join(os.path.dirname(__file__), "test_reports")
+TEST_REPORTS_ROOT = os.environ.get("FACE_TEST_REPORTS_DIR", os.path.join(os.path.dirname(__file__), "test_reports"))
 os.makedirs(TEST_REPORTS_ROOT, exist_ok=True)
 
-# In-memory tracking per report_id
-# report_state: {
+# Reports live on disk: every event is appended to <report>/events.jsonl as
+# it happens, and the counters are checkpointed to <report>/state.json every
+# REPORT_CHECKPOINT_EVENTS events or REPORT_CHECKPOINT_SECONDS. Memory only
+# holds reports in progress, with the last REPORT_RECENT_EVENTS events (for
+# de-duplicating crops) and a window of recent frame timestamps. Finalize
+# streams the log into summary.json and drops the report from memory; a
+# report resumed after a restart continues from its last checkpoint.
+# Reports idle for REPORT_IDLE_SECONDS are checkpointed and evicted too.
+# Callers may hold a state dict across its eviction (a WebSocket session, a
+# request in flight), so writes go through _live_report, which re-resolves a
+# closed state; a finalized report is never reopened.
+#
+# _report_state: {
 #   report_id: {
 #       "dir": str,
 #       "faces_known_dir": str,
 #       "faces_unknown_dir": str,
-#       "events": List[dict],
+#       "events": deque[dict],  # most recent only; the full list is events.jsonl
 #       "framesProcessed": int,
 #       "totalFacesDetected": int,
 #       "unknownFacesDetected": int,
 #       "peopleRecognized": set[str],
-#       "seen_ts": set[float],
-#       "video_name": Optional[str]
+#       "seen_ts": OrderedDict[float, None],  # last REPORT_SEEN_TS_WINDOW timestamps
+#       "video_name": Optional[str],
+#       "log": file, "lock": RLock, "closed": bool,
+#       "unsaved": int, "saved_at": float, "touched": float
 #   }
 # }
+REPORT_RECENT_EVENTS = 50
+REPORT_SEEN_TS_WINDOW = 4096
+REPORT_CHECKPOINT_EVENTS = 200
+REPORT_CHECKPOINT_SECONDS = 5.0
+REPORT_IDLE_SECONDS = float(os.environ.get("FACE_REPORT_IDLE_SECONDS", "900"))
+_REPORT_COUNTERS = ("framesProcessed", "totalFacesDetected", "unknownFacesDetected")
 _report_state = {}
+_report_state_lock = threading.Lock()
+
+
+def _report_paths(report_id: str) -> Tuple[str, str, str]:
+    report_dir = os.path.join(TEST_REPORTS_ROOT, report_id)
+    return report_dir, os.path.join(report_dir, "events.jsonl"), os.path.join(report_dir, "state.json")
+
+
+def _read_report_checkpoint(report_id: str) -> Optional[dict]:
+    try:
+        with open(_report_paths(report_id)[2]) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_report_checkpoint(report_id: str, checkpoint: dict):
+    path = _report_paths(report_id)[2]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def _checkpoint_report(state: dict, finalized: bool = False):
+    """Write the counters to state.json (atomically), after flushing the event log."""
+    with state["lock"]:
+        if state["closed"]:
+            return
+        state["log"].flush()
+        checkpoint = {name: state[name] for name in _REPORT_COUNTERS}
+        checkpoint.update({
+            "video_name": state["video_name"],
+            "peopleRecognized": sorted(state["peopleRecognized"]),
+            "log_bytes": state["log"].tell(),
+            "finalized": finalized,
+            "updated_at": time.time(),
+        })
+        _write_report_checkpoint(os.path.basename(state["dir"]), checkpoint)
+        state["unsaved"] = 0
+        state["saved_at"] = time.time()
+
+
+def _maybe_checkpoint(state: dict):
+    state["touched"] = time.time()
+    if (state["unsaved"] >= REPORT_CHECKPOINT_EVENTS
+            or state["touched"] - state["saved_at"] >= REPORT_CHECKPOINT_SECONDS):
+        _checkpoint_report(state)
+
+
+@contextmanager
+def _live_report(report: dict):
+    """Hold the lock of the open state for ``report``; yields None once the report is finalized."""
+    while True:
+        with report["lock"]:
+            if not report["closed"]:
+                yield report
+                return
+        try:
+            report = _ensure_report_dirs(os.path.basename(report["dir"]))
+        except HTTPException:
+            yield None
+            return
+
+
+def _count_report(report: dict, name: str, n: int = 1):
+    with _live_report(report) as live:
+        if live is not None:
+            live[name] += n
+
+
+def _evict_report(report_id: str, finalized: bool = False) -> Optional[dict]:
+    """Checkpoint a report, close its log and drop it from memory."""
+    # Under the registry lock, so nobody can reopen the report from a stale checkpoint meanwhile
+    with _report_state_lock:
+        state = _report_state.pop(report_id, None)
+        if state:
+            with state["lock"]:
+                _checkpoint_report(state, finalized)
+                state["log"].close()
+                state["closed"] = True
+        elif finalized:
+            checkpoint = _read_report_checkpoint(report_id)
+            if checkpoint and not checkpoint.get("finalized"):
+                checkpoint["finalized"] = True
+                _write_report_checkpoint(report_id, checkpoint)
+    return state
+
+
+def _frame_report(report_id: Optional[str]) -> Optional[dict]:
+    """Report state for a recognition request; None when there is no report or it is finalized.
+
+    Clients may keep sending the id of a finished report; their frames are
+    still recognized, just no longer recorded.
+    """
+    if not report_id:
+        return None
+    try:
+        return _ensure_report_dirs(report_id)
+    except HTTPException as e:
+        if e.status_code != 409:
+            raise
+        return None
+
 
 def _ensure_report_dirs(report_id: str) -> dict:
     state = _report_state.get(report_id)
     if state:
         return state
-    report_dir = os.path.join(TEST_REPORTS_ROOT, report_id)
-    faces_known_dir = os.path.join(report_dir, "faces", "known")
-    faces_unknown_dir = os.path.join(report_dir, "faces", "unknown")
-    os.makedirs(faces_known_dir, exist_ok=True)
-    os.makedirs(faces_unknown_dir, exist_ok=True)
-    state = {
-        "dir": report_dir,
-        "faces_known_dir": faces_known_dir,
-        "faces_unknown_dir": faces_unknown_dir,
-        "events": [],
-        "framesProcessed": 0,
-        "totalFacesDetected": 0,
-        "unknownFacesDetected": 0,
-        "peopleRecognized": set(),
-        "seen_ts": set(),
-        "video_name": None,
-    }
-    _report_state[report_id] = state
+    with _report_state_lock:
+        state = _report_state.get(report_id)
+        if state:
+            return state
+        now = time.time()
+        idle = [rid for rid, st in _report_state.items() if now - st["touched"] > REPORT_IDLE_SECONDS]
+        report_dir, log_path, _ = _report_paths(report_id)
+        checkpoint = _read_report_checkpoint(report_id) or {}
+        if checkpoint.get("finalized"):
+            raise HTTPException(status_code=409, detail="Report already finalized")
+        faces_known_dir = os.path.join(report_dir, "faces", "known")
+        faces_unknown_dir = os.path.join(report_dir, "faces", "unknown")
+        os.makedirs(faces_known_dir, exist_ok=True)
+        os.makedirs(faces_unknown_dir, exist_ok=True)
+        if checkpoint.get("log_bytes") is not None and os.path.exists(log_path):
+            # Drop events written after the last checkpoint so the log matches its counters
+            with open(log_path, "r+") as f:
+                f.truncate(min(checkpoint["log_bytes"], os.path.getsize(log_path)))
+        state = {
+            "dir": report_dir,
+            "faces_known_dir": faces_known_dir,
+            "faces_unknown_dir": faces_unknown_dir,
+            "events": deque(maxlen=REPORT_RECENT_EVENTS),
+            "peopleRecognized": set(checkpoint.get("peopleRecognized", [])),
+            "seen_ts": OrderedDict(),
+            "video_name": checkpoint.get("video_name"),
+            "log": open(log_path, "a"),
+            "lock": threading.RLock(),
+            "closed": False,
+            "unsaved": 0,
+            "saved_at": now,
+            "touched": now,
+        }
+        for name in _REPORT_COUNTERS:
+            state[name] = checkpoint.get(name, 0)
+        if checkpoint:
+            logger.info(f"📝 Resumed test report {report_id} from its checkpoint")
+        _report_state[report_id] = state
+    for rid in idle:
+        _evict_report(rid)
+        logger.info(f"📝 Evicted idle test report {rid}")
     return state
 
 def _record_frame_seen(report: dict, ts: Optional[float]):
-    if ts is None:
-        report["framesProcessed"] += 1
-        return
-    # Only count unique timestamps once
-    if ts not in report["seen_ts"]:
-        report["seen_ts"].add(ts)
-        report["framesProcessed"] += 1
-
-def _save_face_crop(img_pil: Image.Image, bbox: Tuple[float, float, float, float], out_dir: str, prefix: str, person_name: str = None) -> str:
-    # bbox = (x1, y1, x2, y2)
-    x1, y1, x2, y2 = bbox
-    # Clamp to image bounds
-    w, h = img_pil.size
-    x1 = max(0, min(w, x1))
-    x2 = max(0, min(w, x2))
-    y1 = max(0, min(h, y1))
-    y2 = max(0, min(h, y2))
-    if x2 <= x1 or y2 <= y1:
-        # Fallback: save whole image if invalid crop
-        crop = img_pil
-    else:
-        crop = img_pil.crop((int(x1), int(y1), int(x2), int(y2)))
+    with _live_report(report) as report:
+        if report is None:
+            return
+        if ts is None:
+            report["framesProcessed"] += 1
+        # Only count unique timestamps once (frames arrive roughly in order, so a window suffices)
+        elif ts not in report["seen_ts"]:
+            report["seen_ts"][ts] = None
+            if len(report["seen_ts"]) > REPORT_SEEN_TS_WINDOW:
+                report["seen_ts"].popitem(last=False)
+            report["framesProcessed"] += 1
+    _maybe_checkpoint(report)
+
+def _save_face_crop(image: "IngestedImage", bbox: Tuple[float, float, float, float], out_dir: str, prefix: str, person_name: str = None) -> str:
+    # bbox = (x1, y1, x2, y2) in source pixels; falls back to the whole image if invalid
+    crop = image.crop(bbox)
     
     # Create descriptive filename with person name and timestamp
     if person_name:
@@ -285,20 +567,150 @@ def _save_face_crop(img_pil: Image.Image, bbox: Tuple[float, float, float, float
     return path
 
 def _append_event(report: dict, event: dict):
-    # Convert any non-serializable items (like sets) later at finalize
-    report["events"].append(event)
+    line = json.dumps(event) + "\n"
+    with _live_report(report) as report:
+        if report is None:
+            return
+        report["log"].write(line)
+        report["events"].append(event)
+        report["unsaved"] += 1
+    _maybe_checkpoint(report)
+
+
+def _iter_report_events(report_id: str):
+    """Stream a report's events from its log; a torn last line (crash mid-write) is skipped."""
+    try:
+        f = open(_report_paths(report_id)[1])
+    except OSError:
+        return
+    with f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _write_report_summary(report_id: str, checkpoint: dict) -> str:
+    """Write summary.json by streaming events.jsonl; returns its path."""
+    report_dir = _report_paths(report_id)[0]
+    head = {
+        "videoName": checkpoint.get("video_name"),
+        "peopleRecognized": checkpoint.get("peopleRecognized", []),
+    }
+    head.update({name: checkpoint.get(name, 0) for name in _REPORT_COUNTERS})
+    path = os.path.join(report_dir, "summary.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(json.dumps(head, indent=2)[:-2] + ',\n  "details": [')
+        for n, event in enumerate(_iter_report_events(report_id)):
+            f.write(",\n" if n else "\n")
+            f.write("\n".join("    " + line for line in json.dumps(event, indent=2).splitlines()))
+        f.write("\n  ]\n}\n")
+    os.replace(tmp, path)
+    return path
+
+
+
+# -----------------------
+# SQLite access
+# -----------------------
+# Connections are pooled per thread: get_conn() hands out an idle connection
+# of the calling thread (opening one if there is none), and close() puts it
+# back. Nested get_conn() calls still get separate connections, as before.
+# Long-lived connections also keep sqlite3's prepared statement cache warm.
+SQLITE_POOL_IDLE = 4  # idle connections kept per thread
+SQLITE_STATEMENT_CACHE = 256
+_sqlite_local = threading.local()
+_sqlite_opened = 0
+
+
+class PooledConnection:
+    """A pooled ``sqlite3.Connection``.
 
+    ``close()`` rolls back anything left uncommitted, as closing would, and
+    returns the connection to its thread's pool.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, path: str):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_path", path)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
 
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, "_conn", None)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            conn.close()
+            return
+        idle = _idle_connections(self._path)
+        if len(idle) < SQLITE_POOL_IDLE:
+            idle.append(conn)
+        else:
+            conn.close()
+
+
+def _idle_connections(path: str) -> list:
+    pools = getattr(_sqlite_local, "pools", None)
+    if pools is None:
+        pools = _sqlite_local.pools = {}
+    return pools.setdefault(path, [])
+
+
+def get_conn() -> PooledConnection:
+    global _sqlite_opened
+    idle = _idle_connections(DB_PATH)
+    if idle:
+        return PooledConnection(idle.pop(), DB_PATH)
+    conn = sqlite3.connect(DB_PATH, cached_statements=SQLITE_STATEMENT_CACHE)
     conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+    _sqlite_opened += 1
+    return PooledConnection(conn, DB_PATH)
 
 
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+# Column lists per (database, table), read once; init_db() resets them
+_table_columns: dict = {}
+
+
+def table_columns(table: str) -> List[str]:
+    key = (DB_PATH, table)
+    cols = _table_columns.get(key)
+    if cols is None:
+        conn = get_conn()
+        try:
+            cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        finally:
+            conn.close()
+        _table_columns[key] = cols
+    return cols
+
+
+def embedding_column() -> Optional[str]:
+    """Column holding embedding blobs: ``embedding`` or, on old databases, ``vector``."""
+    cols = table_columns("embeddings")
+    return "embedding" if "embedding" in cols else ("vector" if "vector" in cols else None)
+
+
+def _migrate_base_schema(cur: sqlite3.Cursor):
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS persons (
@@ -380,8 +792,182 @@ def init_db():
             cur.execute("ALTER TABLE groups ADD COLUMN notes TEXT")
     except Exception:
         pass
-    conn.commit()
-    conn.close()
+
+
+def _migrate_lookup_indexes(cur: sqlite3.Cursor):
+    # Per-person reads and deletes (enroll, refresh, delete) and the
+    # person -> groups direction of group_members; its primary key only
+    # covers lookups by group_id.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_person_id ON embeddings(person_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_group_members_person_id ON group_members(person_id)")
+
+
+def _migrate_change_counters(cur: sqlite3.Cursor):
+    # One counter per listing, bumped by triggers, so every writer (other
+    # workers, sync scripts) invalidates ETags without the app tracking it.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cur.execute("INSERT OR IGNORE INTO change_counters(name, version) VALUES ('groups', 0)")
+    for table in ("groups", "group_members"):
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_counter AFTER {op} ON {table}
+                BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE name = 'groups';
+                END
+                """
+            )
+
+
+def _migrate_person_revisions(cur: sqlite3.Cursor):
+    # Every write to persons stamps the row with the next 'persons' counter
+    # value; deletes leave a tombstone at that revision. /people?changes_since
+    # reads both, so clients can sync the roster in O(changes).
+    cur.execute("PRAGMA table_info(persons)")
+    if "revision" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE persons ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS person_tombstones (
+            person_id TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_persons_revision ON persons(revision)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_person_tombstones_revision ON person_tombstones(revision)")
+    cur.execute("INSERT OR IGNORE INTO change_counters(name, version) VALUES ('persons', 0)")
+    # Existing people get distinct revisions (their rowid) so feed pages never split a revision
+    cur.execute("UPDATE persons SET revision = rowid")
+    cur.execute(
+        "UPDATE change_counters SET version = (SELECT COALESCE(MAX(revision), 0) FROM persons) WHERE name = 'persons'"
+    )
+    bump = "UPDATE change_counters SET version = version + 1 WHERE name = 'persons';"
+    current = "(SELECT version FROM change_counters WHERE name = 'persons')"
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_persons_insert_revision AFTER INSERT ON persons
+        BEGIN
+            {bump}
+            UPDATE persons SET revision = {current} WHERE rowid = NEW.rowid;
+            DELETE FROM person_tombstones WHERE person_id = NEW.person_id;
+        END
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_persons_update_revision AFTER UPDATE ON persons
+        WHEN NEW.revision = OLD.revision
+        BEGIN
+            {bump}
+            UPDATE persons SET revision = {current} WHERE rowid = NEW.rowid;
+        END
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_persons_delete_revision AFTER DELETE ON persons
+        BEGIN
+            {bump}
+            INSERT OR REPLACE INTO person_tombstones(person_id, revision) VALUES (OLD.person_id, {current});
+        END
+        """
+    )
+
+
+def _migrate_photos_table(cur: sqlite3.Cursor):
+    # One row per (person, photo) instead of rewriting the persons.photo_paths
+    # JSON on every upload/delete. Inserts and deletes stamp the person with a
+    # new revision so /people?changes_since still sees photo changes.
+    # persons.photo_paths is copied over once and no longer written.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS photos (
+            person_id TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            sha256 TEXT,
+            bytes INTEGER,
+            width INTEGER,
+            height INTEGER,
+            created_at REAL,
+            PRIMARY KEY (person_id, filename),
+            FOREIGN KEY (person_id) REFERENCES persons(person_id)
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_photos_sha256 ON photos(sha256)")
+    cur.execute(
+        """
+        INSERT OR IGNORE INTO photos(person_id, filename)
+        SELECT p.person_id, j.value FROM persons p, json_each(p.photo_paths) j
+        WHERE json_valid(p.photo_paths) AND j.type = 'text'
+        ORDER BY p.person_id, j.key
+        """
+    )
+    bump = "UPDATE change_counters SET version = version + 1 WHERE name = 'persons';"
+    current = "(SELECT version FROM change_counters WHERE name = 'persons')"
+    for op, row in (("INSERT", "NEW"), ("DELETE", "OLD")):
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_photos_{op.lower()}_revision AFTER {op} ON photos
+            BEGIN
+                {bump}
+                UPDATE persons SET revision = {current} WHERE person_id = {row}.person_id;
+            END
+            """
+        )
+
+
+# Schema migrations in order; PRAGMA user_version records how many have run.
+# Only append: databases already at version N skip the first N entries.
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_lookup_indexes,
+    _migrate_change_counters,
+    _migrate_person_revisions,
+    _migrate_photos_table,
+]
+
+
+def change_counter(name: str) -> int:
+    """Current value of a ``change_counters`` entry; changes after every write to what it covers."""
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT version FROM change_counters WHERE name = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+def schema_version() -> int:
+    conn = get_conn()
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def init_db():
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        for number, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+            migrate(cur)
+            cur.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+            logger.info(f"🗄️  Database schema migrated to version {number}")
+    finally:
+        conn.close()
+    for key in [k for k in _table_columns if k[0] == DB_PATH]:
+        del _table_columns[key]
 
 
 class InitRequest(BaseModel):
@@ -391,39 +977,262 @@ class InitRequest(BaseModel):
     # Optional: force models to be loaded from a local root only (no auto-download)
     model_root: Optional[str] = None
     offline_only: bool = False
+    # ONNX Runtime session options (override the FACE_ORT_* environment variables)
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+    graph_optimization: Optional[str] = None  # disable | basic | extended | all
+    execution_mode: Optional[str] = None  # sequential | parallel
+    enable_cpu_mem_arena: Optional[bool] = None
+    enable_mem_pattern: Optional[bool] = None
+    # Worker processes for inference (overrides FACE_INFERENCE_WORKERS; 0 = in-process)
+    inference_workers: Optional[int] = None
 
 
-class EnrollRequest(BaseModel):
+class ImageRequest(BaseModel):
+    image: str  # dataURL or base64; empty when the image arrived as raw bytes
+    det_size: Optional[int] = None  # detector input size hint; adaptive when omitted
+    # Raw JPEG/PNG bytes from an octet-stream or multipart upload (see image_body)
+    _image_bytes: Optional[bytes] = None
+
+
+class EnrollRequest(ImageRequest):
     person_id: str
     person_name: str
-    image: str  # dataURL or base64
 
 
-class RecognizeRequest(BaseModel):
-    image: str  # dataURL or base64
+class RecognizeRequest(ImageRequest):
     filter_ids: Optional[List[str]] = None
     group_id: Optional[str] = None
     report_id: Optional[str] = None
     timestamp: Optional[float] = None
+    session_id: Optional[str] = None  # camera session for cross-frame tracking (off when absent)
 
 
-class DetectRequest(BaseModel):
-    image: str  # dataURL or base64
+class DetectRequest(ImageRequest):
+    pass
+
+
+def _is_list_field(annotation) -> bool:
+    if get_origin(annotation) in (list, List):
+        return True
+    return any(_is_list_field(a) for a in get_args(annotation))
+
+
+def _body_validation_error(e: ValidationError) -> RequestValidationError:
+    # Same shape FastAPI produces for a regular JSON body
+    return RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+
+def image_body(model: Type[ImageRequest]):
+    """Dependency that accepts ``model`` as JSON or the image as raw bytes.
+
+    Binary uploads are ``application/octet-stream`` / ``image/*`` bodies or
+    ``multipart/form-data`` with an ``image`` file part. The remaining fields
+    come from form fields, query params or ``X-Field-Name`` headers.
+    """
+    async def dependency(request: Request) -> ImageRequest:
+        ctype = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        raw: Optional[bytes] = None
+        fields: dict = {}
+        if ctype == "multipart/form-data":
+            form = await request.form()
+            for key, value in form.multi_items():
+                if key == "image" and hasattr(value, "read"):
+                    raw = await value.read()
+                else:
+                    field = model.model_fields.get(key)
+                    if field is not None and _is_list_field(field.annotation):
+                        fields.setdefault(key, []).append(value)
+                    else:
+                        fields[key] = value
+        elif ctype == "application/octet-stream" or ctype.startswith("image/"):
+            raw = await request.body()
+        else:
+            try:
+                data = await request.json()
+            except Exception:
+                raise HTTPException(status_code=400, detail="Expected a JSON body or raw image bytes")
+            try:
+                return model.model_validate(data)
+            except ValidationError as e:
+                raise _body_validation_error(e)
+
+        if raw is not None:
+            fields.pop("image", None)
+        if raw is None:
+            # multipart without a file part: allow a base64 "image" form field
+            if not fields.get("image"):
+                raise HTTPException(status_code=400, detail="Missing image")
+        elif not raw:
+            raise HTTPException(status_code=400, detail="Empty image body")
+
+        for name, field in model.model_fields.items():
+            if name == "image" or name in fields:
+                continue
+            header = "x-" + name.replace("_", "-")
+            if _is_list_field(field.annotation):
+                values = request.query_params.getlist(name) or ([request.headers[header]] if header in request.headers else [])
+                values = [v.strip() for item in values for v in item.split(",") if v.strip()]
+                if values:
+                    fields[name] = values
+            elif name in request.query_params:
+                fields[name] = request.query_params[name]
+            elif header in request.headers:
+                fields[name] = request.headers[header]
+        fields.setdefault("image", "")
+        try:
+            req = model.model_validate(fields)
+        except ValidationError as e:
+            raise _body_validation_error(e)
+        req._image_bytes = raw
+        return req
+
+    return dependency
+
+
+def image_openapi(model: Type[ImageRequest]) -> dict:
+    """OpenAPI requestBody for endpoints using :func:`image_body`."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": model.model_json_schema()},
+                "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+                "multipart/form-data": {
+                    "schema": {"type": "object", "properties": {"image": {"type": "string", "format": "binary"}}}
+                },
+            },
+        }
+    }
+
+
+# -----------------------
+# Image ingest
+# -----------------------
+# Every endpoint decodes through ingest_image: OpenCV decodes straight into
+# the BGR array the models take, with EXIF orientation applied. JPEGs whose
+# long side is at least twice FACE_INGEST_DRAFT_SIDE are decoded at 1/2, 1/4
+# or 1/8 scale in the DCT (the detector never sees more than 640-1280 px).
+# IngestedImage.scale records that; face boxes are mapped back to source
+# pixels, so clients see the same coordinates as with a full decode. The
+# reduced decode only feeds detection: quality metrics and the ArcFace crops
+# of faces that are small in it use a full decode (IngestedImage.full/align).
+INGEST_DRAFT_SIDE = int(os.environ.get("FACE_INGEST_DRAFT_SIDE", "1920"))  # 0 = never reduce
+INGEST_MAX_PIXELS = int(os.environ.get("FACE_INGEST_MAX_PIXELS", "50000000"))
+_JPEG_FORMATS = ("JPEG", "MPO")  # MPO: multi-picture JPEG from phone cameras
+_IMREAD_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# ArcFace's 112 px template puts the eyes ~35 px apart: a face whose eyes are
+# at least that far apart in the reduced decode is already at crop resolution
+ALIGN_MIN_EYE_PX = 35.0
+
+
+class IngestedImage:
+    """A decoded request image: the BGR ``array`` plus a lazily built PIL view.
+
+    ``scale`` is array pixels per source pixel (below 1 after a reduced JPEG
+    decode); ``size`` is the source ``(width, height)`` after EXIF rotation.
+    ``raw`` is kept only when a larger decode than ``array`` is allowed, so
+    :meth:`align` can fall back to it.
+    """
+
+    def __init__(self, array: np.ndarray, scale: float = 1.0, format: Optional[str] = None,
+                 raw: Optional[bytes] = None, full_reduce: int = 1):
+        self.array = array
+        self.scale = scale
+        self.format = format
+        self._raw = raw
+        self._full_reduce = full_reduce
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        h, w = self.array.shape[:2]
+        return round(w / self.scale), round(h / self.scale)
+
+    @functools.cached_property
+    def pil(self) -> Image.Image:
+        return Image.fromarray(cv2.cvtColor(self.array, cv2.COLOR_BGR2RGB))
+
+    def crop(self, bbox: Tuple[float, float, float, float]) -> Image.Image:
+        """RGB crop of a box in source pixels (the whole image if the box is empty)."""
+        h, w = self.array.shape[:2]
+        x1, y1, x2, y2 = (int(v * self.scale) for v in bbox)
+        x1 = max(0, min(w, x1)); x2 = max(0, min(w, x2))
+        y1 = max(0, min(h, y1)); y2 = max(0, min(h, y2))
+        region = self.array[y1:y2, x1:x2] if x2 > x1 and y2 > y1 else self.array
+        return Image.fromarray(cv2.cvtColor(region, cv2.COLOR_BGR2RGB))
+
+    @functools.cached_property
+    def full(self) -> Tuple[np.ndarray, float]:
+        """The largest decode INGEST_MAX_PIXELS allows and its scale (decoded on first use)."""
+        if self._raw is None:
+            return self.array, self.scale
+        arr = cv2.imdecode(np.frombuffer(self._raw, dtype=np.uint8), _IMREAD_FLAGS[self._full_reduce])
+        return arr, max(arr.shape[:2]) / max(self.size)
+
+    def align(self, kps: np.ndarray) -> np.ndarray:
+        """ArcFace crop for landmarks in source pixels; small faces are aligned from :attr:`full`."""
+        kps = np.asarray(kps, dtype=np.float32)
+        arr, scale = self.array, self.scale
+        if self._raw is not None and np.linalg.norm(kps[1] - kps[0]) * scale < ALIGN_MIN_EYE_PX:
+            arr, scale = self.full
+        return align_face(arr, kps * scale)
+
+
+def ingest_image(raw: bytes) -> IngestedImage:
+    """Decode JPEG/PNG/... bytes into an :class:`IngestedImage`; 400 if unreadable, 413 if too large."""
+    try:
+        header = Image.open(io.BytesIO(raw))  # parses the header only
+    except Exception:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    w, h = header.size
+    reduce = full_reduce = 1
+    if header.format in _JPEG_FORMATS:
+        while full_reduce < 8 and w * h > INGEST_MAX_PIXELS * full_reduce * full_reduce:
+            full_reduce *= 2
+        reduce = full_reduce
+        while reduce < 8 and INGEST_DRAFT_SIDE and max(w, h) // (reduce * 2) >= INGEST_DRAFT_SIDE:
+            reduce *= 2
+    if w * h > INGEST_MAX_PIXELS * reduce * reduce:
+        raise HTTPException(status_code=413, detail=f"Image too large ({w}x{h}, max {INGEST_MAX_PIXELS} pixels)")
+    arr = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), _IMREAD_FLAGS[reduce])
+    if arr is None:
+        # A format OpenCV does not read (e.g. GIF): decode with PIL instead
+        try:
+            arr = pil_to_ndarray(ImageOps.exif_transpose(header).convert("RGB"))
+        except Exception:
+            raise HTTPException(status_code=400, detail="Could not decode image")
+        return IngestedImage(arr, max(arr.shape[:2]) / max(w, h), header.format)
+    # Reduced below what the pixel cap requires: keep the bytes for full-resolution alignment
+    full = (raw, full_reduce) if reduce > full_reduce else (None, 1)
+    return IngestedImage(arr, max(arr.shape[:2]) / max(w, h), header.format, *full)
 
 
-def decode_image_b64(data: str) -> Image.Image:
-    # Accepts dataURL or plain base64
+def b64_image_bytes(data: str) -> bytes:
+    """Bytes of a dataURL or plain base64 image; 400 if it is not base64."""
     if data.startswith("data:"):
-        header, b64 = data.split(",", 1)
-    else:
-        b64 = data
-    raw = base64.b64decode(b64)
-    img = Image.open(io.BytesIO(raw)).convert("RGB")
-    return img
+        _, comma, data = data.partition(",")
+        if not comma:
+            raise HTTPException(status_code=400, detail="Invalid data URL")
+    try:
+        return base64.b64decode(data)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid base64 image")
+
+
+def load_image(req: ImageRequest) -> IngestedImage:
+    """Decode the request image from raw bytes when present, else from base64."""
+    if req._image_bytes is not None:
+        return ingest_image(req._image_bytes)
+    return ingest_image(b64_image_bytes(req.image))
 
 
 def pil_to_ndarray(img: Image.Image) -> np.ndarray:
-    return np.array(img)[:, :, ::-1].copy()  # RGB->BGR copy for cv2-style
+    return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)  # RGB->BGR for cv2-style models
 
 
 def l2_normalize(vec: np.ndarray) -> np.ndarray:
@@ -435,15 +1244,465 @@ def cosine(a: np.ndarray, b: np.ndarray) -> float:
     return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
 
 
+# Each endpoint runs the cheapest module set that produces the fields it returns.
+# "detect" keeps bbox/kps/det_score only; "embed" adds the ArcFace embedding;
+# "full" is the whole pack (landmarks, gender/age) as prepared by /init.
+PIPELINE_MODULES = {
+    "detect": ("detection",),
+    "embed": ("detection", "recognition"),
+    "full": None,
+}
+ENDPOINT_PIPELINES = {
+    "/detect": "detect",
+    "/validate-face": "detect",
+    "/process-video-frame": "detect",
+    "/photo/quality": "detect",
+    "/embedding": "embed",
+    "/enroll": "embed",
+    "/recognize": "embed",
+    "/enroll_person_direct": "embed",
+    "/process_pending_enrollment": "embed",
+}
+_pipelines: dict = {}
+
+
+def build_pipelines(fa) -> dict:
+    """Views over ``fa`` restricted to each module set; ONNX sessions are shared, not reloaded."""
+    views = {}
+    for name, modules in PIPELINE_MODULES.items():
+        if modules is None:
+            views[name] = fa
+            continue
+        view = copy.copy(fa)
+        view.models = {task: m for task, m in fa.models.items() if task in modules}
+        views[name] = view
+    return views
+
+
+# Detector input sizes. The detector session takes any multiple of 32, so one
+# prepared session serves every size; we only pick which one to feed it.
+DEFAULT_DET_SIZES = (320, 480, 640)
+
+
+def _parse_det_sizes(raw: str) -> List[int]:
+    """FACE_DET_SIZES as sorted unique sizes; empty means the defaults."""
+    sizes = set()
+    for v in raw.split(","):
+        if not v.strip():
+            continue
+        try:
+            size = int(v)
+        except ValueError:
+            size = 0
+        if size <= 0 or size % 32:
+            raise ValueError(f"FACE_DET_SIZES must be comma-separated positive multiples of 32, got {v.strip()!r}")
+        sizes.add(size)
+    return sorted(sizes or DEFAULT_DET_SIZES)
+
+
+DET_SIZES = _parse_det_sizes(os.environ.get("FACE_DET_SIZES", ""))
+
+
+def choose_det_size(img: np.ndarray, closeup: bool = False, hint: Optional[int] = None) -> int:
+    """Explicit hint > close-up endpoints (smallest size) > smallest size covering the image."""
+    if hint:
+        return int(min(max(round(hint / 32) * 32, 160), 1280))
+    if closeup:
+        return DET_SIZES[0]
+    long_side = max(img.shape[:2])
+    for size in DET_SIZES:
+        if size >= long_side:
+            return size
+    return DET_SIZES[-1]
+
+
+def detect_faces(img: np.ndarray, closeup: bool = False, hint: Optional[int] = None,
+                 max_num: int = 0) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Run only the detector: returns ``(bboxes[N,5], kps[N,5,2] or None)``.
+
+    Retries once at the largest size when a smaller one finds nothing.
+    """
+    if inference_pool is not None:
+        out = _offload("detect", img, closeup=closeup, hint=hint, max_num=max_num)
+        if out is not None:
+            return out
+    size = choose_det_size(img, closeup, hint)
+    bboxes, kpss = face_app.det_model.detect(img, input_size=(size, size), max_num=max_num, metric='default')
+    if bboxes.shape[0] == 0 and not hint and size < DET_SIZES[-1]:
+        size = DET_SIZES[-1]
+        bboxes, kpss = face_app.det_model.detect(img, input_size=(size, size), max_num=max_num, metric='default')
+    return bboxes, kpss
+
+
+def analyze(pipeline: str, img: np.ndarray, closeup: bool = False, det_size: Optional[int] = None,
+            max_num: int = 0) -> List[Face]:
+    """``face_app.get`` restricted to the named pipeline's modules, with an adaptive detector size."""
+    global _pipelines
+    if inference_pool is not None:
+        out = _offload("analyze", img, pipeline=pipeline, closeup=closeup, det_size=det_size, max_num=max_num)
+        if out is not None:
+            return [Face(d) for d in out]
+    if _pipelines.get("full") is not face_app:
+        _pipelines = build_pipelines(face_app)
+    view = _pipelines[pipeline]
+    bboxes, kpss = detect_faces(img, closeup=closeup, hint=det_size, max_num=max_num)
+    faces = []
+    for i in range(bboxes.shape[0]):
+        face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+        for task, model in view.models.items():
+            if task not in ('detection', 'recognition'):
+                model.get(img, face)
+        faces.append(face)
+    # All faces of the frame go through ArcFace in one call (coalesced with
+    # other requests' faces when micro-batching is on)
+    landmarked = [f for f in faces if f.kps is not None]
+    if 'recognition' in view.models and landmarked:
+        feats = embed_raw([align_face(img, f.kps) for f in landmarked])
+        for face, feat in zip(landmarked, feats):
+            face.embedding = feat
+    return faces
+
+
+def analyze_image(pipeline: str, image: IngestedImage, closeup: bool = False,
+                  det_size: Optional[int] = None) -> List[Face]:
+    """:func:`analyze` on an ingested image, with boxes and landmarks in source pixels."""
+    # After a reduced decode, embeddings come from IngestedImage.align instead
+    reembed = image.scale != 1 and pipeline == "embed"
+    faces = analyze("detect" if reembed else pipeline, image.array, closeup=closeup, det_size=det_size)
+    if image.scale != 1:
+        for face in faces:
+            face.bbox = face.bbox / image.scale
+            if face.kps is not None:
+                face.kps = face.kps / image.scale
+    landmarked = [f for f in faces if f.kps is not None]
+    if reembed and landmarked:
+        for face, feat in zip(landmarked, embed_aligned([image.align(f.kps) for f in landmarked])):
+            face.embedding = feat
+    return faces
+
+
+# -----------------------
+# Inference worker processes
+# -----------------------
+# With FACE_INFERENCE_WORKERS > 0, detect_faces / analyze / embed_aligned run in
+# a pool of processes, each with its own FaceAnalysis, so pre/post-processing no
+# longer serializes on the GIL. Pixels go through shared memory; only boxes,
+# landmarks and embeddings are pickled back. The in-process face_app stays
+# loaded for cheap helpers (align_face) and as the fallback if the pool breaks.
+INFERENCE_WORKERS = int(os.environ.get("FACE_INFERENCE_WORKERS", "0"))
+inference_pool: Optional["InferencePool"] = None
+
+
+def _worker_init(pack: str, root: Optional[str], ort_settings: dict):
+    global face_app, loaded_pack, embedding_batcher
+    # A worker serves one request at a time, so a batching window would only add latency
+    embedding_batcher = None
+    kwargs = {"root": root} if root else {}
+    fa = FaceAnalysis(name=pack, providers=['CPUExecutionProvider'], **kwargs)
+    fa.prepare(ctx_id=-1, det_size=(640, 640))
+    apply_session_options(fa, ort_settings)
+    face_app = fa
+    loaded_pack = (pack, root)
+
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+
+def _worker_call(op: str, shm_name: str, shape: tuple, dtype: str, kwargs: dict):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        if op == "detect":
+            out = detect_faces(arr, **kwargs)
+        elif op == "analyze":
+            out = [dict(f) for f in analyze(img=arr, **kwargs)]
+        else:  # "embed": arr is a stack of aligned crops
+            out = embed_aligned(list(arr))
+        return out
+    finally:
+        del arr
+        shm.close()
+
+
+class InferencePool:
+    def __init__(self, workers: int, pack: str, root: Optional[str]):
+        self.workers = workers
+        self.pack = (pack, root)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(pack, root, dict(ORT_SETTINGS)),
+        )
+
+    def warm(self):
+        """Start every worker and wait until each has loaded its models."""
+        futures = [self._executor.submit(_worker_ping) for _ in range(self.workers * 2)]
+        pids = {f.result() for f in futures}
+        logger.info(f"🧵 Inference pool ready: {len(pids)} worker processes ({self.pack[0]})")
+
+    def run(self, op: str, arr: np.ndarray, **kwargs):
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        try:
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            return self._executor.submit(_worker_call, op, shm.name, arr.shape, arr.dtype.str, kwargs).result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _offload(op: str, arr: np.ndarray, **kwargs):
+    """Run ``op`` on the worker pool; ``None`` tells the caller to run it in-process."""
+    global inference_pool
+    pool = inference_pool
+    if pool is None:
+        return None
+    try:
+        return pool.run(op, arr, **kwargs)
+    except BrokenProcessPool as e:
+        logger.error(f"❌ Inference pool broke ({e}); falling back to in-process inference")
+        if inference_pool is pool:
+            inference_pool = None
+            pool.shutdown()
+    except OSError as e:
+        # e.g. /dev/shm exhausted by a very large image
+        logger.warning(f"⚠️  Shared memory unavailable ({e}); running {op} in-process")
+    except (RuntimeError, CancelledError):
+        # The pool was shut down under us by a restart from /init
+        pass
+    return None
+
+
+def start_inference_pool(workers: int):
+    """(Re)start the worker pool for the loaded pack; 0 workers means in-process inference."""
+    global inference_pool
+    old, inference_pool = inference_pool, None
+    if old is not None:
+        old.shutdown()
+    if workers <= 0 or loaded_pack is None:
+        return
+    pool = InferencePool(workers, *loaded_pack)
+    try:
+        pool.warm()
+    except Exception as e:
+        pool.shutdown()
+        logger.error(f"❌ Failed to start inference pool: {e}; using in-process inference")
+        return
+    inference_pool = pool
+
+
+@app.on_event("shutdown")
+def shutdown_inference_pool():
+    if inference_pool is not None:
+        inference_pool.shutdown()
+
+
+@app.on_event("shutdown")
+def save_ann_index():
+    if ANN_INDEX is not None:
+        ANN_INDEX.save()
+
+
+@app.on_event("shutdown")
+def checkpoint_test_reports():
+    for report_id in list(_report_state):
+        _evict_report(report_id)
+
+
+# -----------------------
+# Admission control
+# -----------------------
+# Inference requests wait in one bounded priority queue for an inference slot
+# (see AdmissionController.slots, or FACE_INFERENCE_CONCURRENCY). Live
+# recognition goes ahead of one-off interactive calls such as /detect, then
+# video-frame processing, then enrollment. A full
+# queue answers 429; a request that cannot start within its class deadline
+# answers 503. Both carry Retry-After, so a burst is shed instead of letting
+# latency grow without bound.
+ADMISSION_PRIORITIES = {"live": 0, "interactive": 1, "video": 2, "enroll": 3}
+ADMISSION_DEADLINES_MS = {
+    "live": float(os.environ.get("FACE_QUEUE_DEADLINE_LIVE_MS", "700")),
+    "interactive": float(os.environ.get("FACE_QUEUE_DEADLINE_INTERACTIVE_MS", "2000")),
+    "video": float(os.environ.get("FACE_QUEUE_DEADLINE_VIDEO_MS", "3000")),
+    "enroll": float(os.environ.get("FACE_QUEUE_DEADLINE_ENROLL_MS", "10000")),
+}
+# At least one waiter, so a full queue always has a lowest-priority entry to shed
+ADMISSION_QUEUE_MAX = max(1, int(os.environ.get("FACE_QUEUE_MAX", "32")))
+# 0: one slot per inference worker process; in-process, as many concurrent
+# ORT runs as the intra-op thread count leaves cores for (at least 2), or
+# MICROBATCH_CONCURRENCY when micro-batching is on and that is more
+INFERENCE_CONCURRENCY = int(os.environ.get("FACE_INFERENCE_CONCURRENCY", "0"))
+MICROBATCH_CONCURRENCY = max(1, int(os.environ.get("FACE_MICROBATCH_CONCURRENCY", "4")))
+
+
+class AdmissionController:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []  # heap of (priority, arrival seq)
+        self._seq = 0
+        self._evicted = set()  # tickets pushed out of a full queue by higher-priority work
+        self.in_flight = 0
+        self._service_ms = 0.0  # moving average of how long a slot is held
+        self._waits = {cls: deque(maxlen=256) for cls in ADMISSION_PRIORITIES}
+        self.admitted = {cls: 0 for cls in ADMISSION_PRIORITIES}
+        self.rejected = {"429": 0, "503": 0}
+
+    def slots(self) -> int:
+        if INFERENCE_CONCURRENCY > 0:
+            return INFERENCE_CONCURRENCY
+        if inference_pool is not None:
+            return inference_pool.workers
+        # ORT sessions run concurrently from several threads; unset intra-op
+        # threads means one per core, which leaves room for the minimum of 2
+        intra = ORT_SETTINGS.get("intra_op_threads") or os.cpu_count() or 1
+        slots = max(2, (os.cpu_count() or 1) // intra)
+        # Micro-batching needs several requests in flight to have anything to coalesce
+        return max(slots, MICROBATCH_CONCURRENCY) if embedding_batcher is not None else slots
+
+    def _expected_wait_ms(self, priority: int) -> float:
+        if self.in_flight < self.slots() and not self._waiting:
+            return 0.0
+        ahead = sum(1 for p, _ in self._waiting if p <= priority)
+        return (ahead + 1) * (self._service_ms or 100.0) / self.slots()
+
+    def _reject(self, status_code: int, detail: str):
+        self.rejected[str(status_code)] += 1
+        retry_after = max(1, math.ceil(self._expected_wait_ms(0) / 1000))
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    @contextmanager
+    def slot(self, cls: str):
+        """Hold an inference slot for the body of the ``with`` block."""
+        priority = ADMISSION_PRIORITIES[cls]
+        deadline_ms = ADMISSION_DEADLINES_MS[cls]
+        arrived = time.monotonic()
+        with self._cond:
+            if len(self._waiting) >= ADMISSION_QUEUE_MAX:
+                # A full queue sheds its lowest-priority, newest waiter if we outrank it
+                victim = max(self._waiting)
+                if victim[0] <= priority:
+                    self._reject(429, "Inference queue is full")
+                self._waiting.remove(victim)
+                heapq.heapify(self._waiting)
+                self._evicted.add(victim)
+                self._cond.notify_all()
+            # Reject up front rather than make the caller wait out a deadline it cannot meet
+            if self._expected_wait_ms(priority) > deadline_ms:
+                self._reject(503, f"Inference backlog exceeds the {cls} deadline")
+            self._seq += 1
+            ticket = (priority, self._seq)
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                # Checked first: once evicted, the ticket is no longer in the heap (which may be empty)
+                if ticket in self._evicted:
+                    self._evicted.discard(ticket)
+                    self._reject(429, "Inference queue is full")
+                if self._waiting[0] == ticket and self.in_flight < self.slots():
+                    break
+                remaining = deadline_ms / 1000 - (time.monotonic() - arrived)
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    self._reject(503, f"Inference queue wait exceeded the {cls} deadline")
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            self.admitted[cls] += 1
+            self._waits[cls].append((time.monotonic() - arrived) * 1000)
+            self._cond.notify_all()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            held_ms = (time.monotonic() - started) * 1000
+            with self._cond:
+                self.in_flight -= 1
+                self._service_ms = held_ms if not self._service_ms else 0.8 * self._service_ms + 0.2 * held_ms
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = {
+                cls: {
+                    "p50_ms": round(float(np.percentile(w, 50)), 1) if w else None,
+                    "p95_ms": round(float(np.percentile(w, 95)), 1) if w else None,
+                }
+                for cls, w in self._waits.items()
+            }
+            return {
+                "depth": len(self._waiting),
+                "in_flight": self.in_flight,
+                "slots": self.slots(),
+                "max_depth": ADMISSION_QUEUE_MAX,
+                "deadlines_ms": ADMISSION_DEADLINES_MS,
+                "service_ms": round(self._service_ms, 1),
+                "wait": waits,
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+            }
+
+
+ADMISSION = AdmissionController()
+
+
+def admit(cls: str):
+    """Endpoint decorator: run the handler inside an inference slot of the given class."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with ADMISSION.slot(cls):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "model_pack": loaded_pack[0] if loaded_pack else None,
+        "inference_workers": inference_pool.workers if inference_pool else 0,
+        "queue": ADMISSION.stats(),
+        "gallery": {
+            "rows": len(GALLERY),
+            "dtype": GALLERY_DTYPE,
+            "matrix_bytes": int(GALLERY.rows()[2].nbytes),
+            "storage": EMBEDDING_STORAGE,
+            "snapshot": SNAPSHOT.stats() if SNAPSHOT is not None else None,
+        },
+        "sqlite": {"schema_version": schema_version(), "connections_opened": _sqlite_opened},
+        "ann": ANN_INDEX.stats() if ANN_INDEX is not None else None,
+        "microbatch": embedding_batcher.stats() if embedding_batcher is not None else None,
+        "onnxruntime": ort_effective_settings(face_app),
+    }
 
 
 @app.post("/init")
 def init(req: InitRequest):
-    global face_app
-    if face_app is None:
+    global face_app, loaded_pack, INFERENCE_WORKERS
+    ort_overrides = {k: getattr(req, k) for k in ORT_SETTINGS if getattr(req, k) is not None}
+    if ort_overrides:
+        # Validate the merged settings before they become the process-wide defaults
+        try:
+            build_session_options({**ORT_SETTINGS, **ort_overrides})
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        ORT_SETTINGS.update(ort_overrides)
+        # Already loaded: re-tune the live sessions in place
+        if face_app is not None:
+            apply_session_options(face_app, ORT_SETTINGS)
+    # An explicitly requested pack that differs from the live one is swapped in
+    # (e.g. buffalo_l -> buffalo_l_int8); a bare /init keeps whatever is loaded.
+    requested = (req.model_pack, req.model_root)
+    switch_pack = bool({"model_pack", "model_root"} & req.model_fields_set) and requested != loaded_pack
+    reload_models = face_app is None or switch_pack
+    if reload_models:
         try:
             # If a custom local model root is provided, validate it and force local-only if requested
             root_arg = None
@@ -476,21 +1735,32 @@ def init(req: InitRequest):
             fa = FaceAnalysis(name=req.model_pack, root=root_arg) if root_arg else FaceAnalysis(name=req.model_pack)
             # CPU: ctx_id=-1. Use 0 for first GPU.
             fa.prepare(ctx_id=-1, det_size=(req.det_width, req.det_height))
+            apply_session_options(fa, ORT_SETTINGS)
             face_app = fa
+            loaded_pack = requested
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to init FaceAnalysis: {e}")
+    # Workers hold their own copy of the pack and session options, so any change restarts them
+    if req.inference_workers is not None:
+        INFERENCE_WORKERS = max(0, req.inference_workers)
+    running = inference_pool.workers if inference_pool else 0
+    if reload_models or ort_overrides or INFERENCE_WORKERS != running:
+        start_inference_pool(INFERENCE_WORKERS)
     init_db()
+    GALLERY.load()
     return {"status": "ready"}
 
 
-@app.post("/detect")
-def detect(req: DetectRequest):
+@app.post("/detect", openapi_extra=image_openapi(DetectRequest))
+@admit("interactive")
+def detect(req: DetectRequest = Depends(image_body(DetectRequest))):
     if face_app is None:
         raise HTTPException(status_code=400, detail="Service not initialized")
 
-    img_pil = decode_image_b64(req.image)
-    img = pil_to_ndarray(img_pil)
-    faces = face_app.get(img)
+    image = load_image(req)
+    faces = analyze_image("detect", image, det_size=req.det_size)
     out = []
     for f in faces or []:
         x1, y1, x2, y2 = map(float, f.bbox)
@@ -503,34 +1773,36 @@ def detect(req: DetectRequest):
     return {"boxes": out}
 
 
-@app.post("/photo/quality")
-def photo_quality(req: DetectRequest):
+@app.post("/photo/quality", openapi_extra=image_openapi(DetectRequest))
+@admit("enroll")
+def photo_quality(req: DetectRequest = Depends(image_body(DetectRequest))):
     try:
         if face_app is None:
             raise HTTPException(status_code=400, detail="Service not initialized")
         
         logger.info("📸 Quality check requested")
-        img_pil = decode_image_b64(req.image)
-        img = pil_to_ndarray(img_pil)
-        faces = face_app.get(img)
+        image = load_image(req)
+        faces = analyze_image("detect", image, closeup=True, det_size=req.det_size)
         
         if not faces:
             logger.warning("⚠️  No face detected in quality check")
             return {"faces": [], "message": "No face detected", "passed": False}
         
-        # Score largest face
+        # Score every face, largest first; the verdict is the largest face's
         faces.sort(key=lambda f: float((f.bbox[2]-f.bbox[0])*(f.bbox[3]-f.bbox[1])), reverse=True)
-        f = faces[0]
-        x1, y1, x2, y2 = map(float, f.bbox)
-        kps = getattr(f, 'kps', None)
-        metrics = _compute_quality_metrics(img_pil, (x1,y1,x2,y2), kps)
-        passed, reasons = _quality_pass(metrics)
+        scored = []
+        full, full_scale = image.full  # sharpness is only comparable at source resolution
+        for f, metrics in zip(faces, _frame_quality_metrics(full, faces, full_scale)):
+            passed, reasons = _quality_pass(metrics)
+            x1, y1, x2, y2 = map(float, f.bbox)
+            scored.append({"bbox": [x1, y1, x2, y2], "metrics": metrics, "passed": passed, "reasons": reasons})
         
-        logger.info(f"✅ Quality check complete: passed={passed}")
+        logger.info(f"✅ Quality check complete: passed={scored[0]['passed']}")
         return {
-            "metrics": metrics,
-            "passed": passed,
-            "reasons": reasons
+            "metrics": scored[0]["metrics"],
+            "passed": scored[0]["passed"],
+            "reasons": scored[0]["reasons"],
+            "faces": scored,
         }
     except Exception as e:
         logger.error(f"❌ Error in quality check: {e}")
@@ -538,15 +1810,15 @@ def photo_quality(req: DetectRequest):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/embedding")
-def get_embedding(req: DetectRequest):
+@app.post("/embedding", openapi_extra=image_openapi(DetectRequest))
+@admit("enroll")
+def get_embedding(req: DetectRequest = Depends(image_body(DetectRequest))):
     """Get face embedding from an image without saving it"""
     if face_app is None:
         raise HTTPException(status_code=400, detail="Service not initialized")
 
-    img_pil = decode_image_b64(req.image)
-    img = pil_to_ndarray(img_pil)
-    faces = face_app.get(img)
+    image = load_image(req)
+    faces = analyze_image("embed", image, closeup=True, det_size=req.det_size)
     if not faces:
         raise HTTPException(status_code=400, detail="No face detected")
 
@@ -559,14 +1831,14 @@ def get_embedding(req: DetectRequest):
     # Return embedding as list
     return {"embedding": emb.tolist()}
 
-@app.post("/enroll")
-def enroll(req: EnrollRequest):
+@app.post("/enroll", openapi_extra=image_openapi(EnrollRequest))
+@admit("enroll")
+def enroll(req: EnrollRequest = Depends(image_body(EnrollRequest))):
     if face_app is None:
         raise HTTPException(status_code=400, detail="Service not initialized")
 
-    img_pil = decode_image_b64(req.image)
-    img = pil_to_ndarray(img_pil)
-    faces = face_app.get(img)
+    image = load_image(req)
+    faces = analyze_image("embed", image, closeup=True, det_size=req.det_size)
     if not faces:
         raise HTTPException(status_code=400, detail="No face detected")
 
@@ -578,8 +1850,8 @@ def enroll(req: EnrollRequest):
 
     # Quality enforcement
     x1, y1, x2, y2 = map(float, face.bbox)
-    kps = getattr(face, 'kps', None)
-    metrics = _compute_quality_metrics(img_pil, (x1,y1,x2,y2), kps)
+    full, full_scale = image.full
+    metrics = _face_quality_metrics(full, (x1, y1, x2, y2), getattr(face, 'kps', None), full_scale)
     passed, reasons = _quality_pass(metrics)
     if not passed:
         raise HTTPException(status_code=400, detail={
@@ -594,71 +1866,1075 @@ def enroll(req: EnrollRequest):
         "INSERT OR IGNORE INTO persons(person_id, person_name) VALUES (?, ?)",
         (req.person_id, req.person_name),
     )
-    # Select correct embedding column name
-    cur.execute("PRAGMA table_info(embeddings)")
-    cols = [row[1] for row in cur.fetchall()]
-    emb_col = "embedding" if "embedding" in cols else "vector"
+    emb_col = embedding_column() or "embedding"
     cur.execute(
         f"INSERT INTO embeddings(person_id, {emb_col}, created_at) VALUES (?, ?, ?)",
-        (req.person_id, emb.tobytes(), time.time()),
+        (req.person_id, encode_embedding(emb), time.time()),
     )
     conn.commit()
     conn.close()
+    GALLERY.refresh_persons([req.person_id])
     return {"status": "enrolled", "person_id": req.person_id}
 
 
-def load_embeddings(filter_ids: Optional[List[str]] = None) -> List[Tuple[str, np.ndarray]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    # Determine which column holds the embedding data
-    cur.execute("PRAGMA table_info(embeddings)")
-    cols = [row[1] for row in cur.fetchall()]
-    emb_col = "embedding" if "embedding" in cols else ("vector" if "vector" in cols else None)
-    if not emb_col:
-        conn.close()
-        return []
-    if filter_ids:
-        q_marks = ",".join(["?"] * len(filter_ids))
-        cur.execute(
-            f"SELECT person_id, {emb_col} FROM embeddings WHERE person_id IN ({q_marks})",
-            filter_ids,
-        )
-    else:
-        cur.execute(f"SELECT person_id, {emb_col} FROM embeddings")
-    rows = cur.fetchall()
-    conn.close()
-    out: List[Tuple[str, np.ndarray]] = []
-    for pid, vec in rows:
-        arr = np.frombuffer(vec, dtype=np.float32)
-        out.append((pid, arr))
-    return out
+def load_embeddings(filter_ids: Optional[List[str]] = None) -> List[Tuple[str, np.ndarray]]:
+    emb_col = embedding_column()
+    if not emb_col:
+        return []
+    conn = get_conn()
+    cur = conn.cursor()
+    if filter_ids:
+        q_marks = ",".join(["?"] * len(filter_ids))
+        cur.execute(
+            f"SELECT person_id, {emb_col} FROM embeddings WHERE person_id IN ({q_marks})",
+            filter_ids,
+        )
+    else:
+        cur.execute(f"SELECT person_id, {emb_col} FROM embeddings")
+    rows = cur.fetchall()
+    conn.close()
+    out: List[Tuple[str, np.ndarray]] = []
+    for pid, vec in rows:
+        out.append((pid, decode_embedding(vec)))
+    return out
+
+
+def person_name_map() -> dict:
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT person_id, person_name FROM persons")
+    rows = cur.fetchall()
+    conn.close()
+    return {pid: name for pid, name in rows}
+
+
+# -----------------------
+# Resident gallery index
+# -----------------------
+def _normalize_rows(mat: np.ndarray) -> np.ndarray:
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
+    return np.ascontiguousarray(mat / norms, dtype=np.float32)
+
+
+# -----------------------
+# Compact embedding formats
+# -----------------------
+# FACE_EMBEDDING_STORAGE picks how new embeddings are written to SQLite and
+# FACE_GALLERY_DTYPE how the resident matrix is held: float32 (default),
+# float16 or int8. Compact blobs start with a 4-byte tag that reads as NaN
+# when taken as float32, so they can never be mistaken for the legacy raw
+# float32 blobs, which keep decoding as before. A mixed table is fine.
+EMBEDDING_FORMATS = ("float32", "float16", "int8")
+EMBEDDING_STORAGE = os.environ.get("FACE_EMBEDDING_STORAGE", "float32").lower()
+GALLERY_DTYPE = os.environ.get("FACE_GALLERY_DTYPE", "float32").lower()
+for _name, _value in (("FACE_EMBEDDING_STORAGE", EMBEDDING_STORAGE), ("FACE_GALLERY_DTYPE", GALLERY_DTYPE)):
+    if _value not in EMBEDDING_FORMATS:
+        raise ValueError(f"{_name} must be one of {', '.join(EMBEDDING_FORMATS)}, got {_value!r}")
+_BLOB_F16 = b"F\x10\xff\xff"
+_BLOB_I8 = b"I\x08\xff\xff"
+# The int8 gallery matrix shares one scale: components of a unit 512-d
+# embedding sit well inside +-0.25, which leaves a step of ~0.002.
+GALLERY_INT8_RANGE = 0.25
+_GALLERY_INT8_SCALE = 127.0 / GALLERY_INT8_RANGE
+_GALLERY_NP_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Rows upcast to float32 at a time when scoring a compact matrix
+GALLERY_BLOCK_ROWS = 8192
+
+
+def encode_embedding(vec: np.ndarray, storage: Optional[str] = None) -> bytes:
+    """SQLite blob for one embedding in ``storage`` (default FACE_EMBEDDING_STORAGE).
+
+    Compact formats are L2-normalized first; int8 carries its own scale.
+    """
+    storage = storage or EMBEDDING_STORAGE
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    if storage == "float32":
+        return vec.tobytes()
+    vec = vec / (np.linalg.norm(vec) + 1e-12)
+    if storage == "float16":
+        return _BLOB_F16 + vec.astype(np.float16).tobytes()
+    if storage == "int8":
+        scale = np.float32(np.abs(vec).max() / 127.0 or 1.0)
+        return _BLOB_I8 + scale.tobytes() + np.round(vec / scale).astype(np.int8).tobytes()
+    raise ValueError(f"Unknown embedding storage {storage!r}")
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    """float32 vector from any stored blob (legacy raw float32, float16 or int8)."""
+    tag = bytes(blob[:4])
+    if tag == _BLOB_F16:
+        return np.frombuffer(blob, dtype=np.float16, offset=4).astype(np.float32)
+    if tag == _BLOB_I8:
+        scale = np.frombuffer(blob, dtype=np.float32, count=1, offset=4)[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=8).astype(np.float32) * scale
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def to_gallery_dtype(mat: np.ndarray, dtype: Optional[str] = None) -> np.ndarray:
+    """Convert L2-normalized float32 rows to the resident matrix type."""
+    dtype = dtype or GALLERY_DTYPE
+    if dtype == "float16":
+        return mat.astype(np.float16)
+    if dtype == "int8":
+        return np.round(np.clip(mat, -GALLERY_INT8_RANGE, GALLERY_INT8_RANGE) * _GALLERY_INT8_SCALE).astype(np.int8)
+    return np.ascontiguousarray(mat, dtype=np.float32)
+
+
+def dequantize(mat: np.ndarray) -> np.ndarray:
+    """float32 view of (a block of) a gallery matrix; float32 input is returned as is."""
+    if mat.dtype == np.int8:
+        return mat.astype(np.float32) * np.float32(1.0 / _GALLERY_INT8_SCALE)
+    if mat.dtype != np.float32:
+        return mat.astype(np.float32)
+    return mat
+
+
+def gallery_scores(queries: np.ndarray, mat: np.ndarray) -> np.ndarray:
+    """``queries @ mat.T`` for any gallery dtype, upcasting compact rows block by block."""
+    if mat.dtype == np.float32:
+        return queries @ mat.T
+    out = np.empty((queries.shape[0], mat.shape[0]), dtype=np.float32)
+    for i in range(0, mat.shape[0], GALLERY_BLOCK_ROWS):
+        out[:, i:i + GALLERY_BLOCK_ROWS] = queries @ mat[i:i + GALLERY_BLOCK_ROWS].astype(np.float32).T
+    if mat.dtype == np.int8:
+        out *= np.float32(1.0 / _GALLERY_INT8_SCALE)
+    return out
+
+
+def decode_gallery_rows(blobs: List[bytes]) -> np.ndarray:
+    """Stored blobs -> normalized rows in the gallery dtype, without a full float32 copy."""
+    dim = decode_embedding(blobs[0]).shape[0] if blobs else 512
+    out = np.empty((len(blobs), dim), dtype=_GALLERY_NP_DTYPES[GALLERY_DTYPE])
+    for i in range(0, len(blobs), GALLERY_BLOCK_ROWS):
+        chunk = np.stack([decode_embedding(b) for b in blobs[i:i + GALLERY_BLOCK_ROWS]])
+        out[i:i + GALLERY_BLOCK_ROWS] = to_gallery_dtype(_normalize_rows(chunk))
+    return out
+
+
+# Two-stage matching: shortlist persons by centroid, then re-rank their rows.
+# 0 disables the shortlist (plain brute force over every row).
+CENTROID_SHORTLIST_K = int(os.environ.get("FACE_CENTROID_SHORTLIST_K", "8"))
+# Score a two-stage match may lose against brute force; 0 keeps results identical
+CENTROID_TOLERANCE = float(os.environ.get("FACE_CENTROID_TOLERANCE", "0.0"))
+# MatchIndexes over recently used filter_ids lists, kept until the gallery changes
+FILTER_INDEX_CACHE = int(os.environ.get("FACE_FILTER_INDEX_CACHE", "64"))
+
+
+class MatchIndex:
+    """Gallery rows to match against, plus one L2-normalized centroid per person.
+
+    ``top1`` shortlists the ``CENTROID_SHORTLIST_K`` persons whose centroids are
+    closest to the query and re-ranks only their rows. Every other person has
+    an upper bound on their best row score: the angle from the query to their
+    centroid, minus the widest angle any of their rows makes with that
+    centroid, scaled by their row norms (compact FACE_GALLERY_DTYPE rows are
+    not exactly unit length). Anyone whose bound still beats the shortlist
+    winner by more than ``CENTROID_TOLERANCE`` is checked as well. So with
+    tolerance 0 the answer is the brute-force argmax over the stored rows, in
+    every gallery dtype. A query whose shortlist winner is below THRESHOLD
+    (typically a stranger) is brute-forced instead: nothing prunes well then.
+    """
+
+    def __init__(self, person_ids: List[str], matrix: np.ndarray):
+        self.person_ids = person_ids
+        self.matrix = matrix
+        self.persons = list(dict.fromkeys(person_ids))
+        self._calls = 0  # a one-off index (e.g. a filter_ids list) is just brute-forced
+
+    @functools.cached_property
+    def _centroid_bounds(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(centroids, spread, norms)``, built when a second ``top1`` call needs the two-stage path.
+
+        ``norms`` holds the smallest and largest row norm of each person.
+
+        Also sets ``_rows``, the gallery rows of each person.
+        """
+        matrix, person_ids = self.matrix, self.person_ids
+        slot = {pid: i for i, pid in enumerate(self.persons)}
+        owner = np.fromiter((slot[pid] for pid in person_ids), dtype=np.int64, count=len(person_ids))
+        order = np.argsort(owner, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(np.bincount(owner, minlength=len(self.persons)))[:-1]]).astype(np.int64)
+        self._rows = np.split(order, starts[1:])
+        centroids = np.zeros((len(self.persons), matrix.shape[1]), dtype=np.float32)
+        spread = np.zeros(len(self.persons), dtype=np.float32)
+        norms = np.ones((len(self.persons), 2), dtype=np.float32)
+        # Whole persons at a time, so a compact matrix is only upcast a block at a time
+        ends = np.append(starts[1:], len(order))
+        p0 = 0
+        while p0 < len(self.persons):
+            p1 = max(int(np.searchsorted(starts, starts[p0] + GALLERY_BLOCK_ROWS)), p0 + 1)
+            rows = order[starts[p0]:ends[p1 - 1]]
+            block = dequantize(matrix[rows])
+            local = starts[p0:p1] - starts[p0]
+            row_norms = np.linalg.norm(block, axis=1) + 1e-12
+            centroids[p0:p1] = _normalize_rows(np.add.reduceat(block, local, axis=0))
+            cos = np.einsum("ij,ij->i", block, centroids[owner[rows]]) / row_norms
+            spread[p0:p1] = np.arccos(np.clip(np.minimum.reduceat(cos, local), -1.0, 1.0))
+            norms[p0:p1, 0] = np.minimum.reduceat(row_norms, local)
+            norms[p0:p1, 1] = np.maximum.reduceat(row_norms, local)
+            p0 = p1
+        return centroids, spread, norms
+
+    @property
+    def centroids(self) -> np.ndarray:
+        return self._centroid_bounds[0]
+
+    def __len__(self) -> int:
+        return len(self.person_ids)
+
+    @property
+    def nbytes(self) -> int:
+        # Counts the centroids whether or not they have been built yet
+        return int(self.matrix.nbytes + len(self.persons) * self.matrix.shape[1] * 4)
+
+    def top1(self, queries: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """Best row for each L2-normalized query: ``(person_ids, scores)``."""
+        queries = np.atleast_2d(queries)
+        k = CENTROID_SHORTLIST_K
+        self._calls += 1
+        if k <= 0 or len(self.persons) <= 2 * k or (self._calls == 1 and "_centroid_bounds" not in self.__dict__):
+            sims = gallery_scores(queries, self.matrix)
+            best = np.argmax(sims, axis=1)
+            return [self.person_ids[i] for i in best], sims[np.arange(len(best)), best]
+
+        centroids, spread, norms = self._centroid_bounds
+        csims = queries @ centroids.T
+        theta = np.arccos(np.clip(csims, -1.0, 1.0))
+        # The longest row bounds a positive cosine, the shortest a negative one;
+        # small slack so float rounding can never prune the true best
+        cos_bound = np.cos(np.maximum(theta - spread, 0.0))
+        bounds = np.maximum(cos_bound * norms[:, 0], cos_bound * norms[:, 1]) + 1e-5
+        shortlists = np.argpartition(-csims, k - 1, axis=1)[:, :k]
+        best_rows = np.empty(len(queries), dtype=np.int64)
+        scores = np.empty(len(queries), dtype=np.float32)
+        # Queries whose shortlist can't reach THRESHOLD even by its bounds go
+        # straight to brute force, without gathering any rows
+        hopeless = np.take_along_axis(bounds, shortlists, axis=1).max(axis=1) < THRESHOLD
+        brute = list(np.flatnonzero(hopeless))
+        for m in np.flatnonzero(~hopeless):
+            q = queries[m]
+            rows = np.concatenate([self._rows[p] for p in shortlists[m]])
+            sims = dequantize(self.matrix[rows]) @ q
+            j = int(np.argmax(sims))
+            best_rows[m], scores[m] = rows[j], sims[j]
+            if scores[m] < THRESHOLD:
+                brute.append(m)
+                continue
+            contenders = bounds[m] > scores[m] + CENTROID_TOLERANCE
+            contenders[shortlists[m]] = False
+            extra = np.flatnonzero(contenders)
+            if extra.size > len(self.persons) // 4:
+                # Nobody is clearly closest, so scanning everything in one
+                # matmul is cheaper than gathering rows
+                brute.append(m)
+            elif extra.size:
+                rows = np.concatenate([self._rows[p] for p in extra])
+                sims = dequantize(self.matrix[rows]) @ q
+                j = int(np.argmax(sims))
+                if sims[j] > scores[m]:
+                    best_rows[m], scores[m] = rows[j], sims[j]
+        if brute:
+            sims = gallery_scores(queries[brute], self.matrix)
+            best = np.argmax(sims, axis=1)
+            best_rows[brute] = best
+            scores[brute] = sims[np.arange(len(brute)), best]
+        return [self.person_ids[i] for i in best_rows], scores
+
+
+class Gallery:
+    """Process-resident, pre-normalized embedding matrix used by /recognize.
+
+    Built once from SQLite at startup and patched by the endpoints that write
+    embeddings. Writers swap in new arrays instead of mutating in place, so a
+    reader can keep matching against the snapshot it took without the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._mat = np.zeros((0, 512), dtype=_GALLERY_NP_DTYPES[GALLERY_DTYPE])
+        self._person_ids: List[str] = []
+        self._row_keys = np.zeros(0, dtype=np.int64)  # embeddings.id of each row
+        self._rows_by_person: dict = {}
+        self._names: dict = {}
+        self._listeners: list = []
+        self._index: Optional[MatchIndex] = None
+        self._filtered: "OrderedDict[frozenset, MatchIndex]" = OrderedDict()
+        self.version = 0
+        self.names_version = 0  # bumped by renames, which leave the rows alone
+
+    def subscribe(self, fn):
+        """Register ``fn(person_ids)`` to be called after rows change (``None`` = everything)."""
+        self._listeners.append(fn)
+
+    def _notify(self, person_ids: Optional[List[str]]):
+        for fn in self._listeners:
+            fn(person_ids)
+
+    def _install(self, person_ids: List[str], mat: np.ndarray, row_keys: np.ndarray):
+        rows: dict = {}
+        for i, pid in enumerate(person_ids):
+            rows.setdefault(pid, []).append(i)
+        self._rows_by_person = {pid: np.asarray(r, dtype=np.int64) for pid, r in rows.items()}
+        self._person_ids = person_ids
+        self._mat = mat
+        self._row_keys = row_keys
+        self._index = None
+        self._filtered.clear()
+        self.version += 1
+
+    def _without(self, person_ids: set) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        keep = [i for i, pid in enumerate(self._person_ids) if pid not in person_ids]
+        if len(keep) == len(self._person_ids):
+            return self._person_ids, self._mat, self._row_keys
+        return [self._person_ids[i] for i in keep], self._mat[keep], self._row_keys[keep]
+
+    def load(self):
+        """Rebuild the whole index from the database."""
+        conn = get_conn()
+        cur = conn.cursor()
+        try:
+            emb_col = embedding_column()
+            rows = []
+            if emb_col:
+                cur.execute(f"SELECT id, person_id, {emb_col} FROM embeddings ORDER BY id")
+                rows = [(key, pid, vec) for key, pid, vec in cur.fetchall() if vec]
+            cur.execute("SELECT person_id, person_name FROM persons")
+            names = {pid: name for pid, name in cur.fetchall()}
+        finally:
+            conn.close()
+        person_ids = [pid for _, pid, _ in rows]
+        keys = np.asarray([key for key, _, _ in rows], dtype=np.int64)
+        if rows:
+            mat = decode_gallery_rows([vec for _, _, vec in rows])
+        else:
+            mat = self._mat[:0]
+        self.replace(person_ids, mat, keys, names)
+        logger.info(f"🗂️  Gallery loaded: {len(person_ids)} embeddings, {len(names)} persons")
+
+    def replace(self, person_ids: List[str], mat: np.ndarray, row_keys: np.ndarray, names: dict):
+        """Swap in a complete gallery (from SQLite or a snapshot file)."""
+        with self._lock:
+            self._names = names
+            self._install(person_ids, mat, row_keys)
+        self._notify(None)
+
+    def adopt_matrix(self, version: int, mat: np.ndarray) -> bool:
+        """Swap the matrix for an identical copy (e.g. memory-mapped) if still at ``version``."""
+        with self._lock:
+            if version != self.version or mat.shape != self._mat.shape:
+                return False
+            self._mat = mat
+            if self._index is not None:
+                self._index.matrix = mat
+            self._filtered.clear()  # their sub-matrices were copied out of the old one
+            return True
+
+    def refresh_persons(self, person_ids: List[str]):
+        """Re-read the embeddings and names of ``person_ids`` and splice them in."""
+        person_ids = list(dict.fromkeys(p for p in person_ids if p))
+        if not person_ids:
+            return
+        with self._lock:
+            conn = get_conn()
+            cur = conn.cursor()
+            try:
+                q_marks = ",".join(["?"] * len(person_ids))
+                emb_col = embedding_column()
+                rows = []
+                if emb_col:
+                    cur.execute(
+                        f"SELECT id, person_id, {emb_col} FROM embeddings WHERE person_id IN ({q_marks}) ORDER BY id",
+                        person_ids,
+                    )
+                    rows = [(key, pid, vec) for key, pid, vec in cur.fetchall() if vec]
+                cur.execute(
+                    f"SELECT person_id, person_name FROM persons WHERE person_id IN ({q_marks})",
+                    person_ids,
+                )
+                names = dict(cur.fetchall())
+            finally:
+                conn.close()
+            kept_ids, kept_mat, kept_keys = self._without(set(person_ids))
+            if rows:
+                new_mat = decode_gallery_rows([vec for _, _, vec in rows])
+                mat = np.concatenate([kept_mat, new_mat], axis=0) if kept_mat.shape[0] else new_mat
+                ids = kept_ids + [pid for _, pid, _ in rows]
+                keys = np.concatenate([kept_keys, np.asarray([key for key, _, _ in rows], dtype=np.int64)])
+            else:
+                mat, ids, keys = kept_mat, kept_ids, kept_keys
+            self._names.update(names)
+            self._install(ids, mat, keys)
+        self._notify(person_ids)
+
+    def remove_persons(self, person_ids: List[str]):
+        with self._lock:
+            ids, mat, keys = self._without(set(person_ids))
+            for pid in person_ids:
+                self._names.pop(pid, None)
+            self._install(ids, mat, keys)
+        self._notify(list(person_ids))
+
+    def set_name(self, person_id: str, person_name: str):
+        with self._lock:
+            self._names[person_id] = person_name
+            self.names_version += 1
+
+    def clear(self):
+        with self._lock:
+            self._names = {}
+            self._install([], self._mat[:0], np.zeros(0, dtype=np.int64))
+        self._notify(None)
+
+    def name(self, person_id: str) -> str:
+        return self._names.get(person_id, person_id)
+
+    def snapshot(self, filter_ids: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray]:
+        """Return ``(row_person_ids, matrix)``, optionally restricted to ``filter_ids``."""
+        with self._lock:
+            person_ids, mat, rows_by_person = self._person_ids, self._mat, self._rows_by_person
+        if not filter_ids:
+            return person_ids, mat
+        idx = [rows_by_person[pid] for pid in dict.fromkeys(filter_ids) if pid in rows_by_person]
+        if not idx:
+            return [], mat[:0]
+        sel = np.sort(np.concatenate(idx))
+        return [person_ids[i] for i in sel], mat[sel]
+
+    def names(self) -> dict:
+        with self._lock:
+            return dict(self._names)
+
+    def rows(self) -> Tuple[np.ndarray, List[str], np.ndarray, int]:
+        """``(embedding ids, row person ids, matrix, version)`` of the current snapshot."""
+        with self._lock:
+            return self._row_keys, self._person_ids, self._mat, self.version
+
+    def index(self, filter_ids: Optional[List[str]] = None) -> MatchIndex:
+        """``MatchIndex`` over the whole gallery or over ``filter_ids``, both cached per version."""
+        if filter_ids:
+            key = frozenset(filter_ids)
+            with self._lock:
+                index = self._filtered.get(key)
+                if index is not None:
+                    self._filtered.move_to_end(key)
+                    return index
+                version = self.version
+            index = MatchIndex(*self.snapshot(filter_ids))
+            with self._lock:
+                if version == self.version and FILTER_INDEX_CACHE > 0:
+                    self._filtered[key] = index
+                    while len(self._filtered) > FILTER_INDEX_CACHE:
+                        self._filtered.popitem(last=False)
+            return index
+        with self._lock:
+            if self._index is None:
+                self._index = MatchIndex(self._person_ids, self._mat)
+            return self._index
+
+    def __len__(self) -> int:
+        return len(self._person_ids)
+
+
+GALLERY = Gallery()
+
+
+# -----------------------
+# Per-group gallery shards
+# -----------------------
+GROUP_SHARD_BUDGET_BYTES = int(float(os.environ.get("FACE_GROUP_SHARD_BUDGET_MB", "64")) * 1024 * 1024)
+
+
+class GroupShardCache:
+    """LRU of ready-to-multiply gallery sub-matrices keyed by group_id.
+
+    Entries are invalidated synchronously by membership writes and, through
+    the gallery subscription, by embedding writes for any of their members.
+    Total matrix bytes are kept under ``budget_bytes``.
+    """
+
+    def __init__(self, gallery: Gallery, budget_bytes: int):
+        self._gallery = gallery
+        self._budget = budget_bytes
+        self._lock = threading.Lock()
+        self._shards: "OrderedDict[str, dict]" = OrderedDict()
+        self._bytes = 0
+        self._epoch = 0
+        self.group_epoch = 0  # bumped by membership writes only
+        self.hits = 0
+        self.misses = 0
+        gallery.subscribe(self.invalidate_persons)
+
+    def _drop(self, group_id: str):
+        shard = self._shards.pop(group_id, None)
+        if shard:
+            self._bytes -= shard["index"].nbytes
+
+    def _build(self, group_id: str) -> dict:
+        members = SNAPSHOT.members(group_id) if SNAPSHOT is not None else None
+        if members is None:
+            conn = get_conn()
+            cur = conn.cursor()
+            cur.execute("SELECT person_id FROM group_members WHERE group_id = ?", (group_id,))
+            members = [r[0] for r in cur.fetchall()]
+            conn.close()
+        if members:
+            ids, mat = self._gallery.snapshot(members)
+        else:
+            ids, mat = [], np.zeros((0, 512), dtype=_GALLERY_NP_DTYPES[GALLERY_DTYPE])
+        return {"members": set(members), "person_ids": ids, "matrix": mat, "index": MatchIndex(ids, mat)}
+
+    def get(self, group_id: str) -> dict:
+        with self._lock:
+            shard = self._shards.get(group_id)
+            if shard is not None:
+                self._shards.move_to_end(group_id)
+                self.hits += 1
+                return shard
+            self.misses += 1
+            epoch = self._epoch
+        shard = self._build(group_id)
+        with self._lock:
+            # Only cache if nothing was invalidated while we were building
+            if epoch == self._epoch and shard["index"].nbytes <= self._budget:
+                self._drop(group_id)
+                self._shards[group_id] = shard
+                self._bytes += shard["index"].nbytes
+                while self._bytes > self._budget and self._shards:
+                    self._drop(next(iter(self._shards)))
+        return shard
+
+    def invalidate_group(self, group_id: str):
+        with self._lock:
+            self._epoch += 1
+            self.group_epoch += 1
+            self._drop(group_id)
+
+    def invalidate_persons(self, person_ids: Optional[List[str]]):
+        with self._lock:
+            self._epoch += 1
+            if person_ids is None:
+                self._shards.clear()
+                self._bytes = 0
+                return
+            changed = set(person_ids)
+            for gid in [g for g, sh in self._shards.items() if sh["members"] & changed]:
+                self._drop(gid)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "groups": len(self._shards),
+                "bytes": self._bytes,
+                "budget_bytes": self._budget,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+GROUP_SHARDS = GroupShardCache(GALLERY, GROUP_SHARD_BUDGET_BYTES)
+
+
+# -----------------------
+# Approximate nearest-neighbour index (IVF-flat)
+# -----------------------
+# Optional, for matching against the whole organization (no group_id or
+# filter_ids) on large galleries. Spherical k-means splits the gallery into
+# lists, and a query scans only the FACE_ANN_NPROBE lists with the closest
+# centroids. Rows map to lists by embeddings.id. Enrolls and deletes therefore
+# only assign or drop their own rows. The partition is retrained in the
+# background once the gallery outgrows 4x what it was trained on. The index is
+# persisted next to faces.db by a background thread, at most once every
+# FACE_ANN_SAVE_DELAY seconds, so bulk enrollment does not rewrite it per row.
+ANN_ENABLED = os.environ.get("FACE_ANN", "").lower() in ("1", "true", "ivf")
+ANN_MIN_ROWS = int(os.environ.get("FACE_ANN_MIN_ROWS", "20000"))
+ANN_NPROBE = int(os.environ.get("FACE_ANN_NPROBE", "16"))
+ANN_PATH = os.environ.get("FACE_ANN_PATH", os.path.splitext(DB_PATH)[0] + ".ivf.npz")
+ANN_SAVE_DELAY_SECONDS = float(os.environ.get("FACE_ANN_SAVE_DELAY", "5"))
+
+
+def assign_ivf(mat: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Nearest centroid (list number) for every row of ``mat``."""
+    out = np.empty(mat.shape[0], dtype=np.int32)
+    for i in range(0, mat.shape[0], chunk):
+        out[i:i + chunk] = np.argmax(dequantize(mat[i:i + chunk]) @ centroids.T, axis=1)
+    return out
+
+
+def train_ivf(mat: np.ndarray, nlist: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over a sample of ``mat``; returns L2-normalized centroids (nlist, dim)."""
+    rng = np.random.default_rng(seed)
+    nlist = max(1, min(nlist, mat.shape[0]))
+    sample = dequantize(mat[rng.choice(mat.shape[0], size=min(mat.shape[0], nlist * 64), replace=False)])
+    centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = assign_ivf(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+        # Re-seed empty lists from random rows so every list stays in use
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            centroids[empty] = sample[rng.choice(sample.shape[0], size=empty.size, replace=False)]
+        centroids = _normalize_rows(centroids)
+    return centroids
+
+
+class IVFView:
+    """Rows of one gallery version grouped by list; same ``top1`` contract as MatchIndex."""
+
+    def __init__(self, version: int, person_ids: List[str], matrix: np.ndarray,
+                 lists: np.ndarray, centroids: np.ndarray):
+        self.version = version
+        self.person_ids = person_ids
+        self.matrix = matrix
+        self.centroids = centroids
+        self._order = np.argsort(lists, kind="stable")
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=len(centroids)))])
+
+    def __len__(self) -> int:
+        return len(self.person_ids)
+
+    def top1(self, queries: np.ndarray, nprobe: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+        queries = np.atleast_2d(queries)
+        nprobe = min(nprobe or ANN_NPROBE, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        ids, scores = [], np.empty(len(queries), dtype=np.float32)
+        for m, q in enumerate(queries):
+            rows = np.concatenate([self._order[self._offsets[l]:self._offsets[l + 1]] for l in probes[m]])
+            if rows.size == 0:
+                rows = self._order
+            sims = dequantize(self.matrix[rows]) @ q
+            j = int(np.argmax(sims))
+            ids.append(self.person_ids[rows[j]])
+            scores[m] = sims[j]
+        return ids, scores
+
+
+class AnnIndex:
+    """Keeps an IVF partition of the gallery in step with it and persists it."""
+
+    def __init__(self, gallery: Gallery, path: str):
+        self._gallery = gallery
+        self._path = path
+        self._lock = threading.Lock()
+        self.centroids: Optional[np.ndarray] = None
+        self._keys = np.zeros(0, dtype=np.int64)  # sorted embeddings.id
+        self._lists = np.zeros(0, dtype=np.int32)  # list of each key
+        self.trained_rows = 0
+        self._view: Optional[IVFView] = None
+        self._training = False
+        self._dirty = False  # changed since the file was last written
+        self._save_lock = threading.Lock()
+        self._saver: Optional[threading.Thread] = None
+        self.saves = 0
+        self._load()
+        gallery.subscribe(lambda person_ids: self.sync())
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+        try:
+            with np.load(self._path) as data:
+                self.centroids = data["centroids"]
+                self._keys = data["keys"]
+                self._lists = data["lists"]
+                self.trained_rows = int(data["trained_rows"])
+            logger.info(f"🧭 ANN index loaded: {len(self.centroids)} lists, {len(self._keys)} rows")
+        except Exception as e:
+            logger.warning(f"⚠️  Ignoring unreadable ANN index {self._path}: {e}")
+
+    def save(self):
+        """Write the index file if it changed since the last write."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                centroids, keys, lists, trained_rows = self.centroids, self._keys, self._lists, self.trained_rows
+                self._dirty = False
+            # Arrays are replaced, never mutated, so they can be written outside the lock
+            tmp = self._path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, centroids=centroids, keys=keys, lists=lists, trained_rows=np.int64(trained_rows))
+            os.replace(tmp, self._path)
+            self.saves += 1
+
+    def _mark_dirty(self):
+        # Caller holds self._lock
+        self._dirty = True
+        if self._saver is None:
+            self._saver = threading.Thread(target=self._run_saver, name="ann-save", daemon=True)
+            self._saver.start()
+
+    def _run_saver(self):
+        while True:
+            time.sleep(ANN_SAVE_DELAY_SECONDS)
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"❌ ANN index save failed: {e}")
+
+    def sync(self):
+        """Assign rows added since the last sync, drop removed ones and rebuild the search view."""
+        with self._lock:
+            keys, person_ids, mat, version = self._gallery.rows()
+            if self.centroids is None or self.centroids.shape[1] != mat.shape[1]:
+                self._view = None
+                if len(keys) >= ANN_MIN_ROWS:
+                    self._start_training()
+                return
+            pos = np.minimum(np.searchsorted(self._keys, keys), max(len(self._keys) - 1, 0))
+            known = (self._keys[pos] == keys) if len(self._keys) else np.zeros(len(keys), dtype=bool)
+            lists = np.empty(len(keys), dtype=np.int32)
+            lists[known] = self._lists[pos[known]]
+            missing = ~known
+            if missing.any():
+                lists[missing] = assign_ivf(mat[missing], self.centroids)
+            changed = bool(missing.any()) or int(known.sum()) != len(self._keys)
+            order = np.argsort(keys)
+            self._keys, self._lists = keys[order], lists[order]
+            self._view = IVFView(version, person_ids, mat, lists, self.centroids) if len(keys) else None
+            if changed:
+                self._mark_dirty()
+            if len(keys) > 4 * self.trained_rows:
+                self._start_training()
+
+    def _start_training(self):
+        if self._training:
+            return
+        self._training = True
+        threading.Thread(target=self._train, name="ann-train", daemon=True).start()
+
+    def _train(self):
+        try:
+            keys, _, mat, _ = self._gallery.rows()
+            started = time.time()
+            centroids = train_ivf(mat, int(np.sqrt(len(keys))) or 1)
+            lists = assign_ivf(mat, centroids)
+            order = np.argsort(keys)
+            with self._lock:
+                self.centroids = centroids
+                self._keys, self._lists = keys[order], lists[order]
+                self.trained_rows = len(keys)
+                self._mark_dirty()
+            logger.info(f"🧭 ANN index trained: {len(centroids)} lists over {len(keys)} rows in {time.time() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"❌ ANN training failed: {e}")
+        finally:
+            self._training = False
+        self.sync()
+
+    def adopt_matrix(self, version: int, mat: np.ndarray):
+        """Point the search view at an identical (memory-mapped) copy of its matrix."""
+        view = self._view
+        if view is not None and view.version == version and view.matrix.shape == mat.shape:
+            view.matrix = mat
+
+    def view(self) -> Optional[IVFView]:
+        """The search view, if it matches the gallery's current version."""
+        view = self._view
+        if view is None or view.version != self._gallery.version:
+            return None
+        return view
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.view() is not None,
+            "lists": 0 if self.centroids is None else int(len(self.centroids)),
+            "rows": int(len(self._keys)),
+            "trained_rows": self.trained_rows,
+            "nprobe": ANN_NPROBE,
+            "training": self._training,
+            "saves": self.saves,
+            "unsaved": self._dirty,
+        }
+
+
+ANN_INDEX: Optional[AnnIndex] = AnnIndex(GALLERY, ANN_PATH) if ANN_ENABLED else None
+
+
+# -----------------------
+# Memory-mapped gallery snapshot
+# -----------------------
+# The resident gallery is also written to one file next to faces.db:
+#   b"FACEGAL1" | uint32 header length | JSON header | arrays (64-byte aligned)
+# The arrays are the embedding matrix (gallery dtype, gallery row order),
+# embeddings.id and person number per row, and group memberships as
+# offsets + person numbers. The header carries the snapshot generation, the
+# person ids and names, and a stamp (size, mtime) of faces.db and its WAL.
+# At startup a snapshot whose stamp still matches the database is opened
+# with np.memmap instead of reading SQLite. After writes it is rewritten
+# from the in-memory gallery (never by re-reading embeddings), debounced by
+# FACE_GALLERY_SNAPSHOT_DELAY seconds. Other processes on the same files
+# (extra uvicorn workers) pick up the new snapshot and share its pages.
+# The stamp is taken just before a read transaction that checks the
+# in-memory gallery against the embedding ids and names in SQLite, so a
+# snapshot never claims commits it does not contain. Off unless
+# FACE_GALLERY_SNAPSHOT=1.
+SNAPSHOT_ENABLED = os.environ.get("FACE_GALLERY_SNAPSHOT", "0").lower() in ("1", "true", "on")
+SNAPSHOT_PATH = os.environ.get("FACE_GALLERY_SNAPSHOT_PATH", os.path.splitext(DB_PATH)[0] + ".gallery")
+SNAPSHOT_DELAY_SECONDS = float(os.environ.get("FACE_GALLERY_SNAPSHOT_DELAY", "2"))
+_SNAPSHOT_MAGIC = b"FACEGAL1"
+
+
+def _db_stamp() -> List[int]:
+    """Size and mtime of the database and its WAL; changes whenever anything is written.
+
+    An empty WAL counts as no WAL, so a checkpointed database keeps its stamp
+    whether the file was truncated (pooled connections) or deleted on close.
+    """
+    stamp = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            st = os.stat(path)
+            stamp += [st.st_size, st.st_mtime_ns] if st.st_size else [0, 0]
+        except FileNotFoundError:
+            stamp += [0, 0]
+    return stamp
+
+
+def _file_id(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _snapshot_data_offset(header_size: int) -> int:
+    # Arrays start at the first 4 KiB boundary after the header
+    return -(-(12 + header_size) // 4096) * 4096
+
+
+def read_snapshot_header(path: str) -> dict:
+    with open(path, "rb") as f:
+        if f.read(8) != _SNAPSHOT_MAGIC:
+            raise ValueError("not a gallery snapshot")
+        size = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+        header = json.loads(f.read(size))
+    header["data_offset"] = _snapshot_data_offset(size)
+    return header
+
+
+def write_snapshot(path: str, header: dict, arrays: dict, chunk_rows: int = GALLERY_BLOCK_ROWS):
+    """Write ``arrays`` (name -> ndarray) after ``header``; atomically replaces ``path``."""
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        offset += -(-arr.nbytes // 64) * 64
+    blob = json.dumps(dict(header, arrays=layout)).encode()
+    base = _snapshot_data_offset(len(blob))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_SNAPSHOT_MAGIC + np.uint32(len(blob)).tobytes() + blob)
+        for name, arr in arrays.items():
+            f.seek(base + layout[name]["offset"])
+            for i in range(0, len(arr), chunk_rows):
+                f.write(np.ascontiguousarray(arr[i:i + chunk_rows]).tobytes())
+        f.truncate(base + offset)
+    os.replace(tmp, path)
+
+
+def open_snapshot(path: str) -> Tuple[dict, dict]:
+    """``(header, arrays)`` with every array memory-mapped read-only."""
+    header = read_snapshot_header(path)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype=spec["dtype"])
+        else:
+            arrays[name] = np.asarray(np.memmap(path, dtype=spec["dtype"], mode="r",
+                                                offset=header["data_offset"] + spec["offset"], shape=shape))
+    return header, arrays
+
+
+class GallerySnapshot:
+    """Keeps SNAPSHOT_PATH in step with GALLERY and serves group memberships from it."""
+
+    def __init__(self, gallery: Gallery, shards: GroupShardCache, path: str):
+        self._gallery = gallery
+        self._shards = shards
+        self._path = path
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._groups: dict = {}
+        self._groups_at: Optional[Tuple[int, int]] = None  # (gallery version, group epoch) they are valid for
+        self._written: Optional[Tuple[int, int, int]] = None  # change counters the file reflects
+        self._file: Optional[Tuple[int, int]] = None  # the snapshot file we last wrote or opened
+        self._thread: Optional[threading.Thread] = None
+        self.writes = 0
+        self.last_write_ms = 0.0
+
+    def _counters(self) -> Tuple[int, int, int]:
+        return self._gallery.version, self._gallery.names_version, self._shards.group_epoch
+
+    def members(self, group_id: str) -> Optional[List[str]]:
+        """Members of ``group_id`` as of the snapshot, or None if they may be stale."""
+        if self._groups_at != (self._gallery.version, self._shards.group_epoch):
+            return None
+        return self._groups.get(group_id, [])
+
+    def open(self, require_fresh: bool = True) -> bool:
+        """Install the snapshot into the gallery if it exists and matches the database."""
+        with self._lock:
+            try:
+                header, arrays = open_snapshot(self._path)
+            except FileNotFoundError:
+                return False
+            except Exception as e:
+                logger.warning(f"⚠️  Ignoring unreadable gallery snapshot {self._path}: {e}")
+                return False
+            if header.get("dtype") != GALLERY_DTYPE or (require_fresh and header.get("db_stamp") != _db_stamp()):
+                return False
+            file_id = _file_id(self._path)
+            persons = header["persons"]
+            person_ids = [persons[i] for i in arrays["row_person"]]
+            self._gallery.replace(person_ids, arrays["matrix"], arrays["row_keys"], header["names"])
+            offsets, flat = arrays["group_offsets"], arrays["group_members"]
+            self._groups = {gid: [persons[i] for i in flat[offsets[g]:offsets[g + 1]]]
+                            for g, gid in enumerate(header["groups"])}
+            self._groups_at = (self._gallery.version, self._shards.group_epoch)
+            self._written = self._counters()
+            self._file = file_id
+            self.generation = int(header.get("generation", 0))
+        logger.info(f"🗂️  Gallery snapshot opened: {len(person_ids)} embeddings (generation {self.generation})")
+        return True
+
+    def write(self):
+        """Serialize the current gallery and group memberships, then map the new file."""
+        with self._lock:
+            started = time.time()
+            counters = self._counters()
+            keys, person_ids, mat, version = self._gallery.rows()
+            names = self._gallery.names()
+            emb_col = embedding_column()
+            conn = get_conn()
+            try:
+                cur = conn.cursor()
+                # Fold the WAL into faces.db so the stamp survives a restart
+                cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                # Stamp first, then read: a commit in between can only make the
+                # stamp older than what the transaction sees, never newer
+                db_stamp = _db_stamp()
+                cur.execute("BEGIN")
+                try:
+                    cur.execute("SELECT group_id, person_id FROM group_members ORDER BY group_id")
+                    memberships = cur.fetchall()
+                    db_keys = []
+                    if emb_col:
+                        cur.execute(f"SELECT id FROM embeddings WHERE length({emb_col}) > 0 ORDER BY id")
+                        db_keys = [key for key, in cur.fetchall()]
+                    cur.execute("SELECT person_id, person_name FROM persons")
+                    db_names = dict(cur.fetchall())
+                finally:
+                    conn.commit()
+            finally:
+                conn.close()
+            stale = db_names != names or not np.array_equal(np.sort(keys), np.asarray(db_keys, dtype=np.int64))
+            if not stale:
+                slot = {pid: i for i, pid in enumerate(names)}
+                for pid in itertools.chain(person_ids, (p for _, p in memberships)):
+                    slot.setdefault(pid, len(slot))
+                groups = list(dict.fromkeys(gid for gid, _ in memberships))
+                counts = Counter(gid for gid, _ in memberships)
+                arrays = {
+                    "matrix": mat,
+                    "row_keys": np.asarray(keys, dtype=np.int64),
+                    "row_person": np.fromiter((slot[pid] for pid in person_ids), dtype=np.int32, count=len(person_ids)),
+                    "group_offsets": np.concatenate([[0], np.cumsum([counts[g] for g in groups])]).astype(np.int64),
+                    "group_members": np.fromiter((slot[pid] for _, pid in memberships), dtype=np.int32, count=len(memberships)),
+                }
+                header = {
+                    "generation": self.generation + 1,
+                    "created_at": time.time(),
+                    "dtype": GALLERY_DTYPE,
+                    "rows": len(person_ids),
+                    "dim": int(mat.shape[1]),
+                    "db_stamp": db_stamp,
+                    "persons": list(slot),
+                    "names": names,
+                    "groups": groups,
+                }
+                write_snapshot(self._path, header, arrays)
+                self.generation += 1
+                self._file = _file_id(self._path)
+                self._written = counters
+                self.writes += 1
+                self.last_write_ms = (time.time() - started) * 1000
+                # Match against the shared page-cache copy from now on
+                try:
+                    _, mapped = open_snapshot(self._path)
+                    if self._gallery.adopt_matrix(version, mapped["matrix"]) and ANN_INDEX is not None:
+                        ANN_INDEX.adopt_matrix(version, mapped["matrix"])
+                except Exception as e:
+                    logger.warning(f"⚠️  Could not map the new gallery snapshot: {e}")
+                self._groups = {}
+                for gid, pid in memberships:
+                    self._groups.setdefault(gid, []).append(pid)
+                self._groups_at = (counters[0], counters[2])
+        if stale:
+            # Another worker committed since this gallery was built: reload, and
+            # the next poll writes a snapshot that matches its stamp
+            logger.info("🗂️  Gallery is behind the database; reloading before the next snapshot")
+            self._gallery.load()
+            return
+        logger.info(f"🗂️  Gallery snapshot written: {len(person_ids)} embeddings in {self.last_write_ms:.0f} ms")
+
+    def _poll(self):
+        current = self._counters()
+        if self._file is not None and _file_id(self._path) not in (None, self._file):
+            # Another process rewrote the snapshot. Adopt it unless we have
+            # our own unsaved changes; then SQLite decides.
+            if current == self._written and self.open(require_fresh=True):
+                return
+            self._gallery.load()
+            current = self._counters()
+        if current != self._written:
+            self.write()
+
+    def _run(self):
+        while True:
+            time.sleep(SNAPSHOT_DELAY_SECONDS)
+            try:
+                self._poll()
+            except Exception as e:
+                logger.error(f"❌ Gallery snapshot update failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gallery-snapshot", daemon=True)
+            self._thread.start()
 
+    def stats(self) -> dict:
+        return {
+            "path": self._path,
+            "generation": self.generation,
+            "writes": self.writes,
+            "last_write_ms": round(self.last_write_ms, 1),
+            "pending": self._counters() != self._written,
+        }
 
-def person_name_map() -> dict:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT person_id, person_name FROM persons")
-    rows = cur.fetchall()
-    conn.close()
-    return {pid: name for pid, name in rows}
 
+SNAPSHOT: Optional[GallerySnapshot] = GallerySnapshot(GALLERY, GROUP_SHARDS, SNAPSHOT_PATH) if SNAPSHOT_ENABLED else None
 
-# Simple in-memory cache for group members to reduce DB lookups per request
-_group_members_cache: dict = {}
-_GROUP_MEMBERS_TTL_SECONDS = 60.0
 
-def get_group_members_cached(group_id: str) -> List[str]:
-    now = time.time()
-    cached = _group_members_cache.get(group_id)
-    if cached and (now - cached[0]) < _GROUP_MEMBERS_TTL_SECONDS:
-        return cached[1]
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT person_id FROM group_members WHERE group_id = ?", (group_id,))
-    members = [r[0] for r in cur.fetchall()]
-    conn.close()
-    _group_members_cache[group_id] = (now, members)
-    return members
+def gallery_for(filter_ids: Optional[List[str]], group_id: Optional[str]):
+    """Pick what to match against: explicit filter_ids, else the group's shard, else everyone.
+
+    Returns a MatchIndex, or an IVFView for the whole gallery once the ANN index is ready.
+    """
+    if not filter_ids and group_id:
+        shard = GROUP_SHARDS.get(group_id)
+        if shard["members"]:
+            return shard["index"]
+    if not filter_ids and ANN_INDEX is not None:
+        view = ANN_INDEX.view()
+        if view is not None:
+            return view
+    return GALLERY.index(filter_ids)
 
 
 # Person & Group management endpoints
@@ -678,6 +2954,7 @@ def create_person(req: PersonCreate):
     )
     conn.commit()
     conn.close()
+    GALLERY.set_name(req.person_id, req.person_name)
     return {"status": "ok"}
 
 
@@ -731,6 +3008,7 @@ def update_person(req: PersonUpdate):
     
     conn.commit()
     conn.close()
+    GALLERY.set_name(req.person_id, req.person_name)
     return {"status": "ok", "person_id": req.person_id}
 
 
@@ -767,6 +3045,7 @@ def add_member(req: GroupAddMember):
     )
     conn.commit()
     conn.close()
+    GROUP_SHARDS.invalidate_group(req.group_id)
     return {"status": "ok"}
 
 
@@ -785,9 +3064,29 @@ def remove_member(req: GroupRemoveMember):
     )
     conn.commit()
     conn.close()
+    GROUP_SHARDS.invalidate_group(req.group_id)
     return {"status": "ok"}
 
 
+class GroupPrewarmRequest(BaseModel):
+    group_id: str
+
+
+@app.post("/group/prewarm")
+def prewarm_group(req: GroupPrewarmRequest):
+    """Build a group's gallery shard ahead of an attendance session"""
+    GROUP_SHARDS.invalidate_group(req.group_id)
+    shard = GROUP_SHARDS.get(req.group_id)
+    return {
+        "status": "ok",
+        "group_id": req.group_id,
+        "members": len(shard["members"]),
+        "embeddings": len(shard["person_ids"]),
+        "bytes": int(shard["matrix"].nbytes),
+        "cache": GROUP_SHARDS.stats(),
+    }
+
+
 class DeletePersonRequest(BaseModel):
     person_id: str
 
@@ -799,9 +3098,13 @@ def delete_person(req: DeletePersonRequest):
     # Cascade delete: remove embeddings, group memberships, then person
     cur.execute("DELETE FROM embeddings WHERE person_id = ?", (req.person_id,))
     cur.execute("DELETE FROM group_members WHERE person_id = ?", (req.person_id,))
+    photos = [row[0] for row in cur.execute("SELECT filename FROM photos WHERE person_id = ?", (req.person_id,))]
+    cur.execute("DELETE FROM photos WHERE person_id = ?", (req.person_id,))
     cur.execute("DELETE FROM persons WHERE person_id = ?", (req.person_id,))
     conn.commit()
+    remove_photo_files(cur, req.person_id, photos)
     conn.close()
+    GALLERY.remove_persons([req.person_id])
     return {"status": "ok"}
 
 
@@ -818,78 +3121,322 @@ def delete_group(req: DeleteGroupRequest):
     cur.execute("DELETE FROM groups WHERE group_id = ?", (req.group_id,))
     conn.commit()
     conn.close()
+    GROUP_SHARDS.invalidate_group(req.group_id)
     return {"status": "ok"}
 
 
+def _etag(kind: str, version: int, *params) -> str:
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+    return f'W/"{kind}-{version}-{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    # Weak comparison: W/"x" and "x" name the same representation
+    opaque = {t[2:] if t.startswith("W/") else t for t in tags}
+    return "*" in opaque or etag[2:] in opaque
+
+
+def _encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+GROUPS_PAGE_MAX = 500
+
+
 @app.get("/groups")
-def list_groups():
+def list_groups(request: Request, response: Response, limit: Optional[int] = None,
+                cursor: Optional[str] = None, include_members: bool = True):
+    """Groups with their metadata and, optionally, member ids, ordered by group_id.
+
+    Without ``limit`` every group is returned. With it, pass ``next_cursor``
+    back as ``cursor`` for the next page. Responses carry an ETag; a matching
+    If-None-Match gets 304 without running the listing query.
+    """
+    if limit is not None and not 1 <= limit <= GROUPS_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {GROUPS_PAGE_MAX}")
+    after = _decode_cursor(cursor) if cursor else None
+    etag = _etag("groups", change_counter("groups"), limit, cursor, include_members)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    # One statement: members are aggregated per group by the engine
+    members_sql = (
+        "(SELECT json_group_array(m.person_id) FROM group_members m WHERE m.group_id = g.group_id)"
+        if include_members else "NULL"
+    )
+    sql = f"SELECT g.group_id, g.group_name, g.age, g.guides_info, g.notes, {members_sql} FROM groups g"
+    params: list = []
+    if after is not None:
+        sql += " WHERE g.group_id > ?"
+        params.append(after)
+    sql += " ORDER BY g.group_id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT group_id, group_name FROM groups")
-    groups = cur.fetchall()
-    out = []
-    for gid, gname in groups:
-        cur.execute("SELECT person_id FROM group_members WHERE group_id = ?", (gid,))
-        members = [r[0] for r in cur.fetchall()]
-        out.append({"group_id": gid, "group_name": gname, "members": members})
-    conn.close()
-    return {"groups": out}
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][0])
+    groups = []
+    for group_id, group_name, age, guides_info, notes, members in rows:
+        group = {
+            "group_id": group_id,
+            "group_name": group_name,
+            "age": age,
+            "guides_info": guides_info,
+            "notes": notes,
+        }
+        if include_members:
+            group["members"] = json.loads(members)
+        groups.append(group)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return {"groups": groups, "next_cursor": next_cursor}
 
 
-@app.post("/recognize")
-def recognize(req: RecognizeRequest):
-    if face_app is None:
-        raise HTTPException(status_code=400, detail="Service not initialized")
+def _record_recognized(state: dict, image: IngestedImage, ts: Optional[float], person_id: str, score: float, bbox: Tuple[float, float, float, float]):
+    x1, y1, x2, y2 = bbox
+    person_name = GALLERY.name(person_id)
+    with _live_report(state) as state:
+        if state is None:
+            return
+        state["totalFacesDetected"] += 1
+        state["peopleRecognized"].add(person_name)
+    path = _save_face_crop(image, bbox, state["faces_known_dir"], prefix=f"ts{int((ts or 0)*1000)}", person_name=person_name)
+    _append_event(state, {
+        "timestamp": ts,
+        "type": "recognized",
+        "person_id": person_id,
+        "person_name": person_name,
+        "confidence": score,
+        "box": {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1},
+        "image_path": os.path.relpath(path, state["dir"]) if path else None,
+    })
 
-    img_pil = decode_image_b64(req.image)
-    img = pil_to_ndarray(img_pil)
-    faces = face_app.get(img)
-    if not faces:
-        return {"faces": []}
 
-    # If group provided and no filter_ids, derive IDs from group membership (cached)
-    filter_ids = req.filter_ids
-    if not filter_ids and req.group_id:
-        filter_ids = get_group_members_cached(req.group_id)
+# -----------------------
+# Cross-frame face tracking
+# -----------------------
+TRACK_IOU_MIN = float(os.environ.get("FACE_TRACK_IOU_MIN", "0.3"))
+TRACK_CENTROID_MAX = float(os.environ.get("FACE_TRACK_CENTROID_MAX", "0.5"))  # fraction of box size
+TRACK_MAX_MISSES = int(os.environ.get("FACE_TRACK_MAX_MISSES", "3"))
+TRACK_REEMBED_EVERY = int(os.environ.get("FACE_TRACK_REEMBED_EVERY", "5"))
+TRACK_CONF_DECAY = float(os.environ.get("FACE_TRACK_CONF_DECAY", "0.97"))
+TRACK_SESSION_TTL_SECONDS = float(os.environ.get("FACE_TRACK_SESSION_TTL", "300"))
+TRACK_MAX_SESSIONS = 256
+
+
+def _iou(b1, b2) -> float:
+    x1 = max(b1[0], b2[0])
+    y1 = max(b1[1], b2[1])
+    x2 = min(b1[2], b2[2])
+    y2 = min(b1[3], b2[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    if inter <= 0:
+        return 0.0
+    a1 = (b1[2] - b1[0]) * (b1[3] - b1[1])
+    a2 = (b2[2] - b2[0]) * (b2[3] - b2[1])
+    denom = a1 + a2 - inter
+    return inter / denom if denom > 0 else 0.0
+
+
+def _centroid_dist(b1, b2) -> float:
+    """Centre distance normalized by the larger box side."""
+    c1 = ((b1[0] + b1[2]) / 2, (b1[1] + b1[3]) / 2)
+    c2 = ((b2[0] + b2[2]) / 2, (b2[1] + b2[3]) / 2)
+    size = max(b1[2] - b1[0], b1[3] - b1[1], b2[2] - b2[0], b2[3] - b2[1], 1.0)
+    return float(np.hypot(c1[0] - c2[0], c1[1] - c2[1]) / size)
+
+
+class FaceTracker:
+    """Greedy IoU/centroid tracker for one camera session.
+
+    Each track carries the identity from its last embedding so recognition
+    only has to re-run when a track is new, every ``TRACK_REEMBED_EVERY``
+    frames, when its decayed confidence falls below the threshold or when
+    the gallery changed underneath it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tracks: List[dict] = []
+        self.last_used = time.time()
+        self._next_id = 1
+
+    def update(self, boxes: np.ndarray) -> List[dict]:
+        """Associate this frame's ``boxes`` (N x 4, xyxy) and return one track per box."""
+        self.last_used = time.time()
+        pairs = []
+        for ti, t in enumerate(self.tracks):
+            for bi in range(boxes.shape[0]):
+                iou = _iou(t["box"], boxes[bi])
+                if iou >= TRACK_IOU_MIN:
+                    pairs.append((-iou, 0.0, ti, bi))
+                else:
+                    dist = _centroid_dist(t["box"], boxes[bi])
+                    if dist <= TRACK_CENTROID_MAX:
+                        pairs.append((0.0, dist, ti, bi))
+        pairs.sort()
+        assigned: dict = {}
+        used_tracks = set()
+        for _, _, ti, bi in pairs:
+            if ti in used_tracks or bi in assigned:
+                continue
+            used_tracks.add(ti)
+            assigned[bi] = self.tracks[ti]
+
+        out = []
+        for bi in range(boxes.shape[0]):
+            t = assigned.get(bi)
+            if t is None:
+                t = {"track_id": self._next_id, "person_id": None, "score": None,
+                     "frames_since_embed": None, "gallery_version": None}
+                self._next_id += 1
+                self.tracks.append(t)
+            elif t["frames_since_embed"] is not None:
+                t["frames_since_embed"] += 1
+            t["box"] = tuple(float(v) for v in boxes[bi][:4])
+            t["misses"] = 0
+            out.append(t)
+        live = {id(t) for t in out}
+        for t in self.tracks:
+            if id(t) not in live:
+                t["misses"] += 1
+        self.tracks = [t for t in self.tracks if t["misses"] <= TRACK_MAX_MISSES]
+        return out
+
+    @staticmethod
+    def needs_embedding(t: dict) -> bool:
+        if t["frames_since_embed"] is None or t["frames_since_embed"] >= TRACK_REEMBED_EVERY:
+            return True
+        if t["gallery_version"] != GALLERY.version:
+            return True
+        if t["person_id"] is not None:
+            return t["score"] * (TRACK_CONF_DECAY ** t["frames_since_embed"]) < THRESHOLD
+        return False
+
+    @staticmethod
+    def assign(t: dict, person_id: Optional[str], score: float):
+        t["person_id"] = person_id
+        t["score"] = score
+        t["frames_since_embed"] = 0
+        t["gallery_version"] = GALLERY.version
+
+
+_trackers: "OrderedDict[str, FaceTracker]" = OrderedDict()
+_trackers_lock = threading.Lock()
+
+
+def get_tracker(key: str) -> FaceTracker:
+    """Tracker for a camera session; idle sessions are pruned."""
+    now = time.time()
+    with _trackers_lock:
+        while _trackers:
+            oldest_key, oldest = next(iter(_trackers.items()))
+            if now - oldest.last_used <= TRACK_SESSION_TTL_SECONDS and len(_trackers) < TRACK_MAX_SESSIONS:
+                break
+            _trackers.pop(oldest_key)
+        tracker = _trackers.pop(key, None) or FaceTracker()
+        tracker.last_used = now
+        _trackers[key] = tracker
+        return tracker
+
+
+def _recognize_tracked(image: IngestedImage, filter_ids: Optional[List[str]], group_id: Optional[str],
+                       state: Optional[dict], ts: Optional[float], tracker: FaceTracker,
+                       det_size: Optional[int] = None) -> List[dict]:
+    """Detector every frame; recognition only for tracks whose identity is stale."""
+    img = image.array
+    bboxes, kpss = detect_faces(img, hint=det_size)
+    with tracker.lock:
+        tracks = tracker.update(bboxes[:, :4] / image.scale)
+        if not tracks:
+            return []
+
+        index = gallery_for(filter_ids, group_id)
+        if not len(index):
+            return []
+
+        if state:
+            _record_frame_seen(state, ts)
+
+        stale = [i for i, t in enumerate(tracks) if kpss is not None and tracker.needs_embedding(t)]
+        if stale:
+            best_ids, scores = index.top1(embed_aligned([image.align(kpss[i] / image.scale) for i in stale]))
+            for i, best_id, score in zip(stale, best_ids, scores):
+                score = float(score)
+                tracker.assign(tracks[i], best_id if score >= THRESHOLD else None, score)
+
+        results = []
+        for t in tracks:
+            if t["person_id"] is None:
+                continue
+            x1, y1, x2, y2 = t["box"]
+            results.append({
+                "person_id": t["person_id"],
+                "person_name": GALLERY.name(t["person_id"]),
+                "confidence": t["score"],
+                "box": {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1},
+                "track_id": t["track_id"],
+            })
+            if state:
+                _record_recognized(state, image, ts, t["person_id"], t["score"], (x1, y1, x2, y2))
+        return results
+
 
-    enrolled = load_embeddings(filter_ids)
-    if not enrolled:
-        return {"faces": []}
+def recognize_image(image: IngestedImage, filter_ids: Optional[List[str]], group_id: Optional[str],
+                    state: Optional[dict] = None, ts: Optional[float] = None,
+                    tracker: Optional[FaceTracker] = None, det_size: Optional[int] = None) -> List[dict]:
+    """Detect and match every face in one frame; shared by /recognize and /ws/recognize."""
+    if tracker is not None:
+        return _recognize_tracked(image, filter_ids, group_id, state, ts, tracker, det_size)
+    faces = analyze_image("embed", image, det_size=det_size)
+    if not faces:
+        return []
+
+    # Resident, pre-normalized gallery: no DB access on the hot path
+    index = gallery_for(filter_ids, group_id)
+    if not len(index):
+        return []
 
-    id_to_name = person_name_map()
     results = []
-    start_time = time.time()
-    # Prepare vectorized matrix of enrolled embeddings for faster matching (accuracy preserved)
-    enrolled_ids = [pid for pid, _ in enrolled]
-    enrolled_mat = np.stack([l2_normalize(e.astype(np.float32)) for _, e in enrolled], axis=0)
-
-    # Optional reporting: record frame and recognized crops if report_id provided
-    report_id = req.report_id
-    ts = req.timestamp
-    state = _ensure_report_dirs(report_id) if report_id else None
+
+    # Optional reporting: record frame and recognized crops if a report is active
     if state:
         _record_frame_seen(state, ts)
 
-    for f in faces:
-        emb = np.array(f.normed_embedding, dtype=np.float32)
-        emb = l2_normalize(emb)
-        # Cosine similarity since both sides are L2-normalized
-        sims = enrolled_mat @ emb  # shape: (N,)
-        # top-1 and top-2
-        best_idx = int(np.argmax(sims))
-        best_score = float(sims[best_idx])
-        second_score = float(np.partition(sims, -2)[-2]) if sims.shape[0] > 1 else -1.0
+    # Cosine similarity since both sides are L2-normalized
+    queries = _normalize_rows(np.stack([f.normed_embedding for f in faces]))
+    best_ids, best_scores = index.top1(queries)
+    for f, best_id, best_score in zip(faces, best_ids, best_scores):
+        best_score = float(best_score)
 
         # Face size based rules (disabled small-face gate to restore previous behavior)
         x1, y1, x2, y2 = map(float, f.bbox)
         face_w = x2 - x1
         
         if best_score >= THRESHOLD:
-            best_id = enrolled_ids[best_idx]
             results.append(
                 {
                     "person_id": best_id,
-                    "person_name": id_to_name.get(best_id, best_id),
+                    "person_name": GALLERY.name(best_id),
                     "confidence": best_score,
                     "box": {
                         "x": x1,
@@ -901,42 +3448,349 @@ def recognize(req: RecognizeRequest):
             )
             # Save known face crop if report is active
             if state:
-                state["totalFacesDetected"] += 1
-                state["peopleRecognized"].add(id_to_name.get(best_id, best_id))
-                person_name = id_to_name.get(best_id, best_id)
-                path = _save_face_crop(img_pil, (x1, y1, x2, y2), state["faces_known_dir"], prefix=f"ts{int((ts or 0)*1000)}", person_name=person_name)
-                _append_event(state, {
-                    "timestamp": ts,
-                    "type": "recognized",
-                    "person_id": best_id,
-                    "person_name": id_to_name.get(best_id, best_id),
-                    "confidence": best_score,
-                    "box": {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1},
-                    "image_path": os.path.relpath(path, state["dir"]) if path else None,
-                })
-        # stop after ~700ms to avoid blocking live camera
-        if (time.time() - start_time) >= 0.7:
-            break
+                _record_recognized(state, image, ts, best_id, best_score, (x1, y1, x2, y2))
+
+    return results
+
+
+@app.post("/recognize", openapi_extra=image_openapi(RecognizeRequest))
+@admit("live")
+def recognize(req: RecognizeRequest = Depends(image_body(RecognizeRequest))):
+    if face_app is None:
+        raise HTTPException(status_code=400, detail="Service not initialized")
+
+    image = load_image(req)
+    state = _frame_report(req.report_id)
+    tracker = get_tracker(f"recognize:{req.session_id}") if req.session_id else None
+    return {"faces": recognize_image(image, req.filter_ids, req.group_id, state, req.timestamp, tracker, req.det_size)}
+
+
+# -----------------------
+# Streaming recognition
+# -----------------------
+class _LatestFrame:
+    """Single-slot mailbox: a new frame replaces any frame not yet picked up."""
+
+    def __init__(self):
+        self._item = None
+        self._event = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def get(self):
+        while self._item is None and not self.closed:
+            self._event.clear()
+            await self._event.wait()
+        item, self._item = self._item, None
+        return item
+
+
+@app.websocket("/ws/recognize")
+async def ws_recognize(websocket: WebSocket):
+    """
+    Live recognition stream for one camera session.
+
+    Bind once with query params (group_id, report_id, filter_ids), then send
+    binary JPEG/PNG frames. A text message {"timestamp": t} stamps the next
+    binary frame; {"image": "<base64>", "timestamp": t} is accepted as well.
+    Only the newest pending frame is processed, so when inference falls behind
+    older frames are dropped instead of queueing.
+    """
+    await websocket.accept()
+    if face_app is None:
+        await websocket.send_json({"error": "Service not initialized"})
+        await websocket.close(code=1011)
+        return
+
+    params = websocket.query_params
+    group_id = params.get("group_id")
+    filter_ids = [v.strip() for item in params.getlist("filter_ids") for v in item.split(",") if v.strip()] or None
+    report_id = params.get("report_id")
+    det_size = int(params["det_size"]) if params.get("det_size", "").isdigit() else None
+    state = _frame_report(report_id)
+    tracker = FaceTracker()
+    mailbox = _LatestFrame()
+
+    async def receive_frames():
+        seq = 0
+        next_ts = None
+        try:
+            while True:
+                msg = await websocket.receive()
+                if msg["type"] == "websocket.disconnect":
+                    break
+                if msg.get("bytes") is not None:
+                    raw, ts, next_ts = msg["bytes"], next_ts, None
+                else:
+                    try:
+                        data = json.loads(msg.get("text") or "{}")
+                    except ValueError:
+                        continue
+                    # A bad message is answered on its own; it must not end the stream
+                    try:
+                        if not isinstance(data, dict):
+                            raise HTTPException(status_code=400, detail="Text messages must be JSON objects")
+                        if not isinstance(data.get("image", ""), str):
+                            raise HTTPException(status_code=400, detail="\"image\" must be a base64 string")
+                        ts = data.get("timestamp")
+                        if ts is not None and (isinstance(ts, bool) or not isinstance(ts, (int, float))):
+                            raise HTTPException(status_code=400, detail="\"timestamp\" must be a number")
+                        if not data.get("image"):
+                            next_ts = ts
+                            continue
+                        raw = b64_image_bytes(data["image"])
+                    except HTTPException as e:
+                        seq += 1
+                        await websocket.send_json({"frame": seq, "error": e.detail})
+                        continue
+                seq += 1
+                mailbox.put((seq, ts, raw, time.time()))
+        finally:
+            mailbox.close()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            item = await mailbox.get()
+            if item is None:
+                break
+            seq, ts, raw, received_at = item
+            out = {"frame": seq, "timestamp": ts}
+            try:
+                image = await run_in_threadpool(ingest_image, raw)
+                out["faces"] = await run_in_threadpool(admit("live")(recognize_image), image, filter_ids, group_id, state, ts, tracker, det_size)
+            except HTTPException as e:
+                out["error"] = e.detail
+                if e.headers:
+                    out["retry_after"] = int(e.headers["Retry-After"])
+            except Exception as e:
+                out["error"] = str(e)
+            out["latency_ms"] = round((time.time() - received_at) * 1000, 1)
+            out["dropped"] = mailbox.dropped
+            await websocket.send_json(out)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+
+# -----------------------
+# Batched recognition
+# -----------------------
+MAX_BATCH_FRAMES = int(os.environ.get("FACE_MAX_BATCH_FRAMES", "64"))
+RECOGNITION_BATCH_SIZE = int(os.environ.get("FACE_RECOGNITION_BATCH_SIZE", "32"))
+
+
+# Micro-batching: crops from concurrent requests that arrive within the window
+# (or until MICROBATCH_MAX faces are waiting) share one ArcFace call. Off when
+# the window is 0. Applies to in-process inference; pool workers batch per request.
+MICROBATCH_WINDOW_MS = float(os.environ.get("FACE_MICROBATCH_WINDOW_MS", "0"))
+MICROBATCH_MAX = int(os.environ.get("FACE_MICROBATCH_MAX", str(RECOGNITION_BATCH_SIZE)))
+
+
+def _get_feat_chunked(crops: List[np.ndarray]) -> np.ndarray:
+    rec = face_app.models['recognition']
+    feats = [rec.get_feat(crops[i:i + RECOGNITION_BATCH_SIZE]) for i in range(0, len(crops), RECOGNITION_BATCH_SIZE)]
+    return np.concatenate(feats, axis=0).reshape(len(crops), -1)
+
+
+class EmbeddingBatcher:
+    """Collects aligned crops from concurrent callers and runs them as one ArcFace batch."""
+
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[List[np.ndarray], Future]] = []
+        self._pending_faces = 0
+        self.batches = 0
+        self.requests = 0
+        self.faces = 0
+        # Started on first use, so importing main (e.g. in a pool worker) starts no thread
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, crops: List[np.ndarray]) -> np.ndarray:
+        fut: Future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((crops, fut))
+            self._pending_faces += len(crops)
+            self._cond.notify_all()
+        return fut.result()
+
+    def _take(self) -> List[Tuple[List[np.ndarray], Future]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            opened = time.monotonic()
+            while self._pending_faces < self.max_batch:
+                remaining = self.window - (time.monotonic() - opened)
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            # Whole requests only; a single oversized request still goes alone
+            taken, n = [], 0
+            while self._pending and (not taken or n + len(self._pending[0][0]) <= self.max_batch):
+                crops, fut = self._pending.pop(0)
+                taken.append((crops, fut))
+                n += len(crops)
+            self._pending_faces -= n
+            return taken
+
+    def _run(self):
+        while True:
+            taken = self._take()
+            try:
+                feats = _get_feat_chunked([c for crops, _ in taken for c in crops])
+            except Exception as e:
+                for _, fut in taken:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(taken)
+            self.faces += feats.shape[0]
+            start = 0
+            for crops, fut in taken:
+                fut.set_result(feats[start:start + len(crops)])
+                start += len(crops)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "mean_batch_faces": round(self.faces / self.batches, 2) if self.batches else None,
+            "mean_batch_requests": round(self.requests / self.batches, 2) if self.batches else None,
+        }
+
+
+embedding_batcher: Optional[EmbeddingBatcher] = (
+    EmbeddingBatcher(MICROBATCH_WINDOW_MS, MICROBATCH_MAX) if MICROBATCH_WINDOW_MS > 0 else None
+)
+
+
+def embed_raw(crops: List[np.ndarray]) -> np.ndarray:
+    """ArcFace features (N, 512), not normalized, for 112x112 aligned crops."""
+    if not crops:
+        return np.zeros((0, 512), dtype=np.float32)
+    if embedding_batcher is not None:
+        return embedding_batcher.submit(crops)
+    return _get_feat_chunked(crops)
+
+
+def embed_aligned(crops: List[np.ndarray]) -> np.ndarray:
+    """Batched ArcFace forward pass over 112x112 aligned crops -> L2-normalized (N, 512)."""
+    if inference_pool is not None and crops:
+        out = _offload("embed", np.stack(crops))
+        if out is not None:
+            return out
+    return _normalize_rows(embed_raw(crops))
+
+
+def align_face(img: np.ndarray, kps: np.ndarray) -> np.ndarray:
+    rec = face_app.models['recognition']
+    return face_align.norm_crop(img, landmark=kps, image_size=rec.input_size[0])
+
+
+class BatchFrame(BaseModel):
+    image: str  # dataURL or base64
+    timestamp: Optional[float] = None
+    camera_id: Optional[str] = None
+
+
+class RecognizeBatchRequest(BaseModel):
+    frames: List[BatchFrame]
+    filter_ids: Optional[List[str]] = None
+    group_id: Optional[str] = None
+    report_id: Optional[str] = None
+    det_size: Optional[int] = None
+
+
+@app.post("/recognize/batch")
+@admit("video")
+def recognize_batch(req: RecognizeBatchRequest):
+    """Recognize faces across many frames with one batched embedding pass and one matmul"""
+    if face_app is None:
+        raise HTTPException(status_code=400, detail="Service not initialized")
+    if len(req.frames) > MAX_BATCH_FRAMES:
+        raise HTTPException(status_code=400, detail=f"Too many frames (max {MAX_BATCH_FRAMES})")
+
+    frames_out = []
+    decoded = []  # (frame_index, IngestedImage)
+    crops: List[np.ndarray] = []
+    owners: List[Tuple[int, Tuple[float, float, float, float]]] = []
+    for i, fr in enumerate(req.frames):
+        frames_out.append({"index": i, "timestamp": fr.timestamp, "camera_id": fr.camera_id, "faces": []})
+        try:
+            image = ingest_image(b64_image_bytes(fr.image))
+        except HTTPException as e:
+            frames_out[i]["error"] = f"Invalid image: {e.detail}"
+            continue
+        decoded.append((i, image))
+        bboxes, kpss = detect_faces(image.array, hint=req.det_size)
+        for j in range(bboxes.shape[0]):
+            if kpss is None:
+                continue
+            crops.append(image.align(kpss[j] / image.scale))
+            owners.append((i, tuple(float(v) / image.scale for v in bboxes[j, :4])))
+
+    state = _frame_report(req.report_id)
+    if state:
+        for i, _ in decoded:
+            _record_frame_seen(state, req.frames[i].timestamp)
+
+    index = gallery_for(req.filter_ids, req.group_id)
+    if not crops or not len(index):
+        return {"frames": frames_out}
+
+    # Every face of every frame matched in one call
+    best_ids, scores = index.top1(embed_aligned(crops))
+
+    images = dict(decoded)
+    for (i, (x1, y1, x2, y2)), best_id, score in zip(owners, best_ids, scores):
+        score = float(score)
+        if score < THRESHOLD:
+            continue
+        frames_out[i]["faces"].append({
+            "person_id": best_id,
+            "person_name": GALLERY.name(best_id),
+            "confidence": score,
+            "box": {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1},
+        })
+        if state:
+            _record_recognized(state, images[i], req.frames[i].timestamp, best_id, score, (x1, y1, x2, y2))
 
-    return {"faces": results}
+    return {"frames": frames_out}
 
 
-class ValidateFaceRequest(BaseModel):
-    image: str  # base64 image
+class ValidateFaceRequest(ImageRequest):
+    pass
 
-class ProcessVideoFrameRequest(BaseModel):
-    image: str  # base64 video frame
+class ProcessVideoFrameRequest(ImageRequest):
     timestamp: float  # timestamp in seconds
     report_id: Optional[str] = None
+    session_id: Optional[str] = None  # camera session for track ids (off when absent)
 
-@app.post("/validate-face")
-def validate_face(req: ValidateFaceRequest):
+@app.post("/validate-face", openapi_extra=image_openapi(ValidateFaceRequest))
+@admit("enroll")
+def validate_face(req: ValidateFaceRequest = Depends(image_body(ValidateFaceRequest))):
     if face_app is None:
         raise HTTPException(status_code=400, detail="Service not initialized")
     
-    img_pil = decode_image_b64(req.image)
-    img = pil_to_ndarray(img_pil)
-    faces = face_app.get(img)
+    image = load_image(req)
+    faces = analyze_image("detect", image, closeup=True, det_size=req.det_size)
     
     if not faces:
         return {
@@ -951,43 +3805,43 @@ def validate_face(req: ValidateFaceRequest):
     faces.sort(key=lambda f: float((f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1])), reverse=True)
     face = faces[0]
     
-    # Calculate quality metrics
+    # Calculate quality metrics (the same ones /enroll enforces)
     x1, y1, x2, y2 = map(float, face.bbox)
-    face_width = x2 - x1
-    face_height = y2 - y1
-    face_area = face_width * face_height
-    img_area = img.shape[0] * img.shape[1]
+    full, full_scale = image.full
+    metrics = _face_quality_metrics(full, (x1, y1, x2, y2), getattr(face, 'kps', None), full_scale)
+    passed, reasons = _quality_pass(metrics)
+    face_area = (x2 - x1) * (y2 - y1)
+    img_area = image.size[0] * image.size[1]
     face_ratio = face_area / img_area
     
-    # Calculate face angle (using landmarks if available)
+    # Face angle from eye alignment (roll)
     angle_score = 1.0  # Default to good angle
-    if hasattr(face, 'kps') and face.kps is not None:
-        # Simple angle calculation based on eye positions
-        left_eye = face.kps[0] if len(face.kps) > 0 else None
-        right_eye = face.kps[1] if len(face.kps) > 1 else None
-        if left_eye is not None and right_eye is not None:
-            eye_distance = np.linalg.norm(np.array(left_eye) - np.array(right_eye))
-            if eye_distance > 0:
-                # Calculate angle based on eye alignment
-                angle = abs(np.arctan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0]))
-                angle_score = max(0, 1 - abs(angle) / (np.pi / 4))  # Penalize angles > 45 degrees
+    if metrics["roll_abs"] is not None:
+        angle_score = max(0.0, 1 - metrics["roll_abs"] / 45)  # Penalize angles > 45 degrees
     
     # Calculate size score (face should be reasonably large)
     size_score = min(1.0, face_ratio * 20)  # Good if face takes up at least 5% of image
     
+    # Image score: share of the sharpness, lighting and contrast checks passed
+    image_score = (
+        (metrics["sharpness"] >= QUALITY_MIN_SHARPNESS)
+        + (QUALITY_BRIGHTNESS_RANGE[0] <= metrics["brightness"] <= QUALITY_BRIGHTNESS_RANGE[1])
+        + (metrics["contrast"] >= QUALITY_MIN_CONTRAST)
+    ) / 3
+    
     # Calculate overall quality score (0-100)
-    quality_score = int((size_score * 0.4 + angle_score * 0.3 + 0.3) * 100)  # Base score + size + angle
+    quality_score = int((size_score * 0.4 + angle_score * 0.3 + image_score * 0.3) * 100)
     
-    # Determine quality level
-    if quality_score >= 70:
+    # Determine quality level; excellent only if /enroll would accept the photo
+    if quality_score >= 70 and passed:
         quality = "excellent"
         message = "Excellent - Face clearly visible"
-    elif quality_score >= 40:
+    elif quality_score >= 40 and image_score > 0:
         quality = "good"
-        message = "Good - Face detected, sufficient quality"
+        message = "Good - Face detected, sufficient quality" if passed else f"Good - {reasons[0]}"
     else:
         quality = "poor"
-        message = "Poor - Face too small, blurry, or poorly lit"
+        message = f"Poor - {reasons[0]}" if reasons else "Poor - Face too small, blurry, or poorly lit"
     
     return {
         "score": quality_score,
@@ -997,60 +3851,64 @@ def validate_face(req: ValidateFaceRequest):
         "face_ratio": float(face_ratio),
         "angle_score": float(angle_score),
         "size_score": float(size_score),
+        "image_score": float(image_score),
+        "metrics": metrics,
+        "passed": passed,
+        "reasons": reasons,
         "recommendation": "Upload additional photos from different angles" if quality_score < 60 else "Photo quality is good"
     }
 
-@app.post("/process-video-frame")
-def process_video_frame(req: ProcessVideoFrameRequest):
+@app.post("/process-video-frame", openapi_extra=image_openapi(ProcessVideoFrameRequest))
+@admit("video")
+def process_video_frame(req: ProcessVideoFrameRequest = Depends(image_body(ProcessVideoFrameRequest))):
     if face_app is None:
         raise HTTPException(status_code=400, detail="Service not initialized")
     
-    img_pil = decode_image_b64(req.image)
-    img = pil_to_ndarray(img_pil)
-    faces = face_app.get(img)
+    image = load_image(req)
+    faces = analyze_image("detect", image, det_size=req.det_size)
     
     if not faces:
         # Reporting: count empty frame if report active
-        state = _ensure_report_dirs(req.report_id) if req.report_id else None
+        state = _frame_report(req.report_id)
         if state:
             _record_frame_seen(state, req.timestamp)
+        if req.session_id:
+            tracker = get_tracker(f"video:{req.session_id}")
+            with tracker.lock:
+                tracker.update(np.zeros((0, 4), dtype=np.float32))
         return {"faces": [], "timestamp": req.timestamp}
     
     # Use same recognition logic as live camera
     # Optional reporting capture if a report_id is present in a side-channel
     # For now, we only update counters and save unknown crops if called by a test harness that knows the report_id.
-    state = _ensure_report_dirs(req.report_id) if req.report_id else None
+    state = _frame_report(req.report_id)
     if state:
         _record_frame_seen(state, req.timestamp)
-        state["totalFacesDetected"] += len(faces)
+        _count_report(state, "totalFacesDetected", len(faces))
     results = []
 
-    def _iou(b1, b2) -> float:
-        x1 = max(b1[0], b2[0])
-        y1 = max(b1[1], b2[1])
-        x2 = min(b1[2], b2[2])
-        y2 = min(b1[3], b2[3])
-        inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
-        if inter <= 0:
-            return 0.0
-        a1 = (b1[2] - b1[0]) * (b1[3] - b1[1])
-        a2 = (b2[2] - b2[0]) * (b2[3] - b2[1])
-        denom = a1 + a2 - inter
-        return inter / denom if denom > 0 else 0.0
-    for f in faces:
+    track_ids = None
+    if req.session_id:
+        tracker = get_tracker(f"video:{req.session_id}")
+        with tracker.lock:
+            track_ids = [t["track_id"] for t in tracker.update(np.array([f.bbox[:4] for f in faces], dtype=np.float32))]
+    for i, f in enumerate(faces):
         x1, y1, x2, y2 = map(float, f.bbox)
-        results.append({
+        box = {
             "x": x1,
             "y": y1,
             "width": x2 - x1,
             "height": y2 - y1,
             "timestamp": req.timestamp
-        })
+        }
+        if track_ids is not None:
+            box["track_id"] = track_ids[i]
+        results.append(box)
         if state:
             # Dedupe: if a recognized event exists for same timestamp and overlapping box, skip unknown
             should_save_unknown = True
             try:
-                for ev in reversed(state["events"][-50:]):  # scan recent
+                for ev in reversed(state["events"]):  # scan recent
                     if ev.get("timestamp") == req.timestamp and ev.get("type") == "recognized":
                         bx = ev.get("box", {})
                         rb = (float(bx.get("x", 0)), float(bx.get("y", 0)), float(bx.get("x", 0)) + float(bx.get("width", 0)), float(bx.get("y", 0)) + float(bx.get("height", 0)))
@@ -1062,7 +3920,7 @@ def process_video_frame(req: ProcessVideoFrameRequest):
 
             if should_save_unknown:
                 # Save detection crop under unknown; recognition endpoint will later save known
-                path = _save_face_crop(img_pil, (x1, y1, x2, y2), state["faces_unknown_dir"], prefix=f"ts{int(req.timestamp*1000)}", person_name=None)
+                path = _save_face_crop(image, (x1, y1, x2, y2), state["faces_unknown_dir"], prefix=f"ts{int(req.timestamp*1000)}", person_name=None)
                 _append_event(state, {
                     "timestamp": req.timestamp,
                     "type": "detected",
@@ -1070,7 +3928,7 @@ def process_video_frame(req: ProcessVideoFrameRequest):
                     "box": {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1},
                     "image_path": os.path.relpath(path, state["dir"]) if path else None,
                 })
-                state["unknownFacesDetected"] += 1
+                _count_report(state, "unknownFacesDetected")
     
     return {"faces": results, "timestamp": req.timestamp}
 
@@ -1080,25 +3938,102 @@ def clear():
     cur = conn.cursor()
     cur.execute("DELETE FROM embeddings")
     cur.execute("DELETE FROM persons")
+    cur.execute("DELETE FROM photos")
     cur.execute("DELETE FROM group_members")
     cur.execute("DELETE FROM groups")
     conn.commit()
     conn.close()
+    GALLERY.clear()
     return {"status": "cleared"}
 
 
+PEOPLE_PAGE_MAX = 1000
+
+
+def _people_with_photos(rows: list) -> list:
+    """Fold ``(person_id, person_name, revision, deleted, filename)`` join rows into one tuple per person."""
+    out = []
+    for _, group in itertools.groupby(rows, key=lambda r: (r[0], r[2])):
+        group = list(group)
+        pid, name, revision, deleted, _ = group[0]
+        out.append((pid, name, revision, deleted, [r[4] for r in group if r[4] is not None]))
+    return out
+
+
+def _person_row(pid: str, name: str, revision: int, photo_paths: List[str]) -> dict:
+    return {"person_id": pid, "person_name": name, "photo_paths": photo_paths, "revision": revision}
+
+
 @app.get("/people")
-def people():
+def people(request: Request, response: Response, limit: Optional[int] = None,
+           cursor: Optional[str] = None, changes_since: Optional[int] = None):
+    """The roster, ordered by person_id, or what changed after a revision.
+
+    Plain listing: every person (or a page of ``limit`` with ``cursor``) plus
+    the current ``revision``. With ``changes_since=R`` only people written
+    after revision R are returned (``upserts``), along with ids deleted since
+    (``deleted``), oldest change first. Pass the returned ``revision`` as the
+    next ``changes_since``; ``has_more`` means the page was cut at ``limit``.
+    """
+    if limit is not None and not 1 <= limit <= PEOPLE_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PEOPLE_PAGE_MAX}")
+    # Read before the rows: a write landing in between shows up again next time, never goes missing
+    revision = change_counter("persons")
+    etag = _etag("people", revision, limit, cursor, changes_since)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+    # The page is cut in a CTE, then joined to photos, so LIMIT counts people, not photos
+    if changes_since is not None:
+        page = (
+            "SELECT person_id, person_name, revision, 0 AS deleted FROM persons WHERE revision > ? "
+            "UNION ALL SELECT person_id, NULL, revision, 1 FROM person_tombstones WHERE revision > ? "
+            "ORDER BY revision"
+        )
+        params: list = [changes_since, changes_since]
+        order = "page.revision"
+    else:
+        page = "SELECT person_id, person_name, revision, 0 AS deleted FROM persons"
+        params = []
+        if cursor:
+            page += " WHERE person_id > ?"
+            params.append(_decode_cursor(cursor))
+        page += " ORDER BY person_id"
+        order = "page.person_id"
+    if limit is not None:
+        page += " LIMIT ?"
+        params.append(limit + 1)
+    sql = (
+        f"WITH page AS ({page}) "
+        "SELECT page.person_id, page.person_name, page.revision, page.deleted, ph.filename FROM page "
+        "LEFT JOIN photos ph ON ph.person_id = page.person_id AND page.deleted = 0 "
+        f"ORDER BY {order}, ph.rowid"
+    )
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT person_id, person_name, photo_paths FROM persons")
-    rows = cur.fetchall()
-    conn.close()
-    result = []
-    for pid, name, photo_paths_json in rows:
-        photo_paths = json.loads(photo_paths_json) if photo_paths_json else []
-        result.append({"person_id": pid, "person_name": name, "photo_paths": photo_paths})
-    return {"people": result}
+    try:
+        rows = _people_with_photos(conn.execute(sql, params).fetchall())
+    finally:
+        conn.close()
+
+    has_more = limit is not None and len(rows) > limit
+    rows = rows[:limit] if has_more else rows
+    if changes_since is not None:
+        upserts = [_person_row(pid, name, rev, photos) for pid, name, rev, deleted, photos in rows if not deleted]
+        deleted = [r[0] for r in rows if r[3]]
+        return {
+            "changes_since": changes_since,
+            "revision": rows[-1][2] if has_more else max([revision] + [r[2] for r in rows]),
+            "upserts": upserts,
+            "deleted": deleted,
+            "has_more": has_more,
+        }
+    return {
+        "people": [_person_row(pid, name, rev, photos) for pid, name, rev, _, photos in rows],
+        "revision": revision,
+        "next_cursor": _encode_cursor(rows[-1][0]) if has_more else None,
+    }
 
 
 # Photo Management Endpoints
@@ -1107,6 +4042,163 @@ class UploadPhotoRequest(BaseModel):
     image: str  # base64 encoded image
 
 
+# Photos are written once and never modified. Uploads are named by the
+# SHA-256 of their bytes and kept once in a shared content-addressed store,
+# photos/_store/<sha[:2]>/<sha>.jpg, however many people reference them (rows
+# in the photos table). Those URLs are cached as immutable. Older UUID-named
+# photos stay in photos/<person>/. Every size in PHOTO_RENDITION_SIZES is
+# rendered next to the original, into <N>px/, at upload time; older photos get
+# theirs on first request or from backfill_photo_renditions.py.
+PHOTO_RENDITION_SIZES = tuple(
+    int(v) for v in os.environ.get("FACE_PHOTO_RENDITIONS", "96,256").split(",") if v.strip()
+)
+PHOTO_RENDITION_QUALITY = 85
+PHOTO_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+_CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}\.jpg$")
+_PHOTO_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET",
+    "Access-Control-Allow-Headers": "*",
+}
+# Held while deciding whether a stored file is still referenced and writing
+# or unlinking it, so an upload and a delete of the same bytes can't interleave
+_photo_files_lock = threading.Lock()
+_photo_etags: "OrderedDict[tuple, str]" = OrderedDict()  # (path, mtime, size) -> ETag
+_PHOTO_ETAGS_MAX = 4096
+
+
+def _photo_dir(person_id: str, filename: str) -> str:
+    if _CONTENT_ADDRESSED_NAME.match(filename):
+        store = os.path.join(PHOTOS_DIR, "_store", filename[:2])
+        # Content-addressed uploads from before the shared store live under the person
+        if os.path.exists(os.path.join(store, filename)) or not os.path.exists(
+                os.path.join(PHOTOS_DIR, person_id, filename)):
+            return store
+    return os.path.join(PHOTOS_DIR, person_id)
+
+
+def photo_rendition_path(person_id: str, filename: str, size: Optional[int] = None) -> str:
+    if size is None:
+        return os.path.join(_photo_dir(person_id, filename), filename)
+    return os.path.join(_photo_dir(person_id, filename), f"{size}px", filename)
+
+
+def remove_photo_files(cur: sqlite3.Cursor, person_id: str, filenames: List[str]):
+    """Delete originals and renditions no longer referenced by any row in ``photos``."""
+    with _photo_files_lock:
+        for filename in filenames:
+            if cur.execute("SELECT 1 FROM photos WHERE filename = ? LIMIT 1", (filename,)).fetchone():
+                continue
+            for size in (None,) + PHOTO_RENDITION_SIZES:
+                path = photo_rendition_path(person_id, filename, size)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def _stage_file(path: str, data: bytes) -> str:
+    """Write ``data`` to a temp file next to ``path``; ``os.replace`` it into place to publish."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    return tmp
+
+
+def _write_file_atomic(path: str, data: bytes):
+    os.replace(_stage_file(path, data), path)
+
+
+def write_photo_renditions(person_id: str, filename: str, img: Optional[Image.Image] = None,
+                           force: bool = False) -> List[int]:
+    """Render the missing (or, with ``force``, all) sized copies of one photo; returns the sizes written."""
+    todo = [size for size in PHOTO_RENDITION_SIZES
+            if force or not os.path.exists(photo_rendition_path(person_id, filename, size))]
+    if not todo:
+        return []
+    if img is None:
+        img = Image.open(photo_rendition_path(person_id, filename))
+    for size, data in render_photo_renditions(img, todo).items():
+        _write_file_atomic(photo_rendition_path(person_id, filename, size), data)
+    return todo
+
+
+def render_photo_renditions(img: Image.Image, sizes: List[int]) -> dict:
+    """Encoded JPEG bytes of each rendition size of ``img``: ``{size: bytes}``."""
+    if not sizes:
+        return {}
+    if img.format in _JPEG_FORMATS:
+        img.draft("RGB", (max(sizes), max(sizes)))  # decode at 1/2..1/8 scale via DCT scaling
+    img = ImageOps.exif_transpose(img).convert("RGB")  # renditions drop EXIF, so apply its rotation
+    out = {}
+    for size in sizes:
+        thumb = img.copy()
+        thumb.thumbnail((size, size), Image.LANCZOS)
+        buf = io.BytesIO()
+        thumb.save(buf, "JPEG", quality=PHOTO_RENDITION_QUALITY, optimize=True)
+        out[size] = buf.getvalue()
+    return out
+
+
+def _photo_etag(path: str, st: os.stat_result) -> str:
+    """Strong ETag: SHA-256 of the file, cached per (path, mtime, size)."""
+    key = (path, st.st_mtime_ns, st.st_size)
+    etag = _photo_etags.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()}"'
+        _photo_etags[key] = etag
+        if len(_photo_etags) > _PHOTO_ETAGS_MAX:
+            _photo_etags.popitem(last=False)
+    return etag
+
+
+def _byte_range(header: str, length: int) -> Optional[Tuple[int, int]]:
+    """Inclusive ``(start, end)`` of a single ``bytes=`` range; None to send the whole file."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # multiple ranges are optional; reply with the full body
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), length - 1) if last else length - 1
+        else:
+            start, end = max(length - int(last), 0), length - 1
+    except ValueError:
+        return None
+    if start > end or start >= length:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{length}"})
+    return start, end
+
+
+def _photo_response(request: Request, path: str, immutable: bool) -> Response:
+    st = os.stat(path)
+    etag = _photo_etag(path, st)
+    headers = dict(_PHOTO_HEADERS)
+    headers["ETag"] = etag
+    headers["Accept-Ranges"] = "bytes"
+    headers["Cache-Control"] = (f"public, max-age={PHOTO_IMMUTABLE_MAX_AGE}, immutable"
+                                if immutable else "no-cache")
+    inm = request.headers.get("if-none-match")
+    if inm and ("*" in inm or etag in [t.strip().removeprefix("W/") for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+    rng = request.headers.get("range")
+    if rng and request.headers.get("if-range", etag) == etag:
+        span = _byte_range(rng, st.st_size)
+        if span is not None:
+            start, end = span
+            with open(path, "rb") as f:
+                f.seek(start)
+                body = f.read(end - start + 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+            return Response(body, status_code=206, media_type="image/jpeg", headers=headers)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+
 @app.post("/person/photo/upload")
 def upload_person_photo(req: UploadPhotoRequest):
     """Upload a photo for a person and save it to the filesystem"""
@@ -1116,53 +4208,90 @@ def upload_person_photo(req: UploadPhotoRequest):
         img_bytes = base64.b64decode(img_data)
         img = Image.open(io.BytesIO(img_bytes))
         
-        # Create person directory if it doesn't exist
-        person_dir = os.path.join(PHOTOS_DIR, req.person_id)
-        os.makedirs(person_dir, exist_ok=True)
-        
-        # Generate unique filename
-        filename = f"{uuid.uuid4()}.jpg"
-        filepath = os.path.join(person_dir, filename)
-        
-        # Save image
-        img.save(filepath, "JPEG", quality=90)
-        
-        # Update database with new photo path
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT photo_paths FROM persons WHERE person_id = ?", (req.person_id,))
-        row = cur.fetchone()
-        
-        if row:
-            photo_paths = json.loads(row[0]) if row[0] else []
-            photo_paths.append(filename)
-            cur.execute(
-                "UPDATE persons SET photo_paths = ? WHERE person_id = ?",
-                (json.dumps(photo_paths), req.person_id)
-            )
-        
-        conn.commit()
-        conn.close()
-        
+        # JPEG bytes are stored as uploaded; anything else is re-encoded once
+        if img.format in _JPEG_FORMATS:
+            data = img_bytes
+        else:
+            buf = io.BytesIO()
+            img.convert("RGB").save(buf, "JPEG", quality=90)
+            data = buf.getvalue()
+        sha256 = hashlib.sha256(data).hexdigest()
+        filename = f"{sha256}.jpg"
+        # Displayed size, i.e. after the EXIF rotation the renditions apply
+        width, height = img.size
+        if img.getexif().get(0x0112) in (5, 6, 7, 8):
+            width, height = height, width
+
+        # Encode everything into temp files first, so the lock below only
+        # covers the insert and the renames
+        filepath = photo_rendition_path(req.person_id, filename)
+        staged = []
+        try:
+            if not os.path.exists(filepath):
+                staged.append((filepath, _stage_file(filepath, data)))
+            todo = [size for size in PHOTO_RENDITION_SIZES
+                    if not os.path.exists(photo_rendition_path(req.person_id, filename, size))]
+            for size, rendition in render_photo_renditions(img, todo).items():
+                path = photo_rendition_path(req.person_id, filename, size)
+                staged.append((path, _stage_file(path, rendition)))
+
+            # Record the photo first; a repeat upload of the same bytes is a
+            # no-op and an unknown person writes nothing
+            with _photo_files_lock:
+                conn = get_conn()
+                try:
+                    cur = conn.cursor()
+                    cur.execute(
+                        "INSERT OR IGNORE INTO photos(person_id, filename, sha256, bytes, width, height, created_at) "
+                        "SELECT person_id, ?, ?, ?, ?, ?, ? FROM persons WHERE person_id = ?",
+                        (filename, sha256, len(data), width, height, time.time(), req.person_id)
+                    )
+                    if not cur.rowcount and not cur.execute(
+                            "SELECT 1 FROM persons WHERE person_id = ?", (req.person_id,)).fetchone():
+                        raise HTTPException(status_code=404, detail="Person not found")
+                    conn.commit()
+                finally:
+                    conn.close()
+                # Checked after the insert, so a concurrent delete that already
+                # unlinked these bytes gets them written back
+                if not os.path.exists(filepath):
+                    if not any(path == filepath for path, _ in staged):
+                        staged.append((filepath, _stage_file(filepath, data)))
+                for path, tmp in staged:
+                    if not os.path.exists(path):
+                        os.replace(tmp, path)
+        finally:
+            for _, tmp in staged:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
         return {"status": "ok", "filename": filename, "path": f"/person/photo/{req.person_id}/{filename}"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload photo: {str(e)}")
 
 
 @app.get("/person/photo/{person_id}/{filename}")
-def get_person_photo(person_id: str, filename: str):
-    """Serve a person's photo"""
-    filepath = os.path.join(PHOTOS_DIR, person_id, filename)
+def get_person_photo(request: Request, person_id: str, filename: str, size: str = "original"):
+    """Serve a person's photo, or a smaller rendition with ``size`` (e.g. 96 or 256)"""
+    if ".." in person_id or ".." in filename:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    filepath = photo_rendition_path(person_id, filename)
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="Photo not found")
-    return FileResponse(
-        filepath,
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET",
-            "Access-Control-Allow-Headers": "*",
-        }
-    )
+    if size != "original":
+        try:
+            px = int(size.removesuffix("px"))
+        except ValueError:
+            px = None
+        if px not in PHOTO_RENDITION_SIZES:
+            sizes = ", ".join(str(v) for v in PHOTO_RENDITION_SIZES)
+            raise HTTPException(status_code=400, detail=f"size must be one of: original, {sizes}")
+        filepath = photo_rendition_path(person_id, filename, px)
+        if not os.path.exists(filepath):
+            write_photo_renditions(person_id, filename)
+    return _photo_response(request, filepath, immutable=bool(_CONTENT_ADDRESSED_NAME.match(filename)))
 
 
 class DeletePhotoRequest(BaseModel):
@@ -1174,28 +4303,12 @@ class DeletePhotoRequest(BaseModel):
 def delete_person_photo(req: DeletePhotoRequest):
     """Delete a person's photo"""
     try:
-        filepath = os.path.join(PHOTOS_DIR, req.person_id, req.filename)
-        
-        # Remove from filesystem
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
-        # Update database
         conn = get_conn()
         cur = conn.cursor()
-        cur.execute("SELECT photo_paths FROM persons WHERE person_id = ?", (req.person_id,))
-        row = cur.fetchone()
-        
-        if row and row[0]:
-            photo_paths = json.loads(row[0])
-            if req.filename in photo_paths:
-                photo_paths.remove(req.filename)
-                cur.execute(
-                    "UPDATE persons SET photo_paths = ? WHERE person_id = ?",
-                    (json.dumps(photo_paths), req.person_id)
-                )
-        
+        cur.execute("DELETE FROM photos WHERE person_id = ? AND filename = ?", (req.person_id, req.filename))
         conn.commit()
+        # Remove from filesystem, renditions included, unless someone else still uses it
+        remove_photo_files(cur, req.person_id, [req.filename])
         conn.close()
         
         return {"status": "ok"}
@@ -1247,31 +4360,6 @@ def update_group(req: UpdateGroupRequest):
     return {"status": "ok"}
 
 
-@app.get("/groups")
-def get_groups():
-    """Get all groups with their members and metadata"""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT group_id, group_name, age, guides_info, notes FROM groups")
-    groups_rows = cur.fetchall()
-    
-    result = []
-    for group_id, group_name, age, guides_info, notes in groups_rows:
-        cur.execute("SELECT person_id FROM group_members WHERE group_id = ?", (group_id,))
-        members = [row[0] for row in cur.fetchall()]
-        result.append({
-            "group_id": group_id,
-            "group_name": group_name,
-            "age": age,
-            "guides_info": guides_info,
-            "notes": notes,
-            "members": members
-        })
-    
-    conn.close()
-    return {"groups": result}
-
-
 class TestReportStartRequest(BaseModel):
     video_name: Optional[str] = None
 
@@ -1281,6 +4369,7 @@ def test_report_start(req: TestReportStartRequest):
     report_id = uuid.uuid4().hex
     state = _ensure_report_dirs(report_id)
     state["video_name"] = req.video_name
+    _checkpoint_report(state)
     return {"report_id": report_id, "dir": state["dir"]}
 
 
@@ -1288,35 +4377,33 @@ class TestReportFinalizeRequest(BaseModel):
     report_id: str
 
 
+def _report_dir_or_404(report_id: str) -> str:
+    report_dir = _report_paths(report_id)[0]
+    if os.path.basename(report_dir) != report_id or not os.path.isdir(report_dir):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report_dir
+
+
 @app.post("/test-report/finalize")
 def test_report_finalize(req: TestReportFinalizeRequest):
-    state = _report_state.get(req.report_id)
-    if not state:
+    """Write summary.json from the event log and stream it back; the report leaves memory."""
+    report_dir = _report_dir_or_404(req.report_id)
+    _evict_report(req.report_id, finalized=True)
+    checkpoint = _read_report_checkpoint(req.report_id)
+    summary_path = os.path.join(report_dir, "summary.json")
+    if checkpoint is not None:
+        summary_path = _write_report_summary(req.report_id, checkpoint)
+    elif not os.path.exists(summary_path):
         raise HTTPException(status_code=404, detail="Report not found")
-    # Build summary.json
-    people_names = list(state["peopleRecognized"]) if isinstance(state["peopleRecognized"], set) else state["peopleRecognized"]
-    summary = {
-        "videoName": state.get("video_name"),
-        "peopleRecognized": people_names,
-        "framesProcessed": state["framesProcessed"],
-        "totalFacesDetected": state["totalFacesDetected"],
-        "unknownFacesDetected": state["unknownFacesDetected"],
-        "details": state["events"],
-    }
-    try:
-        with open(os.path.join(state["dir"], "summary.json"), "w") as f:
-            json.dump(summary, f, indent=2)
-    except Exception:
-        pass
-    return summary
+    return FileResponse(summary_path, media_type="application/json")
 
 
 @app.get("/test-report/download/{report_id}")
 def test_report_download(report_id: str):
+    report_dir = _report_dir_or_404(report_id)
     state = _report_state.get(report_id)
-    if not state:
-        raise HTTPException(status_code=404, detail="Report not found")
-    report_dir = state["dir"]
+    if state:
+        _checkpoint_report(state)  # flush the log into the archive
     zip_path = os.path.join(TEST_REPORTS_ROOT, f"{report_id}.zip")
     try:
         import zipfile
@@ -1392,8 +4479,7 @@ def sync_group_embeddings(req: SyncGroupRequest):
             
             for emb_row in emb_response.data:
                 embedding_list = emb_row['embedding']
-                embedding_array = np.array(embedding_list, dtype=np.float32)
-                emb_blob = embedding_array.tobytes()
+                emb_blob = encode_embedding(embedding_list)
                 
                 c.execute(
                     "INSERT INTO embeddings (person_id, embedding) VALUES (?, ?)",
@@ -1404,8 +4490,9 @@ def sync_group_embeddings(req: SyncGroupRequest):
         conn.commit()
         conn.close()
         
-        # Clear cache so it reloads from DB
-        _group_members_cache.pop(req.group_id, None)
+        # Membership changed and embeddings were replaced: drop the shard and patch the gallery
+        GROUP_SHARDS.invalidate_group(req.group_id)
+        GALLERY.refresh_persons(member_person_ids)
         
         print(f"✅ Synced group '{group_name}': {embeddings_count} embeddings for {len(member_person_ids)} members")
         return {"success": True, "count": embeddings_count, "members": len(member_person_ids)}
@@ -1475,11 +4562,11 @@ def enroll_person_direct(req: EnrollPersonDirectRequest):
                 photo_base64 = photo_base64.split(',')[1]  # Remove data URL prefix
             
             img_bytes = base64.b64decode(photo_base64)
-            img = Image.open(io.BytesIO(img_bytes))
+            image = ingest_image(img_bytes)
             
             # 2. Generate embedding
-            img_array = np.array(img)
-            faces = face_app.get(img_array)
+            with ADMISSION.slot("enroll"):
+                faces = analyze_image("embed", image, closeup=True)
             
             if not faces:
                 logger.warning(f"⚠️  No face detected in photo {idx + 1}")
@@ -1501,9 +4588,12 @@ def enroll_person_direct(req: EnrollPersonDirectRequest):
             # 3. Upload photo to Supabase Storage: {user_id}/{person_id}/
             photo_path = f"{req.user_id}/{req.person_id}/photo_{idx + 1}.jpg"
             
-            # Convert image to JPEG bytes
+            # JPEG uploads go up as sent; anything else is converted
             img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='JPEG', quality=95)
+            if image.format in _JPEG_FORMATS:
+                img_byte_arr.write(img_bytes)
+            else:
+                image.pil.save(img_byte_arr, format='JPEG', quality=95)
             img_byte_arr.seek(0)
             
             try:
@@ -1571,14 +4661,14 @@ def enroll_person_direct(req: EnrollPersonDirectRequest):
         logger.info(f"☁️  Saved {len(embeddings)} embeddings to Supabase")
         
         # 6. Save to local cache (SQLite)
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         c = conn.cursor()
         
         # Clear existing embeddings for this person (if re-enrolling)
         c.execute("DELETE FROM embeddings WHERE person_id = ?", (req.person_id,))
         
         for embedding in embeddings:
-            emb_blob = np.array(embedding, dtype=np.float32).tobytes()
+            emb_blob = encode_embedding(embedding)
             c.execute(
                 "INSERT INTO embeddings (person_id, embedding) VALUES (?, ?)",
                 (req.person_id, emb_blob)
@@ -1586,6 +4676,7 @@ def enroll_person_direct(req: EnrollPersonDirectRequest):
         
         conn.commit()
         conn.close()
+        GALLERY.refresh_persons([req.person_id])
         logger.info(f"💽 Saved {len(embeddings)} embeddings to local cache")
         
         logger.info(f"🎉 Direct enrollment complete: {req.name}")
@@ -1600,6 +4691,8 @@ def enroll_person_direct(req: EnrollPersonDirectRequest):
         }
         
     except Exception as e:
+        if isinstance(e, HTTPException) and e.status_code in (429, 503):
+            raise  # admission rejection: keep the status and Retry-After
         logger.error(f"❌ Error in direct enrollment: {e}")
         import traceback
         logger.error(traceback.format_exc())
@@ -1659,11 +4752,11 @@ def process_pending_enrollment(req: ProcessPendingRequest):
             
             # 3. Download photo from storage
             photo_data = supabase.storage.from_('face-photos').download(bucket_path)
-            img = Image.open(io.BytesIO(photo_data))
+            image = ingest_image(photo_data)
             
             # 4. Generate embedding
-            img_array = np.array(img)
-            faces = face_app.get(img_array)
+            with ADMISSION.slot("enroll"):
+                faces = analyze_image("embed", image, closeup=True)
             
             if not faces:
                 print(f"⚠️  No face detected in photo {idx + 1}")
@@ -1684,9 +4777,12 @@ def process_pending_enrollment(req: ProcessPendingRequest):
             # 5. Upload photo to final location: {user_id}/{person_id}/
             final_path = f"{user_id}/{person_id}/photo_{idx + 1}.jpg"
             
-            # Convert image back to bytes
+            # Convert image back to bytes (JPEGs are copied as downloaded)
             img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='JPEG')
+            if image.format in _JPEG_FORMATS:
+                img_byte_arr.write(photo_data)
+            else:
+                image.pil.save(img_byte_arr, format='JPEG')
             img_byte_arr.seek(0)
             
             supabase.storage.from_('face-photos').upload(
@@ -1748,11 +4844,11 @@ def process_pending_enrollment(req: ProcessPendingRequest):
         print(f"✅ Saved {len(embeddings)} embeddings to Supabase (batched)")
         
         # 8. Save to local cache (SQLite) - BATCH INSERT with executemany (much faster!)
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         c = conn.cursor()
         
         embedding_blobs = [
-            (person_id, np.array(embedding, dtype=np.float32).tobytes())
+            (person_id, encode_embedding(embedding))
             for embedding in embeddings
         ]
         
@@ -1763,6 +4859,7 @@ def process_pending_enrollment(req: ProcessPendingRequest):
         
         conn.commit()
         conn.close()
+        GALLERY.refresh_persons([person_id])
         print(f"✅ Saved {len(embeddings)} embeddings to local cache (batched)")
         
         # 9. Update pending status to 'accepted'
@@ -1793,6 +4890,8 @@ def process_pending_enrollment(req: ProcessPendingRequest):
         }
         
     except Exception as e:
+        if isinstance(e, HTTPException) and e.status_code in (429, 503):
+            raise  # admission rejection: keep the status and Retry-After
         print(f"❌ Error processing pending enrollment: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
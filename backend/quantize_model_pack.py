@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Build an INT8 copy of an InsightFace model pack
+
+Quantizes every ONNX model in <src-root>/models/<pack>/ and writes the result
+to <dst-root>/models/<pack>_int8/ (or --out-pack), so the server can load it
+with /init {"model_pack": "buffalo_l_int8", "model_root": "<dst-root>"} or
+FACE_MODEL_PACK / FACE_MODEL_ROOT.
+
+  dynamic  weights stored as INT8, activations quantized at run time.
+           No calibration data needed.
+  static   weights and activations INT8 (QDQ), calibrated on the stored
+           test report face crops (or --calib-images).
+
+Usage: python quantize_model_pack.py [--mode dynamic|static] [--pack buffalo_l]
+                                     [--src-root ~/.insightface] [--dst-root ...]
+"""
+import argparse
+import glob
+import os
+import shutil
+
+import cv2
+import numpy as np
+from PIL import Image
+from insightface.model_zoo import model_zoo
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                      quantize_dynamic, quantize_static)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.expanduser(os.environ.get("INSIGHTFACE_HOME", "~/.insightface"))
+# The detector takes dynamic input; calibrate at the size the server uses most
+DETECTOR_CALIB_SIZE = 640
+
+
+def load_calibration_images(images_dir, limit):
+    patterns = [os.path.join(images_dir, "**", "*.jpg"), os.path.join(images_dir, "**", "*.png")]
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern, recursive=True))[:limit]
+    return [cv2.cvtColor(np.asarray(Image.open(p).convert("RGB")), cv2.COLOR_RGB2BGR) for p in paths]
+
+
+class ModelCalibrationReader(CalibrationDataReader):
+    """Feeds images through the same preprocessing the insightface model class applies."""
+
+    def __init__(self, model, images):
+        self.input_name = model.session.get_inputs()[0].name
+        size = model.input_size if model.taskname != "detection" else None
+        size = tuple(size) if size and all(isinstance(v, int) for v in size) else (DETECTOR_CALIB_SIZE, DETECTOR_CALIB_SIZE)
+        self.blobs = iter([
+            cv2.dnn.blobFromImage(self._fit(img, size), 1.0 / model.input_std, size,
+                                  (model.input_mean,) * 3, swapRB=True)
+            for img in images
+        ])
+
+    @staticmethod
+    def _fit(img, size):
+        # Letterbox like RetinaFace.detect does, so the detector sees realistic scales
+        h, w = img.shape[:2]
+        scale = min(size[0] / w, size[1] / h)
+        resized = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))))
+        canvas = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        canvas[:resized.shape[0], :resized.shape[1]] = resized
+        return canvas
+
+    def get_next(self):
+        blob = next(self.blobs, None)
+        return None if blob is None else {self.input_name: blob}
+
+
+def quantize_model(src, dst, mode, images):
+    if mode == "dynamic":
+        quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+        return
+    model = model_zoo.get_model(src, providers=["CPUExecutionProvider"])
+    if model is None:
+        raise ValueError(f"insightface does not recognise {os.path.basename(src)}")
+    quantize_static(
+        src, dst, ModelCalibrationReader(model, images),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pack", default="buffalo_l")
+    parser.add_argument("--src-root", default=DEFAULT_ROOT)
+    parser.add_argument("--dst-root", default=None, help="defaults to --src-root")
+    parser.add_argument("--out-pack", default=None, help="defaults to <pack>_int8")
+    parser.add_argument("--mode", choices=["dynamic", "static"], default="dynamic")
+    parser.add_argument("--calib-images", default=os.path.join(BACKEND_DIR, "test_reports"))
+    parser.add_argument("--calib-limit", type=int, default=200)
+    parser.add_argument("--skip", default="", help="comma-separated model files to copy unquantized")
+    args = parser.parse_args()
+
+    src_dir = os.path.join(args.src_root, "models", args.pack)
+    dst_dir = os.path.join(args.dst_root or args.src_root, "models", args.out_pack or f"{args.pack}_int8")
+    models = sorted(f for f in os.listdir(src_dir) if f.lower().endswith(".onnx")) if os.path.isdir(src_dir) else []
+    if not models:
+        print(f"❌ No ONNX models found in {src_dir}")
+        return 1
+
+    images = []
+    if args.mode == "static":
+        images = load_calibration_images(args.calib_images, args.calib_limit)
+        if not images:
+            print(f"❌ Static quantization needs calibration images; none found under {args.calib_images}")
+            return 1
+
+    print("=" * 60)
+    print(f"🗜️  QUANTIZING {args.pack} ({args.mode})")
+    print("=" * 60)
+    print(f"Source: {src_dir}")
+    print(f"Output: {dst_dir}")
+    if images:
+        print(f"Calibration images: {len(images)}")
+    print()
+
+    os.makedirs(dst_dir, exist_ok=True)
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    for name in models:
+        src, dst = os.path.join(src_dir, name), os.path.join(dst_dir, name)
+        if name in skip:
+            shutil.copyfile(src, dst)
+            print(f"   ⏭️  {name}: copied unquantized")
+            continue
+        try:
+            quantize_model(src, dst, args.mode, images)
+        except Exception as e:
+            # Keep the pack loadable: an unquantizable model ships as FP32
+            shutil.copyfile(src, dst)
+            print(f"   ⚠️  {name}: quantization failed ({e}); copied unquantized")
+            continue
+        before, after = os.path.getsize(src), os.path.getsize(dst)
+        print(f"   ✅ {name}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+
+    print()
+    print("Compare against the original with:")
+    print(f"   python compare_model_packs.py --candidate-pack {os.path.basename(dst_dir)} "
+          f"--candidate-root {args.dst_root or args.src_root}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -56,6 +56,8 @@ async function toDataURLFromElement(el: HTMLVideoElement | HTMLImageElement | HT
 class BackendRecognitionService {
   private initialized = false;
   private activeReportId: string | null = null;
+  // Kept after finalize so the report can still be downloaded
+  private lastReportId: string | null = null;
 
   async initialize(): Promise<void> {
     if (this.initialized) return;
@@ -552,6 +554,7 @@ class BackendRecognitionService {
     if (!res.ok) throw new Error('Failed to start test report');
     const json = await res.json();
     this.activeReportId = json.report_id as string;
+    this.lastReportId = this.activeReportId;
     return this.activeReportId;
   }
 
@@ -563,12 +566,14 @@ class BackendRecognitionService {
       body: JSON.stringify({ report_id: this.activeReportId })
     });
     if (!res.ok) throw new Error('Failed to finalize test report');
+    // Later frames must not keep reporting into the finished report
+    this.activeReportId = null;
     const json = await res.json();
     return json;
   }
 
   getReportDownloadUrl(reportId?: string): string | null {
-    const id = reportId || this.activeReportId;
+    const id = reportId || this.activeReportId || this.lastReportId;
     if (!id) return null;
     return `${BASE_URL}/test-report/download/${id}`;
   }